@@ -2,8 +2,8 @@ from fastapi import Depends
 from sqlmodel import Session
 
 from app.db.get_session import get_session
-from app.organization.model import OrganizationModel
+from app.organization.cache import organization_cache
 
 
 def get_current_organization(session: Session = Depends(get_session)):
-    return OrganizationModel.get_default_organization(session)
+    return organization_cache.get_default(session)
@@ -1,13 +1,20 @@
 from typing import Any, Mapping, Optional, Tuple, Union
-from fastapi import Depends, Header
+from fastapi import Depends, Header, HTTPException, Request, status
+from google.auth import exceptions
 from pydantic import BaseModel
-from sqlmodel import Session
-from google.oauth2 import id_token
-from google.auth.transport import requests
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.core.config import settings
+from app.auth.google_certs import verify_google_token_async
+from app.auth.session_tokens import (
+    ExpiredSessionToken,
+    InvalidSessionToken,
+    decode_access_token,
+    user_from_claims,
+)
 from app.db.models.user.user import User
-from app.db.get_session import get_session
+from app.db.get_session import get_async_session
 
 
 class DecodedGoogleResponse(BaseModel):
@@ -33,29 +40,65 @@ class DecodedGoogleResponse(BaseModel):
 
 
 async def get_google_user_from_token(
-    token: str, session: Session
+    token: str, session: AsyncSession
 ) -> Tuple[Union[User, None], DecodedGoogleResponse]:
     """
     Receives a google id_token and gets the matching user
     from the database
     """
-    idinfo: Mapping[str, Any] = id_token.verify_oauth2_token(
-        token, requests.Request(), settings.GOOGLE_CLIENT_ID
-    )
+    idinfo: Mapping[str, Any] = await verify_google_token_async(token)
     google_info = DecodedGoogleResponse(**idinfo)
-    user = session.query(User).filter(User.google_id == google_info.sub).first()
+    statement = (
+        select(User)
+        .where(User.google_id == google_info.sub)
+        .options(selectinload(User.teacher), selectinload(User.student))
+    )
+    user = (await session.exec(statement)).first()
     return user, google_info
 
 
 async def get_current_user(
-    authorization: str = Header(), session: Session = Depends(get_session)
+    request: Request,
+    authorization: str = Header(),
+    session: AsyncSession = Depends(get_async_session),
 ) -> User:
-    token = authorization.replace("Bearer ", "")
-    idinfo: Mapping[str, Any] = id_token.verify_oauth2_token(
-        token, requests.Request(), settings.GOOGLE_CLIENT_ID
+    user = await _authenticate(request, authorization, session)
+    # Read by ReadYourWritesMiddleware, to pin the user after a write
+    request.state.user_id = user.id
+    return user
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED, detail=detail
     )
-    google_info = DecodedGoogleResponse(**idinfo)
-    user = session.query(User).filter(User.google_id == google_info.sub).first()
+
+
+async def _authenticate(
+    request: Request, authorization: str, session: AsyncSession
+) -> User:
+    token = authorization.replace("Bearer ", "")
+    try:
+        claims = decode_access_token(token)
+    except ExpiredSessionToken:
+        raise _unauthorized("Session token has expired")
+    except InvalidSessionToken:
+        # Not one of ours, clients may still send their Google ID token
+        pass
+    else:
+        # Its roles spare the principal the joins the user doesn't need
+        request.state.session_claims = claims
+        return user_from_claims(claims)
+    try:
+        idinfo: Mapping[str, Any] = await verify_google_token_async(token)
+        google_info = DecodedGoogleResponse(**idinfo)
+    except exceptions.TransportError:
+        # Google's certs are unreachable, the token may well be valid
+        raise
+    except (ValueError, exceptions.GoogleAuthError):
+        raise _unauthorized("Token could not be authenticated")
+    statement = select(User).where(User.google_id == google_info.sub)
+    user = (await session.exec(statement)).first()
     if not user or not user.id:
-        raise ValueError("User not found")
+        raise _unauthorized("User not found")
     return user
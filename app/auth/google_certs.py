@@ -0,0 +1,206 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import requests
+from cachetools import TLRUCache
+from fastapi.concurrency import run_in_threadpool
+from google.auth import exceptions, jwt
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+GOOGLE_ISSUERS = ["accounts.google.com", "https://accounts.google.com"]
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class GoogleCertStore:
+    """
+    Process wide cache of Google's token signing certificates.
+
+    Certificates are kept for the max-age in the Cache-Control header of
+    the certs response. Shortly before they expire they are refreshed on
+    a background thread, so requests never wait on the fetch once warm.
+    """
+
+    def __init__(
+        self,
+        certs_url: str,
+        refresh_margin: float = 60,
+        default_max_age: float = 300,
+        timeout: float = 5,
+    ) -> None:
+        self.certs_url = certs_url
+        self.refresh_margin = refresh_margin
+        self.default_max_age = default_max_age
+        self.timeout = timeout
+        self.fetch_count = 0
+        self._http = requests.Session()
+        self._lock = threading.Lock()
+        self._certs: Optional[Dict[str, str]] = None
+        self._expires_at = 0.0
+        self._refreshing = False
+
+    def get_certs(self) -> Mapping[str, str]:
+        now = time.monotonic()
+        if self._certs is None or now >= self._expires_at:
+            return self._refresh_expired()
+        if now >= self._expires_at - self.refresh_margin:
+            self._refresh_in_background()
+        return self._certs
+
+    def _refresh_expired(self) -> Mapping[str, str]:
+        with self._lock:
+            # Callers queued on the lock find the certs the first fetched
+            if self._certs is not None and time.monotonic() < self._expires_at:
+                return self._certs
+            return self._refresh_locked()
+
+    def refresh(
+        self, stale: Optional[Mapping[str, str]] = None
+    ) -> Mapping[str, str]:
+        """
+        Fetches the certs again. Passing the ``stale`` certs a caller
+        found lacking skips the fetch when another caller already
+        replaced them.
+        """
+        with self._lock:
+            if stale is not None and self._certs is not stale:
+                return self._certs  # type: ignore
+            return self._refresh_locked()
+
+    def _refresh_locked(self) -> Mapping[str, str]:
+        certs, max_age = self._fetch()
+        self._certs = certs
+        self._expires_at = time.monotonic() + max_age
+        return certs
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run() -> None:
+            try:
+                self.refresh()
+            except Exception:
+                # The current certs keep being served until they expire
+                logger.exception("Background refresh of Google certs failed")
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _fetch(self) -> Tuple[Dict[str, str], float]:
+        response = self._http.get(self.certs_url, timeout=self.timeout)
+        if response.status_code != 200:
+            raise exceptions.TransportError(
+                f"Could not fetch certificates at {self.certs_url}"
+            )
+        self.fetch_count += 1
+        match = _MAX_AGE_RE.search(response.headers.get("Cache-Control", ""))
+        max_age = float(match.group(1)) if match else self.default_max_age
+        return response.json(), max_age
+
+
+class GoogleTokenVerifier:
+    """
+    Verifies Google ID tokens against the shared cert store and remembers
+    tokens which already passed, until their exp, so a client sending the
+    same bearer token again skips the signature check.
+    """
+
+    def __init__(
+        self, cert_store: GoogleCertStore, audience: str, maxsize: int
+    ) -> None:
+        self.cert_store = cert_store
+        self.audience = audience
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._verified: TLRUCache = TLRUCache(
+            maxsize=maxsize,
+            ttu=lambda _key, idinfo, _now: float(idinfo["exp"]),
+            timer=time.time,
+        )
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def cached(self, token: str) -> Optional[Mapping[str, Any]]:
+        """
+        The claims of a token which already passed, without verifying
+        """
+        with self._lock:
+            idinfo = self._verified.get(self._key(token))
+            if idinfo is not None:
+                self.hits += 1
+            return idinfo
+
+    def verify(self, token: str) -> Mapping[str, Any]:
+        """
+        May fetch certs and checks an RSA signature, so blocks. Async
+        code should use verify_google_token_async.
+        """
+        idinfo = self.cached(token)
+        if idinfo is not None:
+            return idinfo
+        with self._lock:
+            self.misses += 1
+        idinfo = self._decode(token)
+        with self._lock:
+            self._verified[self._key(token)] = idinfo
+        return idinfo
+
+    def _decode(self, token: str) -> Mapping[str, Any]:
+        certs = self.cert_store.get_certs()
+        try:
+            idinfo = jwt.decode(token, certs=certs, audience=self.audience)
+        except ValueError as e:
+            if "Certificate for key id" not in str(e):
+                raise
+            # Google rotated its keys before our copy expired
+            idinfo = jwt.decode(
+                token,
+                certs=self.cert_store.refresh(stale=certs),
+                audience=self.audience,
+            )
+        if idinfo["iss"] not in GOOGLE_ISSUERS:
+            raise exceptions.GoogleAuthError(
+                "Wrong issuer. 'iss' should be one of the following: "
+                f"{GOOGLE_ISSUERS}"
+            )
+        return idinfo
+
+    def clear(self) -> None:
+        with self._lock:
+            self._verified.clear()
+
+
+google_token_verifier = GoogleTokenVerifier(
+    cert_store=GoogleCertStore(settings.GOOGLE_CERTS_URL),
+    audience=settings.GOOGLE_CLIENT_ID,
+    maxsize=settings.GOOGLE_TOKEN_CACHE_SIZE,
+)
+
+
+def verify_google_token(token: str) -> Mapping[str, Any]:
+    return google_token_verifier.verify(token)
+
+
+async def verify_google_token_async(token: str) -> Mapping[str, Any]:
+    """
+    verify_google_token for async routes. Tokens seen before are answered
+    on the event loop, anything else is verified in the threadpool.
+    """
+    idinfo = google_token_verifier.cached(token)
+    if idinfo is not None:
+        return idinfo
+    return await run_in_threadpool(verify_google_token, token)
@@ -0,0 +1,151 @@
+import logging
+from contextlib import nullcontext
+from dataclasses import dataclass
+from datetime import datetime
+from typing import ContextManager, Optional, Tuple
+
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy.orm import contains_eager, noload
+from sqlmodel import Session, col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel.sql.expression import Select
+
+from app.auth.get_current_user import get_current_user
+from app.auth.session_tokens import SessionClaims
+from app.core.config import settings
+from app.db.get_session import get_async_session, get_session
+from app.db.instrumentation import QueryStats, track_queries
+from app.db.models.user.user import ReadYourWrites, Student, Teacher, User
+from app.organization.model import OrganizationModel
+
+logger = logging.getLogger(__name__)
+
+# Looking up the user, organization, teacher, student and read pin one
+# at a time
+_SEPARATE_LOOKUPS = 5
+
+
+@dataclass
+class Principal:
+    """
+    The authenticated user with everything routes usually need
+    about them, loaded together.
+    """
+
+    user: User
+    organization: OrganizationModel
+    teacher: Optional[Teacher] = None
+    student: Optional[Student] = None
+    # Until when the user's reads skip the replicas, after a write
+    primary_reads_until: Optional[datetime] = None
+
+    def require_teacher(self) -> Teacher:
+        if not self.teacher:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Only teachers can do this.",
+            )
+        return self.teacher
+
+
+def _principal_statement(
+    user_id: Optional[int], claims: Optional[SessionClaims]
+) -> Select[Tuple[User, Optional[datetime]]]:
+    """
+    Joins the user's teacher and student, except for a role the user's
+    session token says they don't have. A role granted since the token
+    was issued shows once the token is refreshed.
+    """
+    statement = (
+        select(User, ReadYourWrites.until)
+        .join(User.organization)
+        .outerjoin(
+            ReadYourWrites,
+            col(ReadYourWrites.user_id) == col(User.id),
+        )
+        .options(contains_eager(User.organization))
+        .where(User.id == user_id)
+    )
+    roles = [
+        (User.teacher, claims is None or claims.teacher),
+        (User.student, claims is None or claims.student),
+    ]
+    for role, joined in roles:
+        if joined:
+            statement = statement.outerjoin(role).options(contains_eager(role))
+        else:
+            statement = statement.options(noload(role))
+    return statement
+
+
+def _track() -> ContextManager[Optional[QueryStats]]:
+    # Only counted in debug mode, where the count is logged
+    return track_queries() if settings.DEBUG else nullcontext()
+
+
+def _remember(
+    request: Request,
+    row: Optional[Tuple[User, Optional[datetime]]],
+    stats: Optional[QueryStats],
+) -> Principal:
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="User not found",
+        )
+    user, primary_reads_until = row
+    principal = Principal(
+        user=user,
+        organization=user.organization,
+        teacher=user.teacher,
+        student=user.student,
+        primary_reads_until=primary_reads_until,
+    )
+    request.state.principal = principal
+    if stats is not None:
+        logger.debug(
+            "Resolved principal for user %s in %s queries, saving %s",
+            user.id,
+            stats.statements,
+            _SEPARATE_LOOKUPS - stats.statements,
+        )
+    return principal
+
+
+async def get_principal(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+) -> Principal:
+    """
+    Loads the current user with its teacher, student and organization in
+    a single query. The result is kept on the request so any other code
+    handling it can reuse it.
+    """
+    principal: Optional[Principal] = getattr(request.state, "principal", None)
+    if principal:
+        return principal
+    claims = getattr(request.state, "session_claims", None)
+    statement = _principal_statement(current_user.id, claims)
+    with _track() as stats:
+        row = (await session.exec(statement)).first()
+    return _remember(request, row, stats)
+
+
+def get_sync_principal(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_session),
+) -> Principal:
+    """
+    get_principal for sync routes. It queries the request's sync session,
+    so those routes don't hold a connection from the async pool as well.
+    """
+    principal: Optional[Principal] = getattr(request.state, "principal", None)
+    if principal:
+        return principal
+    claims = getattr(request.state, "session_claims", None)
+    statement = _principal_statement(current_user.id, claims)
+    with _track() as stats:
+        row = session.exec(statement).first()
+    return _remember(request, row, stats)
@@ -1,12 +1,21 @@
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
+from google.auth import exceptions
 from pydantic import BaseModel
 
-from sqlmodel import Session
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.auth.get_current_org import get_current_organization
 from app.auth.get_current_user import get_google_user_from_token
+from app.auth.session_tokens import (
+    InvalidSessionToken,
+    SessionTokens,
+    decode_refresh_token,
+    issue_session_tokens,
+)
 from app.core.config import settings
-from app.db.get_session import get_session
+from app.db.get_session import get_async_session
 from app.db.models.user.user import User
 from app.organization.model import OrganizationModel
 
@@ -28,6 +37,11 @@ class CheckGoogleTokenBody(BaseModel):
 class CheckTokenResponse(BaseModel):
     details: User
     is_teacher: Optional[bool] = None
+    tokens: Optional[SessionTokens] = None
+
+
+class RefreshTokenBody(BaseModel):
+    refresh_token: str
 
 
 @auth_router.post(
@@ -35,7 +49,7 @@ class CheckTokenResponse(BaseModel):
 )
 async def check_google_token(
     body: CheckGoogleTokenBody,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     organization: OrganizationModel = Depends(get_current_organization),
 ):
     if not organization.id:
@@ -51,6 +65,8 @@ async def check_google_token(
         ):
             raise ValueError("Google details don't match")
 
+        is_teacher = bool(user and user.teacher)
+        is_student = bool(user and user.student)
         if not user:
             user = User.create_user(
                 name=google_info.name,
@@ -61,10 +77,49 @@ async def check_google_token(
             await user.save(session)
         if not user.id:
             raise ValueError("No user ID")
-        res = CheckTokenResponse(details=user, is_teacher=bool(user.teacher))
+        res = CheckTokenResponse(
+            details=user,
+            is_teacher=is_teacher,
+            tokens=issue_session_tokens(user, is_teacher, is_student),
+        )
         return res
-    except ValueError:
+    except exceptions.TransportError:
+        # Google's certs are unreachable, the token may well be valid
+        raise
+    except (ValueError, exceptions.GoogleAuthError):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Google token could not be authenticated",
         )
+
+
+@auth_router.post("/refresh", response_model=SessionTokens)
+async def refresh_session(
+    body: RefreshTokenBody,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Swaps a refresh token for a new pair of session tokens. The user is
+    loaded again so role changes are picked up.
+    """
+    try:
+        user_id = decode_refresh_token(body.refresh_token)
+    except InvalidSessionToken:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token could not be authenticated",
+        )
+    statement = (
+        select(User)
+        .where(User.id == user_id)
+        .options(selectinload(User.teacher), selectinload(User.student))
+    )
+    user = (await session.exec(statement)).first()
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Refresh token could not be authenticated",
+        )
+    return issue_session_tokens(
+        user, is_teacher=bool(user.teacher), is_student=bool(user.student)
+    )
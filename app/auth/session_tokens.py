@@ -0,0 +1,111 @@
+import hashlib
+from typing import Optional
+
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.db.models.user.user import User
+
+ACCESS_TOKEN_SALT = "access-token"
+REFRESH_TOKEN_SALT = "refresh-token"
+
+
+class InvalidSessionToken(ValueError):
+    pass
+
+
+class ExpiredSessionToken(InvalidSessionToken):
+    pass
+
+
+class SessionClaims(BaseModel):
+    """
+    What a signed session token says about its user. Enough to rebuild
+    the user for a request without going to the database.
+    """
+
+    uid: int
+    org: int
+    name: str
+    email: str
+    google_id: Optional[str] = None
+    teacher: bool = False
+    student: bool = False
+
+
+class SessionTokens(BaseModel):
+    access_token: str
+    refresh_token: str
+    token_type: str = "bearer"
+    expires_in: int
+
+
+def _serializer(salt: str) -> URLSafeTimedSerializer:
+    return URLSafeTimedSerializer(
+        settings.SESSION_SECRET_KEY,
+        salt=salt,
+        signer_kwargs={"digest_method": hashlib.sha256},
+    )
+
+
+def issue_session_tokens(
+    user: User, is_teacher: bool, is_student: bool
+) -> SessionTokens:
+    if not user.id:
+        raise InvalidSessionToken("Can't issue a token for an unsaved user")
+    claims = SessionClaims(
+        uid=user.id,
+        org=user.organization_id,
+        name=user.name,
+        email=user.email,
+        google_id=user.google_id,
+        teacher=is_teacher,
+        student=is_student,
+    )
+    return SessionTokens(
+        access_token=_serializer(ACCESS_TOKEN_SALT).dumps(claims.dict()),
+        refresh_token=_serializer(REFRESH_TOKEN_SALT).dumps({"uid": user.id}),
+        expires_in=settings.ACCESS_TOKEN_TTL,
+    )
+
+
+def _loads(token: str, salt: str, max_age: int) -> dict:
+    try:
+        return _serializer(salt).loads(token, max_age=max_age)
+    except SignatureExpired as e:
+        raise ExpiredSessionToken("Session token has expired") from e
+    except BadSignature as e:
+        raise InvalidSessionToken("Session token is not valid") from e
+
+
+def decode_access_token(
+    token: str, max_age: Optional[int] = None
+) -> SessionClaims:
+    return SessionClaims(
+        **_loads(token, ACCESS_TOKEN_SALT, max_age or settings.ACCESS_TOKEN_TTL)
+    )
+
+
+def decode_refresh_token(token: str, max_age: Optional[int] = None) -> int:
+    """
+    Returns the id of the user the refresh token was issued to
+    """
+    payload = _loads(
+        token, REFRESH_TOKEN_SALT, max_age or settings.REFRESH_TOKEN_TTL
+    )
+    return int(payload["uid"])
+
+
+def user_from_claims(claims: SessionClaims) -> User:
+    """
+    Builds a detached user from the token, for routes which only need
+    the user's own columns
+    """
+    return User(
+        id=claims.uid,
+        organization_id=claims.org,
+        name=claims.name,
+        email=claims.email,
+        google_id=claims.google_id,
+    )
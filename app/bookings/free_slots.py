@@ -0,0 +1,295 @@
+"""
+Finds which teachers are free for a given length of time inside a
+window. Each teacher's stored availability and rule occurrences are
+merged, their scheduled classes are taken out, and what is left is kept
+where the requested duration fits. The same few queries load every
+candidate teacher at once, however many there are, then each is swept
+once.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from sqlalchemy import func
+from sqlmodel import and_, col, or_, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.bookings.recurrence import Occurrence, expand_rule
+from app.bookings.types import FreeSlot, TeacherFreeSlots
+from app.db.models.course.course import ClassTeacher, CourseTeacher, LiveClass
+from app.db.models.user.user import (
+    Teacher,
+    TeacherAvailability,
+    TeacherAvailabilityRule,
+    User,
+)
+
+Interval = Occurrence
+
+# Length of the first search when looking for the top teachers
+PROBE = timedelta(days=1)
+
+
+def merged(
+    intervals: Iterable[Interval], start: datetime, end: datetime
+) -> List[Interval]:
+    """
+    The intervals clipped to [start, end), with overlapping and adjacent
+    ones joined, in order
+    """
+    joined: List[Interval] = []
+    for interval_start, interval_end in sorted(intervals):
+        interval_start = max(interval_start, start)
+        interval_end = min(interval_end, end)
+        if interval_start >= interval_end:
+            continue
+        if joined and interval_start <= joined[-1][1]:
+            if interval_end > joined[-1][1]:
+                joined[-1] = (joined[-1][0], interval_end)
+        else:
+            joined.append((interval_start, interval_end))
+    return joined
+
+
+def free_intervals(
+    available: Iterable[Interval],
+    busy: Iterable[Interval],
+    start: datetime,
+    end: datetime,
+) -> List[Interval]:
+    """
+    The parts of [start, end) covered by any available interval and by
+    no busy one, in order. Both are merged, then one pass over the two
+    sorted lists takes the busy time out.
+    """
+    free: List[Interval] = []
+    blocked = merged(busy, start, end)
+    i = 0
+    for free_start, free_end in merged(available, start, end):
+        # Busy time ending before this interval can't reach later ones
+        while i < len(blocked) and blocked[i][1] <= free_start:
+            i += 1
+        j = i
+        while j < len(blocked) and blocked[j][0] < free_end:
+            if blocked[j][0] > free_start:
+                free.append((free_start, blocked[j][0]))
+            free_start = max(free_start, blocked[j][1])
+            j += 1
+        if free_start < free_end:
+            free.append((free_start, free_end))
+    return free
+
+
+def long_enough(
+    free: Sequence[Interval], duration: timedelta
+) -> List[Interval]:
+    return [(start, end) for start, end in free if end - start >= duration]
+
+
+def rank(results: List[TeacherFreeSlots]) -> List[TeacherFreeSlots]:
+    """
+    Soonest available first, then whoever has the most free time
+    """
+    return sorted(
+        results,
+        key=lambda r: (r.earliest_start, -r.free_minutes, r.teacher_id),
+    )
+
+
+def _minutes(intervals: Iterable[Interval]) -> int:
+    total = sum((end - start for start, end in intervals), timedelta())
+    return int(total.total_seconds() // 60)
+
+
+async def _candidates(
+    session: AsyncSession,
+    organization_id: int,
+    teacher_ids: Optional[List[int]],
+) -> Dict[int, str]:
+    statement = (
+        select(Teacher.id, User.name)
+        .join(User, col(User.id) == col(Teacher.user_id))
+        .where(col(User.organization_id) == organization_id)
+    )
+    if teacher_ids:
+        statement = statement.where(col(Teacher.id).in_(teacher_ids))
+    return dict((await session.execute(statement)).all())
+
+
+async def _available(
+    session: AsyncSession,
+    teacher_ids: List[int],
+    start: datetime,
+    end: datetime,
+) -> Dict[int, List[Interval]]:
+    available: Dict[int, List[Interval]] = defaultdict(list)
+    # One row of arrays per teacher decodes far quicker than a row per
+    # availability
+    rows = await session.execute(
+        select(
+            TeacherAvailability.teacher_id,
+            func.array_agg(TeacherAvailability.start),
+            func.array_agg(TeacherAvailability.end),
+        )
+        .where(
+            col(TeacherAvailability.teacher_id).in_(teacher_ids),
+            TeacherAvailability.during_overlaps(start, end),
+        )
+        .group_by(TeacherAvailability.teacher_id)
+    )
+    for teacher_id, starts, ends in rows:
+        available[teacher_id] += zip(starts, ends)
+
+    rules = await session.exec(
+        select(TeacherAvailabilityRule).where(
+            col(TeacherAvailabilityRule.teacher_id).in_(teacher_ids),
+            col(TeacherAvailabilityRule.dtstart) < end,
+            or_(
+                col(TeacherAvailabilityRule.until).is_(None),
+                col(TeacherAvailabilityRule.until) > start,
+            ),
+        )
+    )
+    for rule in rules:
+        # Widened by one occurrence, so those running across either end
+        # of the window are expanded too and then clipped. Expanded
+        # without the recurrence cache: searches cover arbitrary windows
+        # no other read repeats, and would evict the availability
+        # route's entries.
+        duration = timedelta(minutes=rule.duration)
+        available[rule.teacher_id] += expand_rule(
+            rule, start - duration, end + duration
+        )
+    return available
+
+
+async def _busy(
+    session: AsyncSession,
+    teacher_ids: List[int],
+    start: datetime,
+    end: datetime,
+) -> Dict[int, List[Interval]]:
+    busy: Dict[int, List[Interval]] = defaultdict(list)
+    rows = await session.execute(
+        select(
+            CourseTeacher.teacher_id,
+            func.array_agg(LiveClass.start),
+            func.array_agg(LiveClass.end),
+        )
+        .join(ClassTeacher, col(ClassTeacher.class_id) == col(LiveClass.id))
+        .join(
+            CourseTeacher,
+            col(CourseTeacher.id) == col(ClassTeacher.course_teacher_id),
+        )
+        .where(
+            and_(
+                col(CourseTeacher.teacher_id).in_(teacher_ids),
+                col(LiveClass.start) < end,
+                col(LiveClass.end) > start,
+            )
+        )
+        .group_by(CourseTeacher.teacher_id)
+    )
+    for teacher_id, starts, ends in rows:
+        busy[teacher_id] += zip(starts, ends)
+    return busy
+
+
+async def _search(
+    session: AsyncSession,
+    teacher_ids: List[int],
+    start: datetime,
+    end: datetime,
+    duration: timedelta,
+) -> Dict[int, List[Interval]]:
+    """
+    Free intervals fitting ``duration`` of each teacher who has any
+    """
+    available = await _available(session, teacher_ids, start, end)
+    busy = await _busy(session, list(available), start, end)
+    found = {}
+    for teacher_id, intervals in available.items():
+        free = free_intervals(intervals, busy.get(teacher_id, []), start, end)
+        slots = long_enough(free, duration)
+        if slots:
+            found[teacher_id] = slots
+    return found
+
+
+async def _leaders(
+    session: AsyncSession,
+    teacher_ids: List[int],
+    start: datetime,
+    end: datetime,
+    duration: timedelta,
+    limit: int,
+) -> List[int]:
+    """
+    Teachers who rank ahead of everyone else, at least ``limit`` of
+    them, found by searching the start of the window only. It doubles
+    from a day until enough teachers are free early in it.
+    """
+    probe = PROBE
+    while start + probe < end:
+        probe_end = start + probe
+        # A slot starting by then fits inside the probe, so is found.
+        # Teachers without one all start later and rank behind.
+        settled = probe_end - duration
+        found = await _search(session, teacher_ids, start, probe_end, duration)
+        starts = sorted(
+            slots[0][0] for slots in found.values() if slots[0][0] <= settled
+        )
+        if len(starts) >= limit:
+            # Those starting after the limit-th can't make the cut, ties
+            # with it can on free time
+            return [
+                teacher_id
+                for teacher_id, slots in found.items()
+                if slots[0][0] <= starts[limit - 1]
+            ]
+        probe *= 2
+    return teacher_ids
+
+
+async def find_free_slots(
+    session: AsyncSession,
+    organization_id: int,
+    start: datetime,
+    end: datetime,
+    duration: timedelta,
+    teacher_ids: Optional[List[int]] = None,
+    limit: Optional[int] = None,
+) -> List[TeacherFreeSlots]:
+    """
+    Teachers of the organization with time free for ``duration`` inside
+    [start, end), ranked, with the slots they have free. With a
+    ``limit``, only the teachers who can make it are read for the whole
+    window.
+    """
+    names = await _candidates(session, organization_id, teacher_ids)
+    if not names:
+        return []
+    candidates = list(names)
+    if limit is not None and len(candidates) > limit:
+        candidates = await _leaders(
+            session, candidates, start, end, duration, limit
+        )
+    found = await _search(session, candidates, start, end, duration)
+    results = rank(
+        [
+            TeacherFreeSlots(
+                teacher_id=teacher_id,
+                name=names[teacher_id],
+                earliest_start=slots[0][0],
+                free_minutes=_minutes(slots),
+            )
+            for teacher_id, slots in found.items()
+        ]
+    )[:limit]
+    # Only built for the teachers returned, there can be many slots
+    for result in results:
+        result.slots = [
+            FreeSlot(start=s, end=e, latest_start=e - duration)
+            for s, e in found[result.teacher_id]
+        ]
+    return results
@@ -0,0 +1,208 @@
+import heapq
+import threading
+from datetime import datetime, timedelta
+from itertools import dropwhile
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from uuid import UUID, uuid5
+
+from cachetools import LRUCache
+from dateutil.rrule import rrulestr
+from sqlmodel import and_, col, or_, select
+from sqlmodel.sql.expression import SelectOfScalar
+
+from app.core.config import settings
+from app.bookings.types import AvailabilityRead
+from app.db.models.user.user import TeacherAvailabilityRule
+
+Occurrence = Tuple[datetime, datetime]
+
+
+def occurrence_id(rule_id: UUID, start: datetime) -> UUID:
+    """
+    Id of a rule occurrence, the same on every read. Version 5, unlike
+    the version 4 ids of stored availability.
+    """
+    return uuid5(rule_id, start.isoformat())
+
+
+def is_occurrence_id(id: UUID) -> bool:
+    return id.version == 5
+
+
+def availability_sort_key(availability: AvailabilityRead) -> Tuple:
+    return (availability.start, availability.id)
+
+
+def availability_rules_statement(
+    teacher_id: int, start: datetime, end: datetime
+) -> SelectOfScalar[TeacherAvailabilityRule]:
+    """
+    A teacher's rules which may have occurrences inside [start, end)
+    """
+    return select(TeacherAvailabilityRule).where(
+        and_(
+            col(TeacherAvailabilityRule.teacher_id) == teacher_id,
+            col(TeacherAvailabilityRule.dtstart) < end,
+            or_(
+                col(TeacherAvailabilityRule.until).is_(None),
+                col(TeacherAvailabilityRule.until) > start,
+            ),
+        )
+    )
+
+
+def expand_rule(
+    rule: TeacherAvailabilityRule, start: datetime, end: datetime
+) -> Iterator[Occurrence]:
+    """
+    Lazily yields the occurrences of a rule lying inside [start, end)
+    """
+    duration = timedelta(minutes=rule.duration)
+    last_start = end if rule.until is None else min(end, rule.until)
+    excluded = set(rule.exdates)
+    series = rrulestr(rule.rrule, dtstart=rule.dtstart)
+    for occurrence_start in series.xafter(start, inc=True):
+        occurrence_end = occurrence_start + duration
+        # Every occurrence lasts as long, so none after this one fits
+        if occurrence_start >= last_start or occurrence_end > end:
+            return
+        if occurrence_start not in excluded:
+            yield occurrence_start, occurrence_end
+
+
+class _Expansion:
+    """
+    Occurrences of one rule in one window. They are expanded as far as
+    a reader asks for and kept for the next reader.
+    """
+
+    def __init__(self, source: Iterator[Occurrence]) -> None:
+        self._source = source
+        self._expanded: List[Occurrence] = []
+        self._done = False
+        self._lock = threading.Lock()
+
+    def __iter__(self) -> Iterator[Occurrence]:
+        index = 0
+        while True:
+            if index < len(self._expanded):
+                yield self._expanded[index]
+                index += 1
+                continue
+            with self._lock:
+                if index < len(self._expanded):
+                    continue
+                if self._done:
+                    return
+                try:
+                    self._expanded.append(next(self._source))
+                except StopIteration:
+                    self._done = True
+
+
+class RecurrenceCache:
+    """
+    Bounded per process memo of rule expansions. Routes cap the window,
+    with AVAILABILITY_MAX_DAYS, which bounds the size of each entry.
+
+    Entries are keyed on the content of the rule as well as the window,
+    so an edited rule is simply expanded again and the stale entry
+    ages out.
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._cache: LRUCache = LRUCache(maxsize=maxsize)
+
+    @staticmethod
+    def _key(
+        rule: TeacherAvailabilityRule, start: datetime, end: datetime
+    ) -> Tuple:
+        return (
+            rule.id,
+            rule.rrule,
+            rule.dtstart,
+            rule.duration,
+            rule.until,
+            tuple(sorted(rule.exdates)),
+            start,
+            end,
+        )
+
+    def occurrences(
+        self, rule: TeacherAvailabilityRule, start: datetime, end: datetime
+    ) -> Iterator[Occurrence]:
+        key = self._key(rule, start, end)
+        with self._lock:
+            expansion: Optional[_Expansion] = self._cache.get(key)
+            if expansion is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+                expansion = _Expansion(expand_rule(rule, start, end))
+                self._cache[key] = expansion
+        return iter(expansion)
+
+    def availability(
+        self, rule: TeacherAvailabilityRule, start: datetime, end: datetime
+    ) -> Iterator[AvailabilityRead]:
+        """
+        Occurrences of the rule inside [start, end) as availability.
+        Ids are derived from the rule and the start, so they are the
+        same on every read.
+        """
+        for occurrence_start, occurrence_end in self.occurrences(
+            rule, start, end
+        ):
+            yield AvailabilityRead(
+                id=occurrence_id(rule.id, occurrence_start),
+                type="recurring",
+                title=rule.title,
+                start=occurrence_start,
+                end=occurrence_end,
+                teacher_id=rule.teacher_id,
+                rule_id=rule.id,
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+recurrence_cache = RecurrenceCache(maxsize=settings.RECURRENCE_CACHE_SIZE)
+
+
+def merge_availability(
+    rows: Iterable[AvailabilityRead],
+    rules: Iterable[TeacherAvailabilityRule],
+    start: datetime,
+    end: datetime,
+    after: Optional[Tuple[datetime, UUID]] = None,
+) -> Iterator[AvailabilityRead]:
+    """
+    Merges stored availability, already in (start, id) order, with the
+    occurrences of the rules inside [start, end). Only what is consumed
+    gets expanded. Pass the sort key of a cursor as ``after`` to skip
+    everything up to and including it.
+    """
+    streams: List[Iterable[AvailabilityRead]] = [rows]
+    for rule in rules:
+        occurrences = recurrence_cache.availability(rule, start, end)
+        if after is not None:
+            occurrences = dropwhile(
+                lambda a: availability_sort_key(a) <= after, occurrences
+            )
+        streams.append(occurrences)
+    return heapq.merge(*streams, key=availability_sort_key)
@@ -1,21 +1,56 @@
-from typing import List
-from sqlalchemy import and_
-from app.auth.get_current_user import get_current_user
+from itertools import islice
+from typing import List, Optional, Union
+from uuid import UUID
+from sqlalchemy import tuple_
+from app.auth.principal import Principal, get_principal
+from app.bookings.free_slots import find_free_slots
+from app.bookings.recurrence import (
+    availability_rules_statement,
+    merge_availability,
+)
+from app.bookings.streaming import NDJSON_MEDIA_TYPE, stream_availability
 from app.bookings.types import (
+    AvailabilityRead,
+    AvailabilitySaveResult,
     PostAvailabilityPayload,
     PostAvailabilityPayloadEvent,
+    PostAvailabilityRuleExceptionPayload,
+    PostAvailabilityRulePayload,
+    TeacherFreeSlots,
+)
+from app.bookings.utils import (
+    availability_read_statement,
+    commit_availability,
+    get_teacher_rule,
+    read_availability,
+    save_availability,
+    touch_availability,
 )
-from app.bookings.utils import clear_availability
-from app.db.get_session import get_session
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, col, select
+from app.core.config import settings
+from app.db.get_session import get_async_session, is_replica
+from app.db.replicas import get_async_read_session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
+from pydantic import validator
+from sqlmodel import col, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.db.models.user.user import (
+    Teacher,
     TeacherAvailability,
+    TeacherAvailabilityRule,
 )
-from datetime import datetime
+from datetime import datetime, timedelta
 
-from app.db.models.user.user import User, Teacher
-from app.utils.params import ListAPIParams
+from app.utils.dates import to_naive_utc
+from app.utils.etag import etag_matches, not_modified, weak_etag, with_etag
+from app.utils.responses import ORJSONResponse
+from app.utils.params import (
+    CursorPage,
+    ListAPIParams,
+    build_params,
+    decode_cursor,
+    to_cursor_page,
+)
 
 booking_router = APIRouter(
     prefix="/bookings",
@@ -28,80 +63,167 @@ booking_router = APIRouter(
 class ListBookingsParams(ListAPIParams):
     from_date: datetime
     until_date: datetime
+    stream: bool = False
+
+    _naive_utc = validator("from_date", "until_date", allow_reuse=True)(
+        to_naive_utc
+    )
 
 
 async def list_bookings_params(
-    from_date: datetime, until_date: datetime, limit: int = 100, page: int = 0
-):
-    try:
-        params = ListBookingsParams(
-            from_date=from_date, until_date=until_date, limit=limit, page=page
-        )
-        return params
-    except Exception as e:
-        print(e)
+    from_date: datetime,
+    until_date: datetime,
+    limit: int = 100,
+    page: int = 0,
+    cursor: Optional[str] = None,
+    stream: bool = False,
+) -> ListBookingsParams:
+    return build_params(
+        ListBookingsParams,
+        from_date=from_date,
+        until_date=until_date,
+        limit=limit,
+        page=page,
+        cursor=cursor,
+        stream=stream,
+    )
 
 
 @booking_router.get(
-    "/teacher-availability", response_model=List[TeacherAvailability]
+    "/teacher-availability",
+    response_model=Union[List[AvailabilityRead], CursorPage[AvailabilityRead]],
 )
 async def get_availiability(
-    current_user: User = Depends(get_current_user),
+    request: Request,
+    principal: Principal = Depends(get_principal),
     params: ListBookingsParams = Depends(list_bookings_params),
-    session: Session = Depends(get_session),
-) -> List[TeacherAvailability]:
-    statement = (
-        select(TeacherAvailability)
-        .join(Teacher)
-        .join(User)
-        .where(
-            and_(
-                col(User.id) == current_user.id,
-                col(TeacherAvailability.end) < params.until_date,
-                col(TeacherAvailability.start) > params.from_date,
+    session: AsyncSession = Depends(get_async_read_session),
+) -> Response:
+    """
+    Availability of the current teacher inside the window, ordered by
+    start, including occurrences of their recurring rules. Returns a
+    CursorPage when a cursor is passed.
+
+    ``stream=true`` sends the whole window as NDJSON, one availability
+    per line, read through a server side cursor. Paging is ignored.
+
+    Responses carry an ETag of the teacher's availability revision, and
+    a matching If-None-Match gets a 304 without reading any rows.
+    """
+    max_days = settings.AVAILABILITY_MAX_DAYS
+    # Rules are expanded, and their occurrences cached, over the window
+    if params.until_date - params.from_date > timedelta(days=max_days):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"Read at most {max_days} days of availability",
+        )
+    teacher = principal.teacher
+    version = (teacher.id, teacher.availability_revision) if teacher else ()
+    if teacher and is_replica(session):
+        # Tagged with the revision the replica has caught up to, so a
+        # lagging replica never serves old rows under a new ETag
+        statement = select(Teacher.availability_revision).where(
+            col(Teacher.id) == teacher.id
+        )
+        version = (teacher.id, (await session.exec(statement)).first())
+    etag = weak_etag(request, *version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    if not teacher or not teacher.id:
+        if params.stream:
+            response: Response = StreamingResponse(
+                iter([]), media_type=NDJSON_MEDIA_TYPE
+            )
+        else:
+            response = ORJSONResponse(
+                CursorPage(items=[]) if params.use_cursor else []
+            )
+    else:
+        response = await availability_response(session, teacher.id, params)
+    return with_etag(response, etag)
+
+
+async def availability_response(
+    session: AsyncSession, teacher_id: int, params: ListBookingsParams
+) -> Response:
+    statement = availability_read_statement(
+        teacher_id, params.from_date, params.until_date
+    )
+    rules = (
+        await session.exec(
+            availability_rules_statement(
+                teacher_id, params.from_date, params.until_date
             )
         )
-        .offset(params.limit * (params.page))
-        .limit(params.limit)
+    ).all()
+    if params.stream:
+        return StreamingResponse(
+            stream_availability(
+                session,
+                statement,
+                rules,
+                params.from_date,
+                params.until_date,
+                settings.AVAILABILITY_STREAM_BATCH_SIZE,
+            ),
+            media_type=NDJSON_MEDIA_TYPE,
+        )
+    if not params.use_cursor:
+        if not rules:
+            statement = statement.offset(params.offset).limit(params.limit)
+            return ORJSONResponse(await read_availability(session, statement))
+        # Occurrences can fall on any page, so every row up to the end
+        # of this page is needed for the merge
+        end = params.offset + params.limit
+        rows = await read_availability(session, statement.limit(end))
+        merged = merge_availability(
+            rows, rules, params.from_date, params.until_date
+        )
+        return ORJSONResponse(list(islice(merged, params.offset, end)))
+
+    after = None
+    if params.cursor:
+        after = tuple(
+            decode_cursor(params.cursor, datetime.fromisoformat, UUID)
+        )
+        statement = statement.where(
+            tuple_(col(TeacherAvailability.start), col(TeacherAvailability.id))
+            > tuple_(*after)
+        )
+    rows = await read_availability(session, statement.limit(params.limit + 1))
+    merged = merge_availability(
+        rows, rules, params.from_date, params.until_date, after
     )
-    availability = session.exec(statement).all()
-    return availability
+    page = to_cursor_page(
+        list(islice(merged, params.limit + 1)),
+        params.limit,
+        lambda row: (row.start.isoformat(), row.id),
+    )
+    return ORJSONResponse(page)
 
 
 @booking_router.post(
-    "/teacher-availability", response_model=List[TeacherAvailability]
+    "/teacher-availability", response_model=AvailabilitySaveResult
 )
 async def create_availability(
     payload: PostAvailabilityPayload,
-    current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
+    principal: Principal = Depends(get_principal),
+    session: AsyncSession = Depends(get_async_session),
 ):
-    if not current_user.id:
-        raise Exception()
-    teacher = Teacher.get_teacher_by_user_id(
-        session=session, user_id=current_user.id
-    )
-
-    await clear_availability(
+    """
+    Replaces the current teacher's availability inside the timeframe
+    with the events, writing only what changed
+    """
+    teacher = principal.require_teacher()
+    result = await save_availability(
         session=session,
         teacher_id=teacher.id,
-        start=payload.timeframe.start,
-        end=payload.timeframe.end,
+        timeframe=payload.timeframe,
+        events=payload.events,
     )
-
-    availabilities = [
-        TeacherAvailability(
-            id=event.id,
-            start=event.start,
-            end=event.end,
-            teacher_id=teacher.id,
-        )
-        for event in payload.events
-    ]
-
-    session.add_all(availabilities)
-    session.commit()
-    return availabilities
+    await touch_availability(session, teacher.id)
+    await commit_availability(session)
+    return result
 
 
 @booking_router.delete(
@@ -110,15 +232,11 @@ async def create_availability(
 )
 async def delete_availability(
     availability_id: str,
-    current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
+    principal: Principal = Depends(get_principal),
+    session: AsyncSession = Depends(get_async_session),
 ):
-    if not current_user.id:
-        raise Exception()
-    teacher = Teacher.get_teacher_by_user_id(
-        session=session, user_id=current_user.id
-    )
-    availability = session.get(TeacherAvailability, availability_id)
+    teacher = principal.require_teacher()
+    availability = await session.get(TeacherAvailability, availability_id)
     if not availability:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -129,8 +247,9 @@ async def delete_availability(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have permission to delete this.",
         )
-    session.delete(availability)
-    session.commit()
+    await session.delete(availability)
+    await touch_availability(session, teacher.id)
+    await session.commit()
 
 
 @booking_router.put(
@@ -139,15 +258,11 @@ async def delete_availability(
 async def update_availability(
     availability_id: str,
     payload: PostAvailabilityPayloadEvent,
-    current_user: User = Depends(get_current_user),
-    session: Session = Depends(get_session),
+    principal: Principal = Depends(get_principal),
+    session: AsyncSession = Depends(get_async_session),
 ):
-    if not current_user.id:
-        raise Exception()
-    teacher = Teacher.get_teacher_by_user_id(
-        session=session, user_id=current_user.id
-    )
-    availability = session.get(TeacherAvailability, availability_id)
+    teacher = principal.require_teacher()
+    availability = await session.get(TeacherAvailability, availability_id)
     if not availability:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -159,5 +274,122 @@ async def update_availability(
             detail="You don't have permission to delete this.",
         )
     availability.update(payload)
-    await availability.save(session)
-    return session.get(TeacherAvailability, availability_id)
+    session.add(availability)
+    await touch_availability(session, teacher.id)
+    await commit_availability(session)
+    return await session.get(TeacherAvailability, availability_id)
+
+
+@booking_router.get(
+    "/teacher-availability-rules",
+    response_model=List[TeacherAvailabilityRule],
+)
+async def list_availability_rules(
+    principal: Principal = Depends(get_principal),
+    session: AsyncSession = Depends(get_async_read_session),
+):
+    teacher = principal.require_teacher()
+    statement = (
+        select(TeacherAvailabilityRule)
+        .where(col(TeacherAvailabilityRule.teacher_id) == teacher.id)
+        .order_by(col(TeacherAvailabilityRule.dtstart))
+    )
+    return (await session.exec(statement)).all()
+
+
+@booking_router.post(
+    "/teacher-availability-rules", response_model=TeacherAvailabilityRule
+)
+async def create_availability_rule(
+    payload: PostAvailabilityRulePayload,
+    principal: Principal = Depends(get_principal),
+    session: AsyncSession = Depends(get_async_session),
+):
+    teacher = principal.require_teacher()
+    rule = TeacherAvailabilityRule(teacher_id=teacher.id, **payload.dict())
+    await touch_availability(session, teacher.id)
+    await rule.save(session)
+    return rule
+
+
+@booking_router.post(
+    "/teacher-availability-rules/{rule_id}/exceptions",
+    response_model=TeacherAvailabilityRule,
+)
+async def add_availability_rule_exception(
+    rule_id: UUID,
+    payload: PostAvailabilityRuleExceptionPayload,
+    principal: Principal = Depends(get_principal),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """
+    Skips the occurrence of the rule starting at ``start``
+    """
+    teacher = principal.require_teacher()
+    rule = await get_teacher_rule(session, rule_id, teacher.id)
+    if payload.start not in rule.exdates:
+        # Reassigned rather than appended so the change is detected
+        rule.exdates = [*rule.exdates, payload.start]
+        await touch_availability(session, teacher.id)
+        await rule.save(session)
+    return rule
+
+
+@booking_router.delete(
+    "/teacher-availability-rules/{rule_id}",
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def delete_availability_rule(
+    rule_id: UUID,
+    principal: Principal = Depends(get_principal),
+    session: AsyncSession = Depends(get_async_session),
+):
+    teacher = principal.require_teacher()
+    rule = await get_teacher_rule(session, rule_id, teacher.id)
+    await touch_availability(session, teacher.id)
+    await rule.delete(session)
+
+
+@booking_router.get("/free-slots", response_model=List[TeacherFreeSlots])
+async def search_free_slots(
+    from_date: datetime,
+    until_date: datetime,
+    duration: int = 60,
+    teacher_ids: Optional[List[int]] = Query(None),
+    limit: int = 20,
+    principal: Principal = Depends(get_principal),
+    session: AsyncSession = Depends(get_async_read_session),
+) -> Response:
+    """
+    Teachers of the organization free for ``duration`` minutes somewhere
+    inside the window, soonest first and then by most free time, each
+    with the slots a session could be booked in. Time taken by their
+    scheduled classes is not free.
+    """
+    from_date = to_naive_utc(from_date)
+    until_date = to_naive_utc(until_date)
+    if until_date <= from_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="until_date must be after from_date",
+        )
+    if until_date - from_date > timedelta(days=settings.FREE_SLOTS_MAX_DAYS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Search at most {settings.FREE_SLOTS_MAX_DAYS} days",
+        )
+    if duration <= 0 or limit <= 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="duration and limit must be positive",
+        )
+    results = await find_free_slots(
+        session,
+        principal.organization.id,
+        from_date,
+        until_date,
+        timedelta(minutes=duration),
+        teacher_ids=teacher_ids,
+        limit=limit,
+    )
+    return ORJSONResponse(results)
@@ -0,0 +1,50 @@
+from datetime import datetime
+from itertools import islice
+from typing import AsyncIterator, Iterable, List
+
+from sqlalchemy.sql import Select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.bookings.recurrence import availability_sort_key, merge_availability
+from app.bookings.types import AvailabilityRead
+from app.db.models.user.user import TeacherAvailabilityRule
+from app.utils.responses import dumps
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+
+def _ndjson(items: List[AvailabilityRead]) -> bytes:
+    return b"".join(dumps(item) + b"\n" for item in items)
+
+
+async def stream_availability(
+    session: AsyncSession,
+    statement: Select,
+    rules: Iterable[TeacherAvailabilityRule],
+    start: datetime,
+    end: datetime,
+    batch_size: int,
+) -> AsyncIterator[bytes]:
+    """
+    Availability read by ``statement`` merged with the occurrences of
+    the rules, as NDJSON. Rows come from a server side cursor
+    ``batch_size`` at a time and each batch is sent as one chunk, so
+    memory doesn't grow with the size of the window.
+    """
+    occurrences = merge_availability([], rules, start, end)
+    pending = next(occurrences, None)
+    result = await session.stream(statement)
+    async for rows in result.partitions(batch_size):
+        batch: List[AvailabilityRead] = []
+        for row in rows:
+            availability = AvailabilityRead(*row)
+            key = availability_sort_key(availability)
+            while pending is not None and availability_sort_key(pending) < key:
+                batch.append(pending)
+                pending = next(occurrences, None)
+            batch.append(availability)
+        yield _ndjson(batch)
+    while pending is not None:
+        batch = [pending, *islice(occurrences, batch_size - 1)]
+        pending = next(occurrences, None)
+        yield _ndjson(batch)
@@ -1,14 +1,22 @@
+from dataclasses import dataclass, field
 from datetime import datetime
 from typing import List, Optional, Union
-from pydantic import UUID4, BaseModel, validator
+from uuid import UUID
+from dateutil.rrule import HOURLY, rrulestr
+from pydantic import UUID4, UUID5, BaseModel, conint, validator
+
+from app.utils.dates import to_naive_utc
 
 
 class PostAvailabilityPayloadEvent(BaseModel):
-    id: UUID4
+    # Version 5 ids are occurrences of a rule, which are never stored
+    id: Union[UUID4, UUID5]
     title: Optional[str] = None
     start: datetime
     end: datetime
 
+    _naive_utc = validator("start", "end", allow_reuse=True)(to_naive_utc)
+
     @validator("end")
     def end_is_after_start(cls, end: datetime, values: dict):
         start: Union[datetime, None] = values.get("start")
@@ -23,7 +31,100 @@ class PostAvailabilityPayloadTimeframe(BaseModel):
     start: datetime
     end: datetime
 
+    _naive_utc = validator("start", "end", allow_reuse=True)(to_naive_utc)
+
 
 class PostAvailabilityPayload(BaseModel):
     timeframe: PostAvailabilityPayloadTimeframe
     events: List[PostAvailabilityPayloadEvent]
+
+    @validator("events")
+    def event_ids_are_unique(cls, events: List[PostAvailabilityPayloadEvent]):
+        if len({event.id for event in events}) < len(events):
+            raise ValueError("event ids must be unique")
+        return events
+
+
+class AvailabilitySaveResult(BaseModel):
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    unchanged: int = 0
+    # Rule occurrences sent back with the window, left to their rule
+    ignored: int = 0
+
+
+class PostAvailabilityRulePayload(BaseModel):
+    title: str = "available"
+    dtstart: datetime
+    rrule: str
+    duration: conint(gt=0, le=24 * 60)  # type: ignore
+    until: Optional[datetime] = None
+    exdates: List[datetime] = []
+
+    _naive_utc = validator("dtstart", "until", allow_reuse=True)(to_naive_utc)
+    _naive_utc_exdates = validator("exdates", each_item=True, allow_reuse=True)(
+        to_naive_utc
+    )
+
+    @validator("rrule")
+    def rrule_is_valid(cls, rrule: str, values: dict):
+        dtstart: Union[datetime, None] = values.get("dtstart")
+        if not dtstart:
+            raise ValueError("No dtstart")
+        try:
+            series = rrulestr(rrule, dtstart=dtstart, forceset=True)
+        except (ValueError, TypeError) as e:
+            raise ValueError(f"Invalid rrule: {e}")
+        # Every occurrence becomes a slot, so a minutely rule would flood
+        # each expansion; dateutil orders frequencies YEARLY..SECONDLY
+        if any(r._freq > HOURLY for r in series._rrule):
+            raise ValueError("Invalid rrule: FREQ must be HOURLY or longer")
+        return rrule
+
+
+class PostAvailabilityRuleExceptionPayload(BaseModel):
+    start: datetime
+
+    _naive_utc = validator("start", allow_reuse=True)(to_naive_utc)
+
+
+@dataclass
+class AvailabilityRead:
+    """
+    Availability as returned by the API. A plain dataclass, so listings
+    of thousands of slots are encoded by orjson without any validation.
+
+    Occurrences of a recurring rule carry its ``rule_id`` and a version 5
+    id derived from it. They aren't stored rows, the rule is changed
+    instead.
+    """
+
+    id: UUID
+    type: str
+    start: datetime
+    end: datetime
+    teacher_id: int
+    title: Optional[str]
+    rule_id: Optional[UUID] = None
+
+
+@dataclass
+class FreeSlot:
+    """
+    Free time in which a session of the requested duration can start
+    anywhere up to ``latest_start``
+    """
+
+    start: datetime
+    end: datetime
+    latest_start: datetime
+
+
+@dataclass
+class TeacherFreeSlots:
+    teacher_id: int
+    name: str
+    earliest_start: datetime
+    free_minutes: int
+    slots: List[FreeSlot] = field(default_factory=list)
@@ -1,18 +1,212 @@
+from dataclasses import fields
 from datetime import datetime
+from typing import List
+from uuid import UUID
 
-from sqlmodel import Session, and_, col, delete
+from fastapi import HTTPException, status
+from sqlalchemy import literal_column
+from sqlalchemy.sql import Select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import and_, col, delete, select
+from sqlmodel.sql.expression import SelectOfScalar
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from app.db.models.user.user import TeacherAvailability
+from app.bookings.recurrence import is_occurrence_id
+from app.bookings.types import (
+    AvailabilityRead,
+    AvailabilitySaveResult,
+    PostAvailabilityPayloadEvent,
+    PostAvailabilityPayloadTimeframe,
+)
+from app.db.models.user.user import (
+    Teacher,
+    TeacherAvailability,
+    TeacherAvailabilityRule,
+)
+from app.db.revision import bump_revision
 
 
-async def clear_availability(
-    session: Session, teacher_id: int, start: datetime, end: datetime
-):
-    statement = delete(TeacherAvailability).where(
-        and_(
-            col(TeacherAvailability.teacher_id) == teacher_id,
-            col(TeacherAvailability.start) > start,
-            col(TeacherAvailability.end) < end,
+def availability_window_statement(
+    teacher_id: int, start: datetime, end: datetime
+) -> SelectOfScalar[TeacherAvailability]:
+    """
+    A teacher's availability lying inside [start, end), in start order
+    """
+    return (
+        select(TeacherAvailability)
+        .where(
+            and_(
+                col(TeacherAvailability.teacher_id) == teacher_id,
+                TeacherAvailability.during_within(start, end),
+            )
         )
+        .order_by(col(TeacherAvailability.start), col(TeacherAvailability.id))
     )
-    session.exec(statement)  # type: ignore
+
+
+def availability_read_statement(
+    teacher_id: int, start: datetime, end: datetime
+) -> Select:
+    """
+    availability_window_statement reading only the columns of
+    AvailabilityRead, in field order
+    """
+    return availability_window_statement(
+        teacher_id, start, end
+    ).with_only_columns(
+        *(
+            getattr(TeacherAvailability, f.name)
+            for f in fields(AvailabilityRead)
+            if f.name != "rule_id"
+        )
+    )
+
+
+async def read_availability(
+    session: AsyncSession, statement: Select
+) -> List[AvailabilityRead]:
+    rows = (await session.execute(statement)).all()
+    return [AvailabilityRead(*row) for row in rows]
+
+
+async def save_availability(
+    session: AsyncSession,
+    teacher_id: int,
+    timeframe: PostAvailabilityPayloadTimeframe,
+    events: List[PostAvailabilityPayloadEvent],
+) -> AvailabilitySaveResult:
+    """
+    Makes the teacher's availability inside the timeframe match the
+    events. Only the difference is written: one delete for the rows
+    which are gone and one upsert for the new or changed events.
+    Occurrences of rules are ignored, so a window read back unchanged
+    doesn't store copies of them. Nothing is committed.
+    """
+    ignored = sum(is_occurrence_id(event.id) for event in events)
+    events = [event for event in events if not is_occurrence_id(event.id)]
+    window = availability_window_statement(
+        teacher_id, timeframe.start, timeframe.end
+    )
+    # Rows stored without a title count as "available", like events
+    # sent without one
+    stored = {
+        row.id: (row.start, row.end, row.title or "available")
+        for row in (
+            await session.execute(
+                window.with_only_columns(
+                    TeacherAvailability.id,  # type: ignore
+                    TeacherAvailability.start,
+                    TeacherAvailability.end,
+                    TeacherAvailability.title,
+                )
+            )
+        ).all()
+    }
+    incoming = {
+        event.id: (event.start, event.end, event.title or "available")
+        for event in events
+    }
+    changed = [
+        {
+            "id": id,
+            "type": "available",
+            "start": start,
+            "end": end,
+            "title": title,
+            "teacher_id": teacher_id,
+        }
+        for id, (start, end, title) in incoming.items()
+        if stored.get(id) != (start, end, title)
+    ]
+    gone = [id for id in stored if id not in incoming]
+    result = AvailabilitySaveResult(
+        unchanged=len(incoming) - len(changed),
+        deleted=len(gone),
+        ignored=ignored,
+    )
+
+    if gone:
+        await session.execute(
+            delete(TeacherAvailability)
+            .where(
+                and_(
+                    col(TeacherAvailability.teacher_id) == teacher_id,
+                    col(TeacherAvailability.id).in_(gone),
+                )
+            )
+            .execution_options(synchronize_session=False)
+        )
+    if changed:
+        table = TeacherAvailability.__table__  # type: ignore
+        statement = insert(table).values(changed)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={
+                "start": statement.excluded.start,
+                "end": statement.excluded.end,
+                "title": statement.excluded.title,
+            },
+            # Never take over another teacher's slot
+            where=table.c.teacher_id == statement.excluded.teacher_id,
+        ).returning(literal_column("xmax = 0"))
+        # xmax is only 0 for rows the statement inserted
+        written = (await session.execute(statement)).scalars().all()
+        if len(written) < len(changed):
+            await session.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="You don't have permission to change this.",
+            )
+        result.inserted = sum(written)
+        result.updated = len(written) - result.inserted
+    return result
+
+
+async def touch_availability(session: AsyncSession, teacher_id: int) -> None:
+    """
+    Bumps the teacher's availability revision, so clients holding an old
+    copy of their availability refetch it
+    """
+    await session.execute(
+        bump_revision(
+            Teacher.availability_revision, col(Teacher.id) == teacher_id
+        )
+    )
+
+
+async def commit_availability(session: AsyncSession) -> None:
+    """
+    Commits availability changes, turning a breach of the no overlap
+    constraint into a 409
+    """
+    try:
+        await session.commit()
+    except IntegrityError as e:
+        await session.rollback()
+        if "teacher_availability_no_overlap" not in str(e.orig):
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Availability overlaps an existing slot",
+        )
+
+
+async def get_teacher_rule(
+    session: AsyncSession, rule_id: UUID, teacher_id: int
+) -> TeacherAvailabilityRule:
+    """
+    Loads a recurring availability rule owned by the teacher
+    """
+    rule = await session.get(TeacherAvailabilityRule, rule_id)
+    if not rule:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No availability rule found by id",
+        )
+    if not rule.teacher_id == teacher_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have permission to change this.",
+        )
+    return rule
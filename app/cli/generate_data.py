@@ -0,0 +1,701 @@
+"""
+Generates a synthetic, production sized data set and loads it with
+PostgreSQL COPY: organizations, users, teachers, students, courses with
+their teachers, students and classes, payments and teacher availability.
+
+The same seed, volumes and starting database give the same data. Rows
+are appended after the ids already in the database, or loaded into an
+empty schema with --reset.
+
+Usage:
+    python -m app.cli.generate_data --seed 1 --teachers 2000 \\
+        --students 20000 --courses 2000 --availability 10000000
+"""
+import argparse
+import random
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from sqlalchemy import Integer, Table
+from sqlalchemy.engine import Engine
+from sqlalchemy.schema import CreateIndex, DropIndex
+from sqlmodel import create_engine
+
+from app.core.config import settings
+from app.db import migrations
+from app.db.models.course.course import (
+    ClassStudent,
+    ClassTeacher,
+    Course,
+    CourseStudent,
+    CourseTeacher,
+    LiveClass,
+)
+from app.db.models.payment.payment import Payment, PaymentPackage
+from app.db.models.user.user import (
+    Student,
+    Teacher,
+    TeacherAvailability,
+    TeacherAvailabilityRule,
+    User,
+)
+from app.organization.model import OrganizationModel
+
+FIRST_NAMES = [
+    "Ana", "Carlos", "Lucia", "Mateo", "Sofia", "Diego", "Valentina",
+    "Javier", "Camila", "Andres", "Emma", "Liam", "Olivia", "Noah", "Ava",
+]  # fmt: skip
+LAST_NAMES = [
+    "Garcia", "Martinez", "Lopez", "Hernandez", "Gonzalez", "Perez",
+    "Sanchez", "Ramirez", "Torres", "Smith", "Johnson", "Brown", "Jones",
+]  # fmt: skip
+COURSE_TOPICS = [
+    "Conversation", "Grammar", "Business Spanish", "Travel Spanish",
+    "Pronunciation", "DELE Preparation", "Reading Club", "Writing",
+]  # fmt: skip
+LEVELS = ["A1", "A2", "B1", "B2", "C1", "C2"]
+WEEKDAYS = ["MO", "TU", "WE", "TH", "FR", "SA", "SU"]
+
+# Slot lengths and gaps between slots in minutes, repeated by weight
+SLOT_MINUTES = [30, 45, 60, 60, 60, 90, 120]
+GAP_MINUTES = [0, 0, 0, 15, 30, 60, 60, 120, 180]
+DAY_STARTS = [7 * 60, 8 * 60, 9 * 60, 9 * 60, 10 * 60, 14 * 60]
+DAY_ENDS = 21 * 60
+MINUTE_TIMES = [f" {m // 60:02d}:{m % 60:02d}:00" for m in range(24 * 60)]
+
+# Version 4 and RFC 4122 variant bits of a random 128 bit integer
+_UUID_CLEAR = ~((0xF000 << 64) | (0xC000 << 48))
+_UUID_SET = (0x4000 << 64) | (0x8000 << 48)
+
+
+@dataclass
+class Volumes:
+    organizations: int = 1
+    teachers: int = 200
+    students: int = 2000
+    courses: int = 200
+    availability: int = 1_000_000  # rows across all teachers
+    classes_per_course: int = 8
+    rule_share: float = 0.3  # of teachers with recurring availability
+    payments_per_student: float = 1.5
+
+
+@dataclass
+class Generated:
+    """
+    Ids of what was loaded, for callers such as benchmarks
+    """
+
+    organization_ids: List[int] = field(default_factory=list)
+    teacher_user_ids: List[int] = field(default_factory=list)
+    student_user_ids: List[int] = field(default_factory=list)
+    course_ids: List[int] = field(default_factory=list)
+    availability_start: Optional[datetime] = None
+    availability_end: Optional[datetime] = None
+    rows: Dict[str, int] = field(default_factory=dict)
+
+
+def google_id(user_id: int) -> str:
+    return f"synthetic-{user_id}"
+
+
+def random_uuid(rng: random.Random) -> str:
+    # 32 hex digits are valid uuid input, and much faster than UUID()
+    return f"{rng.getrandbits(128) & _UUID_CLEAR | _UUID_SET:032x}"
+
+
+def _text(value: Any) -> str:
+    """
+    A value in COPY's text format
+    """
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, list):
+        return "{" + ",".join(_text(v) for v in value) + "}"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+    )
+
+
+class _Lines:
+    """
+    File like reader over an iterator of COPY lines, handed to
+    copy_expert so rows are generated while they are sent
+    """
+
+    def __init__(self, lines: Iterable[str], chunk: int = 1 << 20) -> None:
+        self._lines = iter(lines)
+        self._chunk = chunk
+        self.count = 0
+
+    def read(self, size: int = -1) -> str:
+        parts: List[str] = []
+        length = 0
+        for line in self._lines:
+            parts.append(line)
+            length += len(line)
+            if length >= self._chunk:
+                break
+        self.count += len(parts)
+        return "".join(parts)
+
+
+class Loader:
+    """
+    Streams generated rows into tables with COPY, all on one transaction
+    """
+
+    def __init__(self, engine: Engine) -> None:
+        self.engine = engine
+        self.connection = engine.raw_connection()
+        self.cursor = self.connection.cursor()
+        self.rows: Dict[str, int] = {}
+        self.tables: List[Table] = []
+
+    def quoted(self, table: Table) -> str:
+        return self.engine.dialect.identifier_preparer.format_table(table)
+
+    def ddl(self, statement: Any) -> str:
+        return str(statement.compile(dialect=self.engine.dialect))
+
+    def allocate(self, model: Any, count: int) -> List[int]:
+        """
+        Ids for ``count`` new rows of ``model``, after those in the table
+        """
+        table = _table(model)
+        self.cursor.execute(
+            f"SELECT coalesce(max(id), 0) FROM {self.quoted(table)}"
+        )
+        first = self.cursor.fetchone()[0] + 1
+        return list(range(first, first + count))
+
+    def copy(
+        self, table: Table, columns: Sequence[str], lines: Iterable[str]
+    ) -> int:
+        started = time.perf_counter()
+        reader = _Lines(lines)
+        self.cursor.copy_expert(
+            f"COPY {self.quoted(table)} ({', '.join(columns)}) FROM STDIN",
+            reader,
+            size=1 << 20,
+        )
+        if table not in self.tables:
+            self.tables.append(table)
+        self.rows[table.name] = self.rows.get(table.name, 0) + reader.count
+        elapsed = time.perf_counter() - started
+        print(
+            f"{table.name:28s} {reader.count:>11,d} rows {elapsed:7.1f} s "
+            f"({reader.count / max(elapsed, 1e-9):>10,.0f} rows/s)"
+        )
+        return reader.count
+
+    def copy_rows(
+        self, model: Any, columns: Sequence[str], rows: Iterable[Sequence[Any]]
+    ) -> int:
+        return self.copy(
+            _table(model),
+            columns,
+            ("\t".join(_text(v) for v in row) + "\n" for row in rows),
+        )
+
+    @contextmanager
+    def without_secondary_indexes(self, table: Table) -> Iterator[None]:
+        """
+        Drops the table's exclusion constraints and indexes for a bulk
+        load and builds them once afterwards, which is far quicker than
+        maintaining them row by row
+        """
+        # Re-added from the definition Postgres reports, since an
+        # AddConstraint would stop create_all emitting it inline
+        constraints = []
+        for constraint in table.constraints:
+            if constraint.__visit_name__ != "exclude_constraint":
+                continue
+            self.cursor.execute(
+                "SELECT pg_get_constraintdef(oid) FROM pg_constraint "
+                "WHERE conname = %s AND conrelid = %s::regclass",
+                (constraint.name, self.quoted(table)),
+            )
+            (definition,) = self.cursor.fetchone()
+            constraints.append((constraint.name, definition))
+            self.cursor.execute(
+                f"ALTER TABLE {self.quoted(table)} "
+                f"DROP CONSTRAINT {constraint.name}"
+            )
+        for index in table.indexes:
+            self.cursor.execute(self.ddl(DropIndex(index)))
+        yield
+        started = time.perf_counter()
+        self.cursor.execute("SET LOCAL maintenance_work_mem = '256MB'")
+        for index in table.indexes:
+            self.cursor.execute(self.ddl(CreateIndex(index)))
+        for name, definition in constraints:
+            self.cursor.execute(
+                f"ALTER TABLE {self.quoted(table)} "
+                f"ADD CONSTRAINT {name} {definition}"
+            )
+        print(
+            f"{table.name:28s} indexes rebuilt in "
+            f"{time.perf_counter() - started:.1f} s"
+        )
+
+    def finish(self) -> None:
+        """
+        Moves the id sequences past the loaded rows, commits and
+        refreshes the planner statistics
+        """
+        for table in self.tables:
+            for column in table.primary_key.columns:
+                if not isinstance(column.type, Integer):
+                    continue
+                quoted = self.quoted(table)
+                self.cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence('{quoted}', "
+                    f"'{column.name}'), "
+                    f"(SELECT coalesce(max({column.name}), 1) FROM {quoted}))"
+                )
+        self.connection.commit()
+        self.connection.autocommit = True
+        for table in self.tables:
+            self.cursor.execute(f"ANALYZE {self.quoted(table)}")
+        self.connection.close()
+
+    def abort(self) -> None:
+        self.connection.rollback()
+        self.connection.close()
+
+
+def _table(model: Any) -> Table:
+    return model.__table__
+
+
+def _split(total: int, weights: Sequence[float]) -> List[int]:
+    """
+    ``total`` shared out in proportion to ``weights``, largest remainder
+    first, so the parts always add up
+    """
+    scale = total / sum(weights)
+    exact = [w * scale for w in weights]
+    parts = [int(e) for e in exact]
+    by_remainder = sorted(range(len(exact)), key=lambda i: parts[i] - exact[i])
+    for i in by_remainder[: total - sum(parts)]:
+        parts[i] += 1
+    return parts
+
+
+def _with_ids(rows: List[List[Any]], ids: List[int]) -> List[List[Any]]:
+    return [[row_id, *row] for row_id, row in zip(ids, rows)]
+
+
+@dataclass
+class _People:
+    teacher_ids: List[int]
+    student_ids: List[int]
+    student_user_ids: List[int]
+    teachers_by_org: Dict[int, List[int]]
+    students_by_org: Dict[int, List[int]]
+
+
+def _load_people(
+    loader: Loader,
+    rng: random.Random,
+    volumes: Volumes,
+    generated: Generated,
+) -> _People:
+    organization_ids = loader.allocate(OrganizationModel, volumes.organizations)
+    loader.copy_rows(OrganizationModel, ["id"], ([i] for i in organization_ids))
+    user_ids = loader.allocate(User, volumes.teachers + volumes.students)
+    user_orgs = [
+        organization_ids[i % len(organization_ids)]
+        for i in range(len(user_ids))
+    ]
+
+    def user_row(user_id: int, organization_id: int) -> List[Any]:
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        return [
+            user_id,
+            f"{first} {last}",
+            f"{first}.{last}.{user_id}@example.com".lower(),
+            google_id(user_id),
+            organization_id,
+        ]
+
+    loader.copy_rows(
+        User,
+        ["id", "name", "email", "google_id", "organization_id"],
+        map(user_row, user_ids, user_orgs),
+    )
+    split = volumes.teachers
+    teacher_ids = loader.allocate(Teacher, split)
+    loader.copy_rows(
+        Teacher, ["id", "user_id"], zip(teacher_ids, user_ids[:split])
+    )
+    student_ids = loader.allocate(Student, len(user_ids) - split)
+    loader.copy_rows(
+        Student, ["id", "user_id"], zip(student_ids, user_ids[split:])
+    )
+
+    people = _People(
+        teacher_ids=teacher_ids,
+        student_ids=student_ids,
+        student_user_ids=user_ids[split:],
+        teachers_by_org={o: [] for o in organization_ids},
+        students_by_org={o: [] for o in organization_ids},
+    )
+    for teacher_id, organization_id in zip(teacher_ids, user_orgs[:split]):
+        people.teachers_by_org[organization_id].append(teacher_id)
+    for student_id, organization_id in zip(student_ids, user_orgs[split:]):
+        people.students_by_org[organization_id].append(student_id)
+    generated.organization_ids = organization_ids
+    generated.teacher_user_ids = user_ids[:split]
+    generated.student_user_ids = user_ids[split:]
+    return people
+
+
+def _load_courses(
+    loader: Loader,
+    rng: random.Random,
+    volumes: Volumes,
+    people: _People,
+    generated: Generated,
+    start: datetime,
+) -> List[List[Any]]:
+    """
+    Courses with their rosters and weekly classes from ``start``.
+    Returns the course_student rows as ``[id, course_id, student_id]``.
+    """
+    organization_ids = generated.organization_ids
+    course_ids = loader.allocate(Course, volumes.courses)
+    courses = []
+    for i, course_id in enumerate(course_ids):
+        level = rng.randrange(len(LEVELS))
+        courses.append(
+            [
+                course_id,
+                organization_ids[i % len(organization_ids)],
+                rng.choice([1, 2, 4, 4, 6, 8, 10, 12]),
+                f"{rng.choice(COURSE_TOPICS)} {LEVELS[level]}",
+                "",
+                rng.randrange(20, 400) * 100,
+                level,
+            ]
+        )
+    loader.copy_rows(
+        Course,
+        [
+            "id",
+            "organization_id",
+            "max_students",
+            "name",
+            "description",
+            "price",
+            "difficulty",
+        ],
+        courses,
+    )
+    generated.course_ids = course_ids
+
+    teachers: List[List[Any]] = []
+    students: List[List[Any]] = []
+    for course_id, organization_id, size, *_ in courses:
+        org_teachers = people.teachers_by_org[organization_id]
+        org_students = people.students_by_org[organization_id]
+        count = min(len(org_teachers), rng.choice([1, 1, 2, 3]))
+        teachers += [[course_id, t] for t in rng.sample(org_teachers, count)]
+        count = min(len(org_students), round(size * rng.uniform(0.4, 1)))
+        students += [[course_id, s] for s in rng.sample(org_students, count)]
+    teachers = _with_ids(
+        teachers, loader.allocate(CourseTeacher, len(teachers))
+    )
+    students = _with_ids(
+        students, loader.allocate(CourseStudent, len(students))
+    )
+    loader.copy_rows(CourseTeacher, ["id", "course_id", "teacher_id"], teachers)
+    loader.copy_rows(CourseStudent, ["id", "course_id", "student_id"], students)
+
+    per_course = volumes.classes_per_course
+    class_ids = loader.allocate(LiveClass, len(course_ids) * per_course)
+    class_courses = [c for c in course_ids for _ in range(per_course)]
+    # Each course meets at the same time every week
+    schedules = {
+        course_id: (
+            start
+            + timedelta(days=rng.randrange(7), hours=rng.randrange(8, 21)),
+            timedelta(minutes=rng.choice([60, 90])),
+        )
+        for course_id in course_ids
+    }
+    classes = []
+    for i, (class_id, course_id) in enumerate(zip(class_ids, class_courses)):
+        first, length = schedules[course_id]
+        class_start = first + timedelta(weeks=i % per_course)
+        classes.append(
+            [
+                class_id,
+                f"Class {i % per_course + 1}",
+                course_id,
+                f"https://meet.example.com/{class_id}",
+                class_start,
+                class_start + length,
+            ]
+        )
+    loader.copy_rows(
+        LiveClass,
+        ["id", "name", "course_id", "url", "start", '"end"'],
+        classes,
+    )
+    teachers_of: Dict[int, List[int]] = {}
+    for row_id, course_id, _ in teachers:
+        teachers_of.setdefault(course_id, []).append(row_id)
+    students_of: Dict[int, List[int]] = {}
+    for row_id, course_id, _ in students:
+        students_of.setdefault(course_id, []).append(row_id)
+    class_teachers = [
+        [class_id, row_id]
+        for class_id, course_id in zip(class_ids, class_courses)
+        for row_id in teachers_of.get(course_id, [])[:1]
+    ]
+    class_students = [
+        [class_id, rng.random() < 0.85, row_id]
+        for class_id, course_id in zip(class_ids, class_courses)
+        for row_id in students_of.get(course_id, [])
+    ]
+    loader.copy_rows(
+        ClassTeacher,
+        ["id", "class_id", "course_teacher_id"],
+        _with_ids(
+            class_teachers, loader.allocate(ClassTeacher, len(class_teachers))
+        ),
+    )
+    loader.copy_rows(
+        ClassStudent,
+        ["id", "class_id", "attended", "course_student_id"],
+        _with_ids(
+            class_students, loader.allocate(ClassStudent, len(class_students))
+        ),
+    )
+    return students
+
+
+def _load_payments(
+    loader: Loader,
+    rng: random.Random,
+    volumes: Volumes,
+    people: _People,
+    course_students: List[List[Any]],
+    paid_from: datetime,
+) -> None:
+    """
+    Payments, each buying a package of classes of one of the student's
+    courses
+    """
+    enrolments: Dict[int, List[int]] = {}
+    for _, course_id, student_id in course_students:
+        enrolments.setdefault(student_id, []).append(course_id)
+    purchases = []
+    for student_id, user_id in zip(people.student_ids, people.student_user_ids):
+        count = int(volumes.payments_per_student * 2 * rng.random() + 0.5)
+        courses = enrolments.get(student_id) or [None]
+        purchases += [
+            (student_id, user_id, rng.choice(courses)) for _ in range(count)
+        ]
+    payment_ids = loader.allocate(Payment, len(purchases))
+    package_ids = loader.allocate(PaymentPackage, len(purchases))
+    payments, packages = [], []
+    for payment_id, package_id, (student_id, user_id, course_id) in zip(
+        payment_ids, package_ids, purchases
+    ):
+        bought = rng.choice([4, 8, 12, 24])
+        payments.append(
+            [
+                payment_id,
+                user_id,
+                bought * 2500,
+                paid_from + timedelta(minutes=rng.randrange(525600)),
+                f"pi_synthetic_{payment_id}",
+            ]
+        )
+        packages.append(
+            [
+                package_id,
+                payment_id,
+                course_id,
+                student_id,
+                rng.randrange(bought + 1),
+                bought,
+            ]
+        )
+    loader.copy_rows(
+        Payment,
+        ["id", "user_id", "amount", "payment_date", "stripe_payment_intent_id"],
+        payments,
+    )
+    loader.copy_rows(
+        PaymentPackage,
+        [
+            "id",
+            "payment_id",
+            "course_id",
+            "student_id",
+            "courses_booked",
+            "courses_bought",
+        ],
+        packages,
+    )
+
+
+def availability_lines(
+    rng: random.Random, teacher_id: int, count: int, start: date
+) -> Iterator[str]:
+    """
+    ``count`` non overlapping slots for the teacher from ``start``,
+    inside working hours with irregular gaps and days off
+    """
+    days: List[str] = []
+    minute = rng.randrange(7) * 1440 + rng.choice(DAY_STARTS)
+    for _ in range(count):
+        end = minute + rng.choice(SLOT_MINUTES)
+        day, end_day = minute // 1440, end // 1440
+        while len(days) <= end_day:
+            days.append((start + timedelta(days=len(days))).isoformat())
+        yield (
+            f"{random_uuid(rng)}\t{teacher_id}"
+            f"\t{days[day]}{MINUTE_TIMES[minute % 1440]}"
+            f"\t{days[end_day]}{MINUTE_TIMES[end % 1440]}"
+            "\tavailable\tavailable\n"
+        )
+        minute = end + rng.choice(GAP_MINUTES)
+        if minute % 1440 >= DAY_ENDS:
+            skip = 1 + (rng.random() < 0.25) + (rng.random() < 0.05)
+            minute = (minute // 1440 + skip) * 1440 + rng.choice(DAY_STARTS)
+
+
+def _load_availability(
+    loader: Loader,
+    rng: random.Random,
+    volumes: Volumes,
+    teacher_ids: List[int],
+    start: date,
+    generated: Generated,
+) -> None:
+    # A few teachers have most of the availability
+    weights = [rng.paretovariate(1.5) for _ in teacher_ids]
+    counts = _split(volumes.availability, weights)
+    table = _table(TeacherAvailability)
+    with loader.without_secondary_indexes(table):
+        loader.copy(
+            table,
+            ["id", "teacher_id", "start", '"end"', "type", "title"],
+            (
+                line
+                for teacher_id, count in zip(teacher_ids, counts)
+                for line in availability_lines(rng, teacher_id, count, start)
+            ),
+        )
+    loader.cursor.execute(
+        f'SELECT min(start), max("end") FROM {loader.quoted(table)}'
+    )
+    (
+        generated.availability_start,
+        generated.availability_end,
+    ) = loader.cursor.fetchone()
+
+    # Evening slots, after the generated single ones
+    dtstart = datetime.combine(start, datetime.min.time())
+    ruled = rng.sample(
+        teacher_ids, round(len(teacher_ids) * volumes.rule_share)
+    )
+    loader.copy_rows(
+        TeacherAvailabilityRule,
+        ["id", "teacher_id", "title", "rrule", "dtstart", "duration"],
+        (
+            [
+                random_uuid(rng),
+                teacher_id,
+                "available",
+                f"FREQ=WEEKLY;BYDAY={','.join(rng.sample(WEEKDAYS, 2))}",
+                dtstart.replace(hour=rng.choice([22, 23])),
+                rng.choice([30, 45, 60]),
+            ]
+            for teacher_id in ruled
+        ),
+    )
+
+
+def generate(
+    engine: Engine,
+    volumes: Volumes,
+    seed: int = 0,
+    start: date = date(2022, 1, 3),
+) -> Generated:
+    """
+    Loads ``volumes`` of synthetic data into the database behind
+    ``engine`` in one transaction. Availability begins on ``start``.
+    """
+    rng = random.Random(seed)
+    loader = Loader(engine)
+    generated = Generated()
+    started = datetime.combine(start, datetime.min.time())
+    try:
+        people = _load_people(loader, rng, volumes, generated)
+        course_students = _load_courses(
+            loader, rng, volumes, people, generated, started
+        )
+        _load_payments(loader, rng, volumes, people, course_students, started)
+        _load_availability(
+            loader, rng, volumes, people.teacher_ids, start, generated
+        )
+    except BaseException:
+        loader.abort()
+        raise
+    loader.finish()
+    generated.rows = loader.rows
+    return generated
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("--database-url", default=str(settings.DATABASE_URL))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="drop every table and rebuild the schema first",
+    )
+    defaults = Volumes()
+    for name, value in defaults.__dict__.items():
+        parser.add_argument(
+            f"--{name.replace('_', '-')}", type=type(value), default=value
+        )
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    if args.reset:
+        migrations.reset(engine)
+    migrations.upgrade(engine)
+    volumes = Volumes(
+        **{name: getattr(args, name) for name in defaults.__dict__}
+    )
+    started = time.perf_counter()
+    generated = generate(engine, volumes, seed=args.seed)
+    print(
+        f"loaded {sum(generated.rows.values()):,d} rows in "
+        f"{time.perf_counter() - started:.1f} s"
+    )
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
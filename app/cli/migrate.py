@@ -0,0 +1,48 @@
+"""
+Brings the database schema up to date with the models, run once per
+deploy before the app starts.
+
+Usage:
+    python -m app.cli.migrate upgrade  apply pending migrations
+    python -m app.cli.migrate check    exit 1 unless up to date
+    python -m app.cli.migrate current  print the database's version
+"""
+import argparse
+import sys
+
+from sqlmodel import create_engine
+
+from app.core.config import settings
+from app.db import migrations
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument("command", choices=["upgrade", "check", "current"])
+    parser.add_argument("--database-url", default=str(settings.DATABASE_URL))
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    try:
+        if args.command == "upgrade":
+            applied = migrations.upgrade(engine)
+            print(f"applied {applied}" if applied else "already up to date")
+        elif args.command == "check":
+            try:
+                found = migrations.check(engine)
+            except migrations.SchemaMismatch as error:
+                print(error, file=sys.stderr)
+                return 1
+            print(f"up to date at version {found.version}")
+        else:
+            found = migrations.current(engine)
+            print(found.version if found else "none")
+    finally:
+        engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
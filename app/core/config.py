@@ -1,3 +1,5 @@
+from typing import List
+
 from pydantic import BaseSettings, PostgresDsn
 import logging
 
@@ -5,17 +7,61 @@ logger = logging.getLogger(__name__)
 
 
 class Settings(BaseSettings):
+    DEBUG: bool = False
+
     # DATABASE CONNECTION
     DATABASE_URL: PostgresDsn
     TEST_DATABASE_URL: PostgresDsn
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800  # seconds
+    DB_POOL_TIMEOUT: float = 30  # seconds to wait for a connection
+    # Safe GET routes read from these in turn, as a JSON list of URLs
+    READ_REPLICA_URLS: List[PostgresDsn] = []
+    # how long a user reads from the primary after writing
+    READ_YOUR_WRITES_WINDOW: int = 10  # seconds
     GOOGLE_CLIENT_ID: str
+    GOOGLE_CERTS_URL: str = "https://www.googleapis.com/oauth2/v1/certs"
+    GOOGLE_TOKEN_CACHE_SIZE: int = 10000
+
+    # Signs the session tokens issued by /auth/google
+    SESSION_SECRET_KEY: str
+    ACCESS_TOKEN_TTL: int = 15 * 60  # seconds
+    REFRESH_TOKEN_TTL: int = 14 * 24 * 60 * 60  # seconds
 
     DEFAULT_ORGANIZATION_ID: int = 1
+    ORGANIZATION_CACHE_TTL: int = 300  # seconds
 
     DEFAULT_PAGE_SIZE: int = 100
 
+    # (rule, window) expansions of recurring availability kept per process
+    RECURRENCE_CACHE_SIZE: int = 1024
+    # longest window availability is read for, bounding each expansion
+    AVAILABILITY_MAX_DAYS: int = 366
+    # rows fetched per round trip when streaming availability
+    AVAILABILITY_STREAM_BATCH_SIZE: int = 1000
+    # longest window the free slot search accepts
+    FREE_SLOTS_MAX_DAYS: int = 62
+
+    # requests running more SQL statements than this are flagged
+    METRICS_QUERY_THRESHOLD: int = 20
+
+    # logs statements slower than the threshold, with their plans
+    SLOW_QUERY_LOG: bool = False
+    SLOW_QUERY_THRESHOLD: float = 0.2  # seconds
+    SLOW_QUERY_EXPLAIN_ANALYZE: bool = True  # only ever for SELECTs
+
     STRIPE_API_KEY: str
     STRIPE_WEBHOOK_SECRET: str
+    STRIPE_API_BASE: str = "https://api.stripe.com"
+    STRIPE_MAX_CONCURRENCY: int = 10  # worker threads for Stripe calls
+    STRIPE_TIMEOUT: float = 30  # seconds
+    STRIPE_EVENT_BATCH_SIZE: int = 50
+    STRIPE_EVENT_POLL_INTERVAL: float = 5  # seconds
+    STRIPE_EVENT_MAX_ATTEMPTS: int = 5
+    # Wait before retrying a failed event, doubled after each failure
+    STRIPE_EVENT_RETRY_DELAY: float = 30  # seconds
 
 
 settings = Settings()  # type: ignore
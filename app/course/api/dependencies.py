@@ -0,0 +1,50 @@
+from typing import Any, Dict, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import joinedload, raiseload, selectinload
+
+from app.db.models.course.course import Course, CourseStudent, CourseTeacher
+from app.db.models.user.user import Student, Teacher
+
+# Relationships a client can ask for with ?include=, each loaded with a
+# fixed number of queries however many rows there are
+COURSE_INCLUDES: Dict[str, Any] = {
+    "teachers": selectinload(Course.course_teachers).options(
+        joinedload(CourseTeacher.teacher).options(
+            joinedload(Teacher.user).raiseload("*"), raiseload("*")
+        ),
+        raiseload("*"),
+    ),
+    "students": selectinload(Course.course_students).options(
+        joinedload(CourseStudent.student).options(
+            joinedload(Student.user).raiseload("*"), raiseload("*")
+        ),
+        raiseload("*"),
+    ),
+    "classes": selectinload(Course.live_classes).raiseload("*"),
+}
+
+
+def course_load_options(include: Optional[str] = None) -> List[Any]:
+    """
+    Loader options for the comma separated relationships in ``include``.
+    Every other relationship raises when accessed, so a forgotten
+    include fails loudly instead of lazy loading row by row.
+    """
+    names = {name.strip() for name in (include or "").split(",")} - {""}
+    unknown = names - COURSE_INCLUDES.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown include: {', '.join(sorted(unknown))}",
+        )
+    return [COURSE_INCLUDES[name] for name in sorted(names)] + [raiseload("*")]
+
+
+def course_write_load_options(include: Optional[str] = None) -> List[Any]:
+    """
+    Loader options for the course returned by a create or update, which
+    comes back with its teachers as it always has unless ``include``
+    asks for something else. An empty ``include`` loads nothing.
+    """
+    return course_load_options("teachers" if include is None else include)
@@ -1,14 +1,30 @@
-from fastapi import Depends, HTTPException, status
-from sqlmodel import Session, col
-from app.auth.get_current_org import get_current_organization
-from app.auth.get_current_user import get_current_user
-from app.course.types import CourseBase, CourseFull, CourseUpdatePayload
+from typing import Any, List, Union
+from fastapi import Depends, HTTPException, Request, Response
+from sqlmodel import Session, col, select
+from app.auth.principal import Principal, get_sync_principal
+from app.course.api.dependencies import (
+    course_load_options,
+    course_write_load_options,
+)
+from app.course.types import (
+    CourseBase,
+    CourseRead,
+    CourseUpdatePayload,
+    LiveClassRead,
+)
 from app.db.get_session import get_session
+from app.db.replicas import get_read_session
 from app.db.models.course.course import Course
-from app.db.models.user.user import UserFull
-from app.organization.model import OrganizationModel
 
-from app.utils.params import ListAPIParams, list_params
+from app.utils.etag import etag_matches, not_modified, weak_etag, with_etag
+from app.utils.params import (
+    CursorPage,
+    ListAPIParams,
+    decode_cursor,
+    list_params,
+    to_cursor_page,
+)
+from app.utils.responses import ORJSONResponse
 from fastapi_utils.inferring_router import InferringRouter
 
 
@@ -22,44 +38,76 @@ course_router = InferringRouter(
 
 @course_router.get("")
 def list_courses(
+    request: Request,
     params: ListAPIParams = Depends(list_params),
-    session: Session = Depends(get_session),
-    organization: OrganizationModel = Depends(get_current_organization),
-    current_user: UserFull = Depends(get_current_user),
-):
-    offset = params.page * params.limit
-    return (
+    session: Session = Depends(get_read_session),
+    principal: Principal = Depends(get_sync_principal),
+    options: List[Any] = Depends(course_load_options),
+) -> Union[List[CourseRead], CursorPage[CourseRead]]:
+    organization = principal.organization
+    # Read from the same database as the list, so a lagging replica
+    # never serves an old list under a new ETag
+    version = session.exec(Course.list_version(organization.id)).one()
+    etag = weak_etag(request, organization.id, version)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    query = (
         session.query(Course)
-        .filter(col(Course.organization_id) == organization.id)
-        .offset(offset)
-        .limit(params.limit)
-        .all()
+        .filter(col(Course.organization_id) == principal.organization.id)
+        .options(*options)
+        .populate_existing()
+        .order_by(col(Course.id))
+    )
+    # Returned as responses so the read schemas aren't validated twice
+    if not params.use_cursor:
+        rows = query.offset(params.offset).limit(params.limit).all()
+        return with_etag(
+            ORJSONResponse([CourseRead.from_orm(row) for row in rows]), etag
+        )
+    if params.cursor:
+        (after_id,) = decode_cursor(params.cursor, int)
+        query = query.filter(col(Course.id) > after_id)
+    rows = query.limit(params.limit + 1).all()
+    page = to_cursor_page(
+        [CourseRead.from_orm(row) for row in rows],
+        params.limit,
+        lambda row: (row.id,),
     )
+    return with_etag(ORJSONResponse(page), etag)
 
 
 @course_router.get("/{course_id}")
 def get_course(
     course_id: int,
-    session: Session = Depends(get_session),
-    organization: OrganizationModel = Depends(get_current_organization),
-    current_user: UserFull = Depends(get_current_user),
-):
-    course = session.get(Course, course_id)
-    if not course:
-        raise HTTPException(status_code=404, detail="Course not found by ID")
-    return course
+    request: Request,
+    response: Response,
+    session: Session = Depends(get_read_session),
+    principal: Principal = Depends(get_sync_principal),
+    options: List[Any] = Depends(course_load_options),
+) -> CourseRead:
+    if "if-none-match" in request.headers:
+        # Only the revision is read to answer a revalidation
+        revision = session.exec(
+            select(Course.revision).where(col(Course.id) == course_id)
+        ).first()
+        etag = weak_etag(request, revision)
+        if revision is not None and etag_matches(request, etag):
+            return not_modified(etag)
+    course = load_course(session, course_id, options)
+    with_etag(response, weak_etag(request, course.revision))
+    return CourseRead.from_orm(course)
 
 
 @course_router.delete("/{course_id}")
 def delete_course(
     course_id: int,
     session: Session = Depends(get_session),
-    organization: OrganizationModel = Depends(get_current_organization),
-    current_user: UserFull = Depends(get_current_user),
+    principal: Principal = Depends(get_sync_principal),
 ):
     course = session.get(Course, course_id)
     if not course:
         raise HTTPException(status_code=404, detail="Course not found by ID")
+    course.touch(session)
     session.delete(course)
     session.commit()
 
@@ -68,9 +116,10 @@ def delete_course(
 def create_course(
     payload: CourseBase,
     session: Session = Depends(get_session),
-    organization: OrganizationModel = Depends(get_current_organization),
-    current_user: UserFull = Depends(get_current_user),
-):
+    principal: Principal = Depends(get_sync_principal),
+    options: List[Any] = Depends(course_write_load_options),
+) -> CourseRead:
+    organization = principal.organization
     if not organization.id:
         raise HTTPException(status_code=400)
     course = Course.create_course(
@@ -84,52 +133,56 @@ def create_course(
         max_students=payload.max_students,
         student_ids=payload.student_ids,
     )
-    session.add(course)
-    session.commit()
     if not course.id:
         raise HTTPException(status_code=400)
-    saved_course = session.get(Course, course.id)
-    if not saved_course:
-        raise HTTPException(
-            status_code=status.HTTP_417_EXPECTATION_FAILED,
-            detail="Something went wrong saving the course",
-        )
-    if not saved_course.course_students:
-        saved_course.course_students = []
-    return CourseFull(
-        **saved_course.dict(), course_teachers=saved_course.course_teachers
-    )
+    return CourseRead.from_orm(load_course(session, course.id, options))
 
 
 @course_router.put("/{course_id}")
-async def update_course(
+def update_course(
     course_id: int,
     payload: CourseUpdatePayload,
     session: Session = Depends(get_session),
-    organization: OrganizationModel = Depends(get_current_organization),
-    current_user: UserFull = Depends(get_current_user),
-):
-
+    principal: Principal = Depends(get_sync_principal),
+    options: List[Any] = Depends(course_write_load_options),
+) -> CourseRead:
     course = session.get(Course, course_id)
     if not course:
         raise HTTPException(status_code=404, detail="Course not found by ID")
-    for key, val in payload.dict().items():
-        if key != "teacher_ids":
-            course.__setattr__(key, val)
+    changes = payload.dict(exclude_unset=True)
+    teacher_ids = changes.pop("teacher_ids", None)
+    student_ids = changes.pop("student_ids", None)
+    for key, val in changes.items():
+        course.__setattr__(key, val)
+    if teacher_ids is not None:
+        course.update_course_teachers(session, teacher_ids)
+    if student_ids is not None:
+        course.update_course_students(session, student_ids)
 
     session.add(course)
+    course.touch(session)
     session.commit()
-    return course
+    return CourseRead.from_orm(load_course(session, course_id, options))
 
 
 @course_router.get("/{course_id}/classes")
 def get_course_classes(
     course_id: int,
-    session: Session = Depends(get_session),
-    organization: OrganizationModel = Depends(get_current_organization),
-    current_user: UserFull = Depends(get_current_user),
-):
-    course = session.get(Course, course_id)
+    session: Session = Depends(get_read_session),
+    principal: Principal = Depends(get_sync_principal),
+) -> List[LiveClassRead]:
+    course = load_course(session, course_id, course_load_options("classes"))
+    return [LiveClassRead.from_orm(c) for c in course.live_classes]
+
+
+def load_course(session: Session, course_id: int, options: List[Any]) -> Course:
+    statement = (
+        select(Course)
+        .where(col(Course.id) == course_id)
+        .options(*options)
+        .execution_options(populate_existing=True)
+    )
+    course = session.exec(statement).first()
     if not course:
         raise HTTPException(status_code=404, detail="Course not found by ID")
-    return course.live_classes
+    return course
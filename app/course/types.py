@@ -1,7 +1,8 @@
+from datetime import datetime
 from typing import List, Optional
 from pydantic import BaseModel
 
-from app.db.models.course.course import CourseStudent, CourseTeacher
+from app.db.read_model import ReadModel
 
 
 class CourseBase(BaseModel):
@@ -15,12 +16,6 @@ class CourseBase(BaseModel):
     student_ids: List[int] | None = None
 
 
-class CourseFull(BaseModel):
-    id: int
-    course_teachers: List[CourseTeacher]
-    course_students: Optional[List[CourseStudent]] = None
-
-
 class CourseUpdatePayload(CourseBase):
     name: Optional[str]
     description: Optional[str]
@@ -28,3 +23,66 @@ class CourseUpdatePayload(CourseBase):
     max_students: Optional[int]
     price: Optional[int]
     difficulty: Optional[int]
+    # Left out, the course keeps its teachers
+    teacher_ids: Optional[List[int]] = None
+
+
+class UserRead(ReadModel):
+    id: int
+    name: str
+    email: str
+
+
+class TeacherRead(ReadModel):
+    id: int
+    user_id: int
+    user: Optional[UserRead] = None
+
+
+class StudentRead(ReadModel):
+    id: int
+    user_id: int
+    user: Optional[UserRead] = None
+
+
+class CourseTeacherRead(ReadModel):
+    id: int
+    course_id: int
+    teacher_id: int
+    teacher: Optional[TeacherRead] = None
+
+
+class CourseStudentRead(ReadModel):
+    id: int
+    course_id: int
+    student_id: int
+    payment_package_id: Optional[int] = None
+    student: Optional[StudentRead] = None
+
+
+class LiveClassRead(ReadModel):
+    id: int
+    course_id: int
+    name: str
+    description: Optional[str] = None
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    url: str
+
+
+class CourseRead(ReadModel):
+    """
+    A course and whichever relationships were asked for with
+    ``?include=``. The others are null.
+    """
+
+    id: int
+    organization_id: int
+    name: str
+    description: str
+    price: int
+    difficulty: int
+    max_students: int
+    course_teachers: Optional[List[CourseTeacherRead]] = None
+    course_students: Optional[List[CourseStudentRead]] = None
+    live_classes: Optional[List[LiveClassRead]] = None
@@ -0,0 +1,56 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Optional, Set, Type
+
+from sqlalchemy import and_, delete, insert
+from sqlmodel import Session, select
+
+from app.db.base_model import DBModel
+
+
+@dataclass
+class AssociationDiff:
+    added: Set[Any] = field(default_factory=set)
+    removed: Set[Any] = field(default_factory=set)
+
+
+def sync_association(
+    session: Session,
+    model: Type[DBModel],
+    owner_column: str,
+    owner_id: Any,
+    member_column: str,
+    member_ids: Iterable[Any],
+    defaults: Optional[Dict[str, Any]] = None,
+) -> AssociationDiff:
+    """
+    Makes the rows of an association table for one owner match
+    ``member_ids``, e.g. the teachers of a course. Reads the current
+    members once, then removes and adds the difference with one bulk
+    DELETE and one bulk INSERT. Nothing is committed, and relationships
+    already loaded from the table have to be expired by the caller.
+    """
+    table = model.__table__  # type: ignore
+    owner = table.c[owner_column]
+    member = table.c[member_column]
+
+    current = set(
+        session.execute(select(member).where(owner == owner_id)).scalars()
+    )
+    wanted = set(member_ids)
+    diff = AssociationDiff(added=wanted - current, removed=current - wanted)
+
+    if diff.removed:
+        session.execute(
+            delete(table).where(
+                and_(owner == owner_id, member.in_(diff.removed))
+            )
+        )
+    if diff.added:
+        session.execute(
+            insert(table),
+            [
+                {**(defaults or {}), owner_column: owner_id, member_column: m}
+                for m in diff.added
+            ],
+        )
+    return diff
@@ -2,6 +2,6 @@
 from app.db.models.user.user import *
 from app.db.models.course.course import *
 from app.db.models.levels.levels import *
-
-# from app.db.models.payment.payment import Payment, PaymentPackage, PaymentIntent
+from app.db.models.payment.payment import *
+from app.db.models.payment.stripe_event import *
 from app.organization.model import *
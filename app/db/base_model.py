@@ -1,14 +1,23 @@
+from typing import Union
 from sqlmodel import SQLModel, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 
 class DBModel(SQLModel):
     __abstract__ = True
 
-    async def save(self, db: Session) -> "DBModel":
+    async def save(self, db: Union[Session, AsyncSession]) -> "DBModel":
         db.add(self)
-        db.commit()
+        if isinstance(db, AsyncSession):
+            await db.commit()
+        else:
+            db.commit()
         return self
 
-    async def delete(self, db: Session) -> None:
-        db.delete(self)
-        db.commit()
+    async def delete(self, db: Union[Session, AsyncSession]) -> None:
+        if isinstance(db, AsyncSession):
+            await db.delete(self)
+            await db.commit()
+        else:
+            db.delete(self)
+            db.commit()
@@ -1,19 +1,169 @@
-from typing import Generator
-from sqlmodel import Session, SQLModel, create_engine
+import itertools
+from typing import Any, AsyncGenerator, Dict, Generator, List, Optional, Tuple
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.future.engine import Engine
+from sqlmodel import Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.core.config import settings
+from app.db.pool import (
+    InstrumentedAsyncAdaptedQueuePool,
+    InstrumentedQueuePool,
+    PoolStats,
+)
+from app.db.slow_queries import SlowQueryLog
 
 # import all models here
 from app.db.base import *  # noqa
 
+_engine: Optional[Engine] = None
+_async_engine: Optional[AsyncEngine] = None
+_slow_query_log: Optional[SlowQueryLog] = None
+# (sync, async) engine pairs of each read replica, used in turn
+_replicas: List[Tuple[Engine, AsyncEngine]] = []
+_next_replica = itertools.count()
 
-def _get_engine(db_url: str):
-    engine = create_engine(db_url)
-    SQLModel.metadata.create_all(engine)
-    return engine
+
+def _pool_kwargs() -> Dict:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+    }
+
+
+def _get_engine(db_url: str) -> Engine:
+    return create_engine(
+        db_url, poolclass=InstrumentedQueuePool, **_pool_kwargs()
+    )
+
+
+def to_async_url(db_url: str) -> str:
+    """
+    Points a postgres URL at the asyncpg driver
+    """
+    return str(make_url(db_url).set(drivername="postgresql+asyncpg"))
+
+
+def _get_async_engine(db_url: str) -> AsyncEngine:
+    return create_async_engine(
+        to_async_url(db_url),
+        poolclass=InstrumentedAsyncAdaptedQueuePool,
+        **_pool_kwargs(),
+    )
+
+
+def init_engine() -> Engine:
+    """
+    Creates the process wide engines. Called once at app startup.
+    """
+    global _engine, _async_engine, _slow_query_log, _replicas
+    if _engine is None:
+        _engine = _get_engine(settings.DATABASE_URL)
+    if _async_engine is None:
+        _async_engine = _get_async_engine(settings.DATABASE_URL)
+    if settings.READ_REPLICA_URLS and not _replicas:
+        _replicas = [
+            (_get_engine(url), _get_async_engine(url))
+            for url in settings.READ_REPLICA_URLS
+        ]
+    if settings.SLOW_QUERY_LOG and _slow_query_log is None:
+        _slow_query_log = SlowQueryLog(
+            _engine,
+            threshold=settings.SLOW_QUERY_THRESHOLD,
+            analyze=settings.SLOW_QUERY_EXPLAIN_ANALYZE,
+        )
+        for engine, async_engine in [(_engine, _async_engine), *_replicas]:
+            _slow_query_log.install(engine)
+            _slow_query_log.install(async_engine.sync_engine)
+    return _engine
+
+
+def get_engine() -> Engine:
+    if _engine is None:
+        return init_engine()
+    return _engine
+
+
+def get_async_engine() -> AsyncEngine:
+    if _async_engine is None:
+        init_engine()
+    if _async_engine is None:
+        raise Exception("Async engine could not be created")
+    return _async_engine
+
+
+async def dispose_engine() -> None:
+    global _engine, _async_engine, _slow_query_log, _replicas
+    if _slow_query_log is not None:
+        _slow_query_log.shutdown()
+        _slow_query_log = None
+    if _engine is not None:
+        _engine.dispose()
+        _engine = None
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+    for engine, async_engine in _replicas:
+        engine.dispose()
+        await async_engine.dispose()
+    _replicas = []
+
+
+def get_pool_stats() -> Dict[str, PoolStats]:
+    stats = {}
+    pools: List[Tuple[str, Any]] = [
+        ("sync", get_engine().pool),
+        ("async", get_async_engine().pool),
+    ]
+    for i, (engine, async_engine) in enumerate(_replicas):
+        pools.append((f"replica{i}", engine.pool))
+        pools.append((f"replica{i}-async", async_engine.pool))
+    for name, pool in pools:
+        if not isinstance(
+            pool, (InstrumentedQueuePool, InstrumentedAsyncAdaptedQueuePool)
+        ):
+            raise TypeError("Engine is not using an instrumented pool")
+        stats[name] = pool.stats()
+    return stats
 
 
 def get_session() -> Generator[Session, None, None]:
-    engine = _get_engine(settings.DATABASE_URL)
-    with Session(engine) as session:  # type: ignore
+    """
+    Blocking session, for sync routes which run in the threadpool
+    """
+    with Session(get_engine()) as session:  # type: ignore
+        yield session
+
+
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Session for async routes, so queries don't block the event loop
+    """
+    async with AsyncSession(
+        get_async_engine(), expire_on_commit=False
+    ) as session:
         yield session
-    session.close()
+
+
+# Session.info key marking sessions on a read replica
+REPLICA = "replica"
+
+
+def next_replica() -> Optional[Tuple[Engine, AsyncEngine]]:
+    """
+    (sync, async) engines of the next replica in turn, or None without
+    replicas
+    """
+    if not _replicas:
+        return None
+    return _replicas[next(_next_replica) % len(_replicas)]
+
+
+def is_replica(session: Any) -> bool:
+    """
+    Whether the session reads a replica, which may lag the primary
+    """
+    return getattr(session, "sync_session", session).info.get(REPLICA, False)
@@ -0,0 +1,77 @@
+"""
+Counts the SQL statements, database time and pool wait of whatever runs
+inside ``track_queries()``, such as a single request. Listens on every
+engine, sync or async, so sessions need no wiring of their own.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+@dataclass
+class QueryStats:
+    statements: int = 0
+    db_time: float = 0.0  # seconds
+    pool_wait: float = 0.0  # seconds
+
+
+# Holds a mutable QueryStats, so statements run from a copied context,
+# such as a threadpool worker, still add to the request's totals
+_current: ContextVar[Optional[QueryStats]] = ContextVar(
+    "query_stats", default=None
+)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """
+    Blocks can be nested, such as one step of a tracked request. The
+    inner block's totals still count towards the outer one.
+    """
+    outer = _current.get()
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+        if outer is not None:
+            outer.statements += stats.statements
+            outer.db_time += stats.db_time
+            outer.pool_wait += stats.pool_wait
+
+
+def record_pool_wait(waited: float) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.pool_wait += waited
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn: Any, *args: Any) -> None:
+    if _current.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn: Any, *args: Any) -> None:
+    stats = _current.get()
+    started = conn.info.get("query_started")
+    if stats is None or not started:
+        return
+    stats.statements += 1
+    stats.db_time += time.perf_counter() - started.pop()
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(context: Any) -> None:
+    # A failed statement never reaches after_cursor_execute
+    conn = context.connection
+    started = conn.info.get("query_started") if conn is not None else None
+    if started:
+        started.pop()
@@ -0,0 +1,284 @@
+"""
+Versioned schema changes, applied once per deploy with
+``python -m app.cli.migrate upgrade``.
+
+Each ``vNNNN_*`` module applies one change to databases built by the
+previous version, written so it can run while the app is serving
+traffic. The app only compares the stored version with the latest
+migration at startup, with ``check_version``. ``check``, run by
+``python -m app.cli.migrate check``, also compares the live schema with
+the models, so a model change without a migration, or a migration which
+misses part of one, is caught before deploying.
+
+A database with tables but no schema_version table predates migrations
+and is at version 0, where v0001 brings it up to the schema the
+migrations start from. An empty database is built straight from the
+models and stamped with the latest version.
+"""
+import importlib
+import pkgutil
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from types import ModuleType
+from typing import List, Optional, Set
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    Table,
+    UniqueConstraint,
+    exc,
+    func,
+    inspect,
+    select,
+)
+from sqlalchemy.dialects.postgresql import ExcludeConstraint
+from sqlalchemy.engine import Connection
+from sqlalchemy.engine.reflection import Inspector
+from sqlalchemy.future.engine import Engine
+from sqlmodel import SQLModel
+
+import app.db.base  # noqa: F401 registers every model
+
+# Held while upgrading, so workers deploying at once don't race
+UPGRADE_LOCK = 7_340_213
+
+# Not part of the models, so dropping and creating them leaves it be
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("applied_at", DateTime, nullable=False, server_default=func.now()),
+)
+
+
+class SchemaMismatch(Exception):
+    pass
+
+
+@dataclass
+class SchemaVersion:
+    version: int
+    applied_at: datetime
+
+
+def _discover() -> List[ModuleType]:
+    modules = [
+        importlib.import_module(f"{__name__}.{info.name}")
+        for info in pkgutil.iter_modules(__path__)
+        if re.fullmatch(r"v\d{4}_\w+", info.name)
+    ]
+    modules.sort(key=lambda module: module.VERSION)
+    versions = [module.VERSION for module in modules]
+    if versions != list(range(1, len(modules) + 1)):
+        raise RuntimeError(f"Migration versions are not 1..n: {versions}")
+    return modules
+
+
+MIGRATIONS = _discover()
+HEAD = MIGRATIONS[-1].VERSION
+
+
+def _exclusion_constraints(conn: Connection, table: str) -> Set[str]:
+    # The inspector doesn't report exclusion constraints
+    return set(
+        conn.exec_driver_sql(
+            "SELECT conname FROM pg_constraint "
+            "WHERE contype = 'x' AND conrelid = %(table)s::regclass",
+            {"table": f'"{table}"'},
+        ).scalars()
+    )
+
+
+def _column_differences(inspector: Inspector, table: Table) -> List[str]:
+    found = {
+        column["name"]: column for column in inspector.get_columns(table.name)
+    }
+    missing = []
+    for column in table.columns:
+        live = found.get(column.name)
+        if live is None:
+            missing.append(f"column {table.name}.{column.name}")
+        elif not column.nullable and live["nullable"]:
+            missing.append(f"not null on {table.name}.{column.name}")
+        elif column.computed is not None and not live.get("computed"):
+            missing.append(f"generated column {table.name}.{column.name}")
+    return missing
+
+
+def _index_differences(inspector: Inspector, table: Table) -> List[str]:
+    found = {
+        index["name"]: (tuple(index["column_names"]), bool(index["unique"]))
+        for index in inspector.get_indexes(table.name)
+    }
+    unique = {
+        tuple(constraint["column_names"])
+        for constraint in inspector.get_unique_constraints(table.name)
+    } | {columns for columns, is_unique in found.values() if is_unique}
+    missing = [
+        f"index {index.name}"
+        for index in table.indexes
+        if found.get(index.name)
+        != (tuple(column.name for column in index.columns), bool(index.unique))
+    ]
+    missing += [
+        f"unique constraint on {table.name}"
+        f" ({', '.join(column.name for column in constraint.columns)})"
+        for constraint in table.constraints
+        if isinstance(constraint, UniqueConstraint)
+        and tuple(column.name for column in constraint.columns) not in unique
+    ]
+    return missing
+
+
+def _constraint_differences(
+    conn: Connection, inspector: Inspector, table: Table
+) -> List[str]:
+    foreign_keys = {
+        (tuple(key["constrained_columns"]), key["referred_table"])
+        for key in inspector.get_foreign_keys(table.name)
+    }
+    missing = [
+        f"foreign key {table.name}.{key.parent.name}"
+        for key in table.foreign_keys
+        if ((key.parent.name,), key.column.table.name) not in foreign_keys
+    ]
+    exclusions = _exclusion_constraints(conn, table.name)
+    missing += [
+        f"exclusion constraint {constraint.name}"
+        for constraint in table.constraints
+        if isinstance(constraint, ExcludeConstraint)
+        and constraint.name not in exclusions
+    ]
+    return missing
+
+
+def differences(
+    engine: Engine, metadata: MetaData = SQLModel.metadata
+) -> List[str]:
+    """
+    What the models have which the live database lacks: tables,
+    columns, generated columns, not null, indexes and constraints.
+    Anything extra in the database is left out, as a newer release may
+    have added it.
+    """
+    missing: List[str] = []
+    with engine.connect() as conn:
+        inspector = inspect(conn)
+        tables = set(inspector.get_table_names())
+        for name in sorted(metadata.tables):
+            table = metadata.tables[name]
+            if name not in tables:
+                missing.append(f"table {name}")
+                continue
+            missing += _column_differences(inspector, table)
+            missing += _index_differences(inspector, table)
+            missing += _constraint_differences(conn, inspector, table)
+    return missing
+
+
+def current(engine: Engine) -> Optional[SchemaVersion]:
+    """
+    Latest version applied to the database, or None before migrations
+    """
+    with engine.connect() as conn:
+        try:
+            row = conn.execute(
+                select(schema_version)
+                .order_by(schema_version.c.version.desc())
+                .limit(1)
+            ).first()
+        except exc.ProgrammingError:
+            return None
+    return SchemaVersion(**row._mapping) if row else None
+
+
+def check_version(engine: Engine) -> SchemaVersion:
+    """
+    Raises SchemaMismatch unless the database is at the latest version.
+    A single query, so cheap enough for every worker start.
+    """
+    found = current(engine)
+    if found is None:
+        raise SchemaMismatch(
+            "Database has no schema version, run: python -m app.cli.migrate "
+            "upgrade"
+        )
+    if found.version != HEAD:
+        raise SchemaMismatch(
+            f"Database is at version {found.version}, the code expects "
+            f"{HEAD}. Run: python -m app.cli.migrate upgrade"
+        )
+    return found
+
+
+def check(engine: Engine) -> SchemaVersion:
+    """
+    Raises SchemaMismatch unless the database is at the latest version
+    and its live schema has everything the models declare
+    """
+    found = check_version(engine)
+    missing = differences(engine)
+    if missing:
+        raise SchemaMismatch(
+            f"Database at version {HEAD} is missing "
+            f"{', '.join(missing)}. Add a migration for the change"
+        )
+    return found
+
+
+def _record(conn: Connection, version: int) -> None:
+    conn.execute(schema_version.insert().values(version=version))
+    conn.commit()
+
+
+def upgrade(engine: Engine) -> List[int]:
+    """
+    Applies every migration the database hasn't had. Returns the
+    versions applied.
+    """
+    with engine.connect() as lock:
+        lock.exec_driver_sql(f"SELECT pg_advisory_lock({UPGRADE_LOCK})")
+        lock.commit()
+        try:
+            return _upgrade(engine)
+        finally:
+            lock.exec_driver_sql(f"SELECT pg_advisory_unlock({UPGRADE_LOCK})")
+            lock.commit()
+
+
+def _upgrade(engine: Engine) -> List[int]:
+    existing = set(inspect(engine).get_table_names())
+    models = set(SQLModel.metadata.tables)
+    with engine.connect() as conn:
+        schema_version.create(conn, checkfirst=True)
+        conn.commit()
+    if not existing & models:
+        SQLModel.metadata.create_all(engine)
+        with engine.connect() as conn:
+            _record(conn, HEAD)
+        return [HEAD]
+
+    found = current(engine)
+    at = found.version if found else 0
+    applied = []
+    for migration in MIGRATIONS[at:]:
+        migration.upgrade(engine)
+        with engine.connect() as conn:
+            _record(conn, migration.VERSION)
+        applied.append(migration.VERSION)
+    return applied
+
+
+def reset(engine: Engine) -> None:
+    """
+    Drops every table and the schema version, for throwaway databases
+    such as benchmarks
+    """
+    SQLModel.metadata.drop_all(engine)
+    with engine.connect() as conn:
+        schema_version.drop(conn, checkfirst=True)
+        conn.commit()
@@ -0,0 +1,52 @@
+"""
+Helpers for migrations that change a live database
+"""
+from typing import Tuple
+
+from sqlalchemy.engine import Connection
+
+
+def quote_columns(columns: Tuple[str, ...]) -> str:
+    return ", ".join(f'"{column}"' for column in columns)
+
+
+def _is_invalid(conn: Connection, name: str) -> bool:
+    # A concurrent build that failed or was cancelled leaves an invalid
+    # index behind, which IF NOT EXISTS would otherwise keep
+    return bool(
+        conn.exec_driver_sql(
+            "SELECT NOT i.indisvalid FROM pg_index i "
+            "JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = %(name)s AND pg_table_is_visible(c.oid)",
+            {"name": name},
+        ).scalar()
+    )
+
+
+def create_index_concurrently(
+    conn: Connection,
+    name: str,
+    table: str,
+    columns: Tuple[str, ...],
+    unique: bool = False,
+) -> None:
+    """
+    Builds an index without blocking writes, unless it already exists.
+    ``conn`` must be in autocommit mode.
+    """
+    if _is_invalid(conn, name):
+        conn.exec_driver_sql(f'DROP INDEX CONCURRENTLY "{name}"')
+    conn.exec_driver_sql(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY "
+        f'IF NOT EXISTS "{name}" ON "{table}" ({quote_columns(columns)})'
+    )
+
+
+def has_constraint(conn: Connection, table: str, name: str) -> bool:
+    return bool(
+        conn.exec_driver_sql(
+            "SELECT 1 FROM pg_constraint "
+            "WHERE conrelid = %(table)s::regclass AND conname = %(name)s",
+            {"table": f'"{table}"', "name": name},
+        ).scalar()
+    )
@@ -0,0 +1,154 @@
+"""
+Brings a database built by create_all before migrations existed up to
+the schema the later migrations start from: revision counters for
+ETags, Stripe payment intent ids, the stripe_event inbox, recurring
+availability rules, the read_your_writes pins of replica routing, two
+covering indexes, and the generated ``during`` range with the exclusion
+constraint which stops a teacher's slots overlapping.
+
+Columns are added with constant defaults and indexes built
+concurrently, so neither blocks writes. The ``during`` column and the
+exclusion constraint can't be: adding them rewrites teacher_availability
+and builds its GiST index while holding a lock that blocks writes to it.
+"""
+from sqlalchemy.engine import Connection
+from sqlalchemy.future.engine import Engine
+
+from app.db.migrations.ddl import create_index_concurrently, has_constraint
+
+VERSION = 1
+
+COLUMNS = [
+    "ALTER TABLE course "
+    "ADD COLUMN IF NOT EXISTS revision INTEGER DEFAULT 0 NOT NULL",
+    "ALTER TABLE teacher ADD COLUMN IF NOT EXISTS "
+    "availability_revision INTEGER DEFAULT 0 NOT NULL",
+    "ALTER TABLE organization ADD COLUMN IF NOT EXISTS "
+    "courses_revision INTEGER DEFAULT 0 NOT NULL",
+    "ALTER TABLE payment "
+    "ADD COLUMN IF NOT EXISTS stripe_payment_intent_id VARCHAR",
+]
+
+TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS teacher_availability_rule (
+        id UUID NOT NULL,
+        exdates TIMESTAMP WITHOUT TIME ZONE[] DEFAULT '{}' NOT NULL,
+        teacher_id INTEGER NOT NULL,
+        title VARCHAR DEFAULT 'available' NOT NULL,
+        rrule VARCHAR NOT NULL,
+        dtstart TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        duration INTEGER NOT NULL,
+        until TIMESTAMP WITHOUT TIME ZONE,
+        PRIMARY KEY (id),
+        FOREIGN KEY(teacher_id) REFERENCES teacher (id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_teacher_availability_rule_teacher_id "
+    "ON teacher_availability_rule (teacher_id)",
+    """
+    CREATE TABLE IF NOT EXISTS stripe_event (
+        payload JSONB NOT NULL,
+        id VARCHAR NOT NULL,
+        type VARCHAR NOT NULL,
+        received_at TIMESTAMP WITHOUT TIME ZONE
+            DEFAULT timezone('utc', now()) NOT NULL,
+        processed_at TIMESTAMP WITHOUT TIME ZONE,
+        attempts INTEGER DEFAULT 0 NOT NULL,
+        next_attempt_at TIMESTAMP WITHOUT TIME ZONE,
+        last_error VARCHAR,
+        PRIMARY KEY (id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_stripe_event_pending "
+    "ON stripe_event (received_at) WHERE processed_at IS NULL",
+    """
+    CREATE TABLE IF NOT EXISTS read_your_writes (
+        user_id INTEGER NOT NULL,
+        until TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        PRIMARY KEY (user_id),
+        FOREIGN KEY(user_id) REFERENCES "user" (id)
+    )
+    """,
+]
+
+NO_OVERLAP = "teacher_availability_no_overlap"
+
+PAYMENT_INTENT_KEY = "payment_stripe_payment_intent_id_key"
+
+
+class OverlappingRowsError(Exception):
+    pass
+
+
+def overlaps(conn: Connection) -> int:
+    """
+    Number of pairs of a teacher's availability sharing any time
+    """
+    return conn.exec_driver_sql(
+        "SELECT count(*) FROM teacher_availability a "
+        "JOIN teacher_availability b ON a.teacher_id = b.teacher_id "
+        'AND a.id < b.id AND a.start < b."end" AND b.start < a."end"'
+    ).scalar_one()
+
+
+def _add_no_overlap(conn: Connection) -> None:
+    conn.exec_driver_sql(
+        "ALTER TABLE teacher_availability ADD COLUMN IF NOT EXISTS during "
+        "TSRANGE GENERATED ALWAYS AS (tsrange(start, \"end\", '[)')) STORED"
+    )
+    if not has_constraint(conn, "teacher_availability", NO_OVERLAP):
+        conn.exec_driver_sql(
+            f"ALTER TABLE teacher_availability ADD CONSTRAINT {NO_OVERLAP} "
+            "EXCLUDE USING gist (teacher_id WITH =, during WITH &&) "
+            "DEFERRABLE INITIALLY DEFERRED"
+        )
+
+
+def upgrade(engine: Engine) -> None:
+    """
+    Adds whatever of the schema is missing. Safe to run again after a
+    failure. Raises before locking teacher_availability if slots of a
+    teacher already overlap.
+    """
+    with engine.begin() as conn:
+        # teacher_id = can only be part of a GiST index with btree_gist
+        conn.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS btree_gist")
+        for statement in COLUMNS + TABLES:
+            conn.exec_driver_sql(statement)
+
+    with engine.connect().execution_options(
+        isolation_level="AUTOCOMMIT"
+    ) as conn:
+        create_index_concurrently(
+            conn,
+            "ix_course_organization_id_id",
+            "course",
+            ("organization_id", "id"),
+        )
+        create_index_concurrently(
+            conn,
+            "ix_teacher_availability_teacher_id_start_id",
+            "teacher_availability",
+            ("teacher_id", "start", "id"),
+        )
+        create_index_concurrently(
+            conn,
+            PAYMENT_INTENT_KEY,
+            "payment",
+            ("stripe_payment_intent_id",),
+            unique=True,
+        )
+        if not has_constraint(conn, "payment", PAYMENT_INTENT_KEY):
+            conn.exec_driver_sql(
+                f"ALTER TABLE payment ADD CONSTRAINT {PAYMENT_INTENT_KEY} "
+                f"UNIQUE USING INDEX {PAYMENT_INTENT_KEY}"
+            )
+        if overlaps(conn):
+            raise OverlappingRowsError(
+                "teacher_availability has overlapping slots of the same "
+                f"teacher, remove them before adding {NO_OVERLAP}"
+            )
+
+    with engine.begin() as conn:
+        _add_no_overlap(conn)
@@ -0,0 +1,112 @@
+"""
+Indexes every foreign key, so relationship loads and cascading deletes
+stop scanning whole tables, and makes a user a teacher or a student at
+most once and a student enrolled on a course at most once.
+
+Indexes are built with CREATE INDEX CONCURRENTLY, which takes no lock
+that blocks writes, so this can run against a live database.
+"""
+from typing import List, Tuple
+
+from sqlalchemy.engine import Connection
+from sqlalchemy.future.engine import Engine
+
+from app.db.migrations.ddl import create_index_concurrently, quote_columns
+
+VERSION = 2
+
+# (name, table, columns, unique), as the models declare them
+INDEXES: List[Tuple[str, str, Tuple[str, ...], bool]] = [
+    ("ix_user_organization_id", "user", ("organization_id",), False),
+    ("ix_teacher_user_id", "teacher", ("user_id",), True),
+    ("ix_student_user_id", "student", ("user_id",), True),
+    ("ix_live_class_course_id", "live_class", ("course_id",), False),
+    (
+        "ix_course_teacher_course_id_teacher_id",
+        "course_teacher",
+        ("course_id", "teacher_id"),
+        False,
+    ),
+    ("ix_course_teacher_teacher_id", "course_teacher", ("teacher_id",), False),
+    (
+        "ix_course_student_course_id_student_id",
+        "course_student",
+        ("course_id", "student_id"),
+        True,
+    ),
+    ("ix_course_student_student_id", "course_student", ("student_id",), False),
+    (
+        "ix_course_student_payment_package_id",
+        "course_student",
+        ("payment_package_id",),
+        False,
+    ),
+    ("ix_class_teacher_class_id", "class_teacher", ("class_id",), False),
+    (
+        "ix_class_teacher_course_teacher_id",
+        "class_teacher",
+        ("course_teacher_id",),
+        False,
+    ),
+    ("ix_class_student_class_id", "class_student", ("class_id",), False),
+    (
+        "ix_class_student_course_student_id",
+        "class_student",
+        ("course_student_id",),
+        False,
+    ),
+    ("ix_payment_user_id", "payment", ("user_id",), False),
+    (
+        "ix_payment_package_payment_id",
+        "payment_package",
+        ("payment_id",),
+        False,
+    ),
+    ("ix_payment_package_course_id", "payment_package", ("course_id",), False),
+    (
+        "ix_payment_package_student_id",
+        "payment_package",
+        ("student_id",),
+        False,
+    ),
+    (
+        "ix_payment_package_limitations_payment_package_id",
+        "payment_package_limitations",
+        ("payment_package_id",),
+        False,
+    ),
+]
+
+
+class DuplicateRowsError(Exception):
+    pass
+
+
+def duplicates(conn: Connection, table: str, columns: Tuple[str, ...]) -> int:
+    """
+    Number of distinct values of ``columns`` held by more than one row
+    """
+    return conn.exec_driver_sql(
+        f'SELECT count(*) FROM (SELECT 1 FROM "{table}" '
+        f"GROUP BY {quote_columns(columns)} HAVING count(*) > 1) d"
+    ).scalar_one()
+
+
+def upgrade(engine: Engine) -> None:
+    """
+    Builds whichever of the indexes are missing. Safe to run again after
+    a failure. Raises before building anything if existing rows break a
+    unique index.
+    """
+    # Concurrent builds can't run inside a transaction
+    with engine.connect().execution_options(
+        isolation_level="AUTOCOMMIT"
+    ) as conn:
+        for name, table, columns, unique in INDEXES:
+            if unique and duplicates(conn, table, columns):
+                raise DuplicateRowsError(
+                    f"{table} has duplicate ({', '.join(columns)}) rows, "
+                    f"remove them before creating {name}"
+                )
+        for name, table, columns, unique in INDEXES:
+            create_index_concurrently(conn, name, table, columns, unique)
@@ -0,0 +1,25 @@
+"""
+Gives live classes a start and end, so the free slot search can take
+booked classes out of a teacher's availability. Both are nullable, so
+adding them doesn't rewrite the table, and the index on start is built
+concurrently.
+"""
+from sqlalchemy.future.engine import Engine
+
+from app.db.migrations.ddl import create_index_concurrently
+
+VERSION = 3
+
+
+def upgrade(engine: Engine) -> None:
+    with engine.connect().execution_options(
+        isolation_level="AUTOCOMMIT"
+    ) as conn:
+        conn.exec_driver_sql(
+            "ALTER TABLE live_class "
+            "ADD COLUMN IF NOT EXISTS start TIMESTAMP WITHOUT TIME ZONE, "
+            'ADD COLUMN IF NOT EXISTS "end" TIMESTAMP WITHOUT TIME ZONE'
+        )
+        create_index_concurrently(
+            conn, "ix_live_class_start", "live_class", ("start",)
+        )
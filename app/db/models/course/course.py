@@ -1,5 +1,9 @@
+from datetime import datetime
 from typing import Callable, ClassVar, List, Optional, Union, TYPE_CHECKING
-from sqlmodel import Field, Relationship, Session
+from sqlalchemy.sql import Select
+from sqlmodel import Field, Index, Relationship, Session, col, select
+from app.db.association import AssociationDiff, sync_association
+from app.db.revision import bump_revision
 from app.db.base_model import DBModel
 from app.db.models.course.exception import CreateCourseException
 from app.db.models.user.user import Teacher, Student
@@ -11,6 +15,10 @@ if TYPE_CHECKING:
 
 class Course(DBModel, table=True):
     __tablename__: ClassVar[Union[str, Callable[..., str]]] = "course"
+    __table_args__ = (
+        # Keyset pagination of an organization's courses on id
+        Index("ix_course_organization_id_id", "organization_id", "id"),
+    )
     id: Optional[int] = Field(primary_key=True, default=None)
     organization_id: int = Field(foreign_key="organization.id")
     organization: OrganizationModel = Relationship()
@@ -19,6 +27,11 @@ class Course(DBModel, table=True):
     description: str
     price: int
     difficulty: int  # Number to help order in terms of difficulty
+    # Bumped whenever the course, its teachers or students, or the
+    # teachers or students of its classes change
+    revision: int = Field(
+        default=0, nullable=False, sa_column_kwargs={"server_default": "0"}
+    )
     course_teachers: List["CourseTeacher"] = Relationship(
         back_populates="course", sa_relationship_kwargs={"cascade": "delete"}
     )
@@ -54,92 +67,152 @@ class Course(DBModel, table=True):
             max_students=max_students,
         )
         session.add(course)
-        session.commit()
+        session.flush()
         if not course.id:
             raise CreateCourseException("Error saving course")
         course.update_course_teachers(session, teacher_ids)
         course.update_course_students(session, student_ids or [])
+        course.touch(session)
+        session.commit()
         return course
 
+    def touch(self, session: Session) -> None:
+        if not self.id:
+            raise Exception()
+        Course.touch_by_id(session, self.id)
+
+    @staticmethod
+    def touch_by_id(session: Session, course_id: int) -> None:
+        """
+        Bumps the revision of the course and of its organization's
+        course list, so clients holding an old copy of either refetch
+        it. Call it just before committing, as the organization's row
+        stays locked until then.
+        """
+        session.execute(
+            bump_revision(Course.revision, col(Course.id) == course_id)
+        )
+        # The subquery can't be evaluated against loaded organizations,
+        # and nothing reads their courses_revision without a query
+        session.execute(
+            bump_revision(
+                OrganizationModel.courses_revision,
+                col(OrganizationModel.id)
+                == select(Course.organization_id)
+                .where(col(Course.id) == course_id)
+                .scalar_subquery(),
+            ).execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def list_version(organization_id: int) -> Select:
+        """
+        Revision of the organization's course list, a single row lookup
+        """
+        return select(OrganizationModel.courses_revision).where(
+            col(OrganizationModel.id) == organization_id
+        )
+
     def update_course_teachers(
         self, session: Session, teacher_ids: List[int] | None = None
-    ):
+    ) -> AssociationDiff:
         if not self.id:
             raise Exception()
-        if not teacher_ids:
-            teacher_ids = []
-        current_teacher_ids = [
-            course_teacher.id for course_teacher in self.course_teachers
-        ]
-        teachers_to_delete = [
-            course_teacher
-            for course_teacher in self.course_teachers
-            if course_teacher.id not in teacher_ids
-        ]
-        for teacher in teachers_to_delete:
-            session.delete(teacher)
-        new_teacher_ids = [
-            _id for _id in teacher_ids if _id not in current_teacher_ids
-        ]
-        new_course_teachers = [
-            CourseTeacher(teacher_id=teacher_id, course_id=self.id)
-            for teacher_id in new_teacher_ids
-        ]
-        session.add_all(new_course_teachers)
-        session.commit()
+        diff = sync_association(
+            session,
+            CourseTeacher,
+            "course_id",
+            self.id,
+            "teacher_id",
+            teacher_ids or [],
+        )
+        session.expire(self, ["course_teachers"])
+        return diff
 
     def update_course_students(
         self, session: Session, student_ids: List[int] | None
-    ):
+    ) -> AssociationDiff:
         if not self.id:
             raise Exception()
-        if not student_ids:
-            student_ids = []
-        current_student_ids = [
-            course_student.id for course_student in self.course_students
-        ]
-        students_to_delete = [
-            course_student
-            for course_student in self.course_students
-            if course_student.id not in student_ids
-        ]
-        for student in students_to_delete:
-            session.delete(student)
-        new_student_ids = [
-            _id for _id in student_ids if _id not in current_student_ids
-        ]
-        new_course_students = [
-            CourseStudent(
-                payment_package_id=None,
-                student_id=student_id,
-                course_id=self.id,
-            )
-            for student_id in new_student_ids
-        ]
-        session.add_all(new_course_students)
-        session.commit()
+        diff = sync_association(
+            session,
+            CourseStudent,
+            "course_id",
+            self.id,
+            "student_id",
+            student_ids or [],
+        )
+        session.expire(self, ["course_students"])
+        return diff
 
 
 class LiveClass(DBModel, table=True):
     __tablename__: ClassVar[Union[str, Callable[..., str]]] = "live_class"
+    __table_args__ = (
+        # Classes booked inside a window, when searching for free time
+        Index("ix_live_class_start", "start"),
+    )
     id: Optional[int] = Field(primary_key=True, default=None)
     name: str
     description: Optional[str] = None
+    # When the class takes place. Null for classes not scheduled yet.
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
     course: Course = Relationship()
-    course_id: int = Field(foreign_key="course.id")
+    course_id: int = Field(foreign_key="course.id", index=True)
     class_teachers: "ClassTeacher" = Relationship(back_populates="live_class")
     class_students: List["ClassStudent"] = Relationship(
         back_populates="live_class"
     )
     url: str
 
+    def update_class_teachers(
+        self, session: Session, course_teacher_ids: List[int]
+    ) -> AssociationDiff:
+        if not self.id:
+            raise Exception()
+        diff = sync_association(
+            session,
+            ClassTeacher,
+            "class_id",
+            self.id,
+            "course_teacher_id",
+            course_teacher_ids,
+        )
+        session.expire(self, ["class_teachers"])
+        Course.touch_by_id(session, self.course_id)
+        return diff
+
+    def update_class_students(
+        self, session: Session, course_student_ids: List[int]
+    ) -> AssociationDiff:
+        if not self.id:
+            raise Exception()
+        diff = sync_association(
+            session,
+            ClassStudent,
+            "class_id",
+            self.id,
+            "course_student_id",
+            course_student_ids,
+            defaults={"attended": False},
+        )
+        session.expire(self, ["class_students"])
+        Course.touch_by_id(session, self.course_id)
+        return diff
+
 
 class CourseTeacher(DBModel, table=True):
     __tablename__: ClassVar[Union[str, Callable[..., str]]] = "course_teacher"
+    __table_args__ = (
+        Index(
+            "ix_course_teacher_course_id_teacher_id", "course_id", "teacher_id"
+        ),
+    )
     id: Optional[int] = Field(primary_key=True, default=None)
     course_id: int = Field(foreign_key=Course.id)
     course: Optional[Course] = Relationship(back_populates="course_teachers")
-    teacher_id: int = Field(foreign_key=Teacher.id)
+    teacher_id: int = Field(foreign_key=Teacher.id, index=True)
     teacher: Teacher = Relationship(back_populates="course_teacher")
     class_teachers: List["ClassTeacher"] = Relationship(
         back_populates="course_teacher"
@@ -148,16 +221,25 @@ class CourseTeacher(DBModel, table=True):
 
 class CourseStudent(DBModel, table=True):
     __tablename__: ClassVar[Union[str, Callable[..., str]]] = "course_student"
+    __table_args__ = (
+        # A student is enrolled on a course once
+        Index(
+            "ix_course_student_course_id_student_id",
+            "course_id",
+            "student_id",
+            unique=True,
+        ),
+    )
     id: Optional[int] = Field(primary_key=True, default=None)
     payment_packages: Optional["PaymentPackage"] = Relationship(
         back_populates="course_student"
     )
     payment_package_id: Optional[int] = Field(
-        foreign_key="payment_package.id", nullable=True
+        foreign_key="payment_package.id", nullable=True, index=True
     )
     course: Course = Relationship()
     course_id: int = Field(foreign_key="course.id")
-    student_id: int = Field(foreign_key="student.id")
+    student_id: int = Field(foreign_key="student.id", index=True)
     student: Optional["Student"] = Relationship(back_populates="course_student")
     class_students: List["ClassStudent"] = Relationship(
         back_populates="course_student"
@@ -167,9 +249,9 @@ class CourseStudent(DBModel, table=True):
 class ClassTeacher(DBModel, table=True):
     __tablename__: ClassVar[Union[str, Callable[..., str]]] = "class_teacher"
     id: Optional[int] = Field(primary_key=True, default=None)
-    class_id: int = Field(foreign_key=LiveClass.id)
+    class_id: int = Field(foreign_key=LiveClass.id, index=True)
     live_class: LiveClass = Relationship(back_populates="class_teachers")
-    course_teacher_id: int = Field(foreign_key=CourseTeacher.id)
+    course_teacher_id: int = Field(foreign_key=CourseTeacher.id, index=True)
     course_teacher: Optional[CourseTeacher] = Relationship(
         back_populates="class_teachers",
     )
@@ -178,10 +260,10 @@ class ClassTeacher(DBModel, table=True):
 class ClassStudent(DBModel, table=True):
     __tablename__: ClassVar[Union[str, Callable[..., str]]] = "class_student"
     id: Optional[int] = Field(primary_key=True, default=None)
-    class_id: int = Field(foreign_key=LiveClass.id)
+    class_id: int = Field(foreign_key=LiveClass.id, index=True)
     live_class: LiveClass = Relationship(back_populates="class_students")
     attended: Optional[bool] = False
-    course_student_id: int = Field(foreign_key="course_student.id")
+    course_student_id: int = Field(foreign_key="course_student.id", index=True)
     course_student: "CourseStudent" = Relationship(
         back_populates="class_students"
     )
@@ -1,7 +1,8 @@
 from datetime import datetime
 from typing import ClassVar, List, Optional, Union, Callable
 
-from sqlmodel import Relationship, Session, Field
+from sqlmodel import Column, Field, Relationship, String, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from stripe import PaymentIntent
 from app.db.base_model import DBModel
 from app.db.models.course.course import Course, CourseStudent
@@ -16,47 +17,63 @@ class PaymentModelException(Exception):
 class Payment(DBModel, table=True):
     __tablename__: ClassVar[Union[str, Callable[..., str]]] = "payment"
     id: Optional[int] = Field(primary_key=True, default=None)
-    user_id: int = Field(foreign_key="user.id")
+    user_id: int = Field(foreign_key="user.id", index=True)
     user: User = Relationship()
     amount: int  # Number to help order in terms of difficulty
     payment_date: datetime = datetime.utcnow()
     payment_package: "PaymentPackage" = Relationship(back_populates="payment")
+    stripe_payment_intent_id: Optional[str] = Field(
+        default=None, sa_column=Column(String, unique=True, nullable=True)
+    )
 
     @staticmethod
-    def register_stripe_payment_intent(
-        session: Session, payment_intent: PaymentIntent
+    async def register_stripe_payment_intent(
+        session: AsyncSession, payment_intent: PaymentIntent
     ) -> "Payment":
+        """
+        Records a succeeded payment intent once, however many times it is
+        registered. The caller commits.
+        """
+        statement = select(Payment).where(
+            Payment.stripe_payment_intent_id == payment_intent["id"]
+        )
+        existing: Optional[Payment] = (await session.exec(statement)).first()
+        if existing:
+            return existing
         metadata = StripePaymentIntentMetadata(**payment_intent["metadata"])
-        user: Optional[UserFull] = (
-            session.query(User)
-            .filter(User.google_id == metadata.user_google_id)
-            .first()
+        statement = select(User).where(
+            User.google_id == metadata.user_google_id
         )
+        user: Optional[UserFull] = (await session.exec(statement)).first()
         if not user:
             raise PaymentModelException(
                 f"User not found for google id {metadata.user_google_id}"
             )
-        payment = Payment(user_id=user.id, amount=payment_intent["amount"])
+        payment = Payment(
+            user_id=user.id,
+            amount=payment_intent["amount"],
+            stripe_payment_intent_id=payment_intent["id"],
+        )
         session.add(payment)
-        session.commit()
+        await session.flush()
         return payment
 
 
 class PaymentPackage(DBModel, table=True):
     __tablename__: ClassVar[Union[str, Callable[..., str]]] = "payment_package"
     id: Optional[int] = Field(primary_key=True, default=None)
-    payment_id: Optional[int] = Field(foreign_key=Payment.id)
+    payment_id: Optional[int] = Field(foreign_key=Payment.id, index=True)
     payment: "Payment" = Relationship(
         back_populates="payment_package",
         sa_relationship_kwargs={"cascade": "delete"},
     )
-    course_id: Optional[int] = Field(foreign_key=Course.id)
+    course_id: Optional[int] = Field(foreign_key=Course.id, index=True)
     courses: List[Course] = Relationship(back_populates="payment_package")
     package_limitations: List["PaymentPackageLimitations"] = Relationship(
         back_populates="payment_package",
         sa_relationship_kwargs={"cascade": "delete"},
     )
-    student_id: int = Field(foreign_key="student.id")
+    student_id: int = Field(foreign_key="student.id", index=True)
     student: Student = Relationship(back_populates="payment_packages")
     courses_booked: int
     courses_bought: int
@@ -84,7 +101,9 @@ class PaymentPackageLimitations(DBModel, table=True):
     id: Optional[int] = Field(primary_key=True, default=None)
     used: bool = False
     course_permitted: str
-    payment_package_id: int = Field(foreign_key="payment_package.id")
+    payment_package_id: int = Field(
+        foreign_key="payment_package.id", index=True
+    )
     payment_package: PaymentPackage = Relationship(
         back_populates="package_limitations"
     )
@@ -0,0 +1,43 @@
+from datetime import datetime
+from typing import Any, Callable, ClassVar, Dict, Optional, Union
+
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlmodel import Column, Field, Index, text
+
+from app.db.base_model import DBModel
+
+
+class StripeEvent(DBModel, table=True):
+    """
+    Inbox of webhook events received from Stripe, keyed on the Stripe
+    event id so a redelivered event is only stored once.
+
+    The webhook only inserts the event. StripeEventProcessor handles
+    it afterwards and sets ``processed_at``. A failed event is retried
+    from ``next_attempt_at`` until it runs out of attempts.
+    """
+
+    __tablename__: ClassVar[Union[str, Callable[..., str]]] = "stripe_event"
+    __table_args__ = (
+        # The processor only ever reads events which are still pending
+        Index(
+            "ix_stripe_event_pending",
+            "received_at",
+            postgresql_where=text("processed_at IS NULL"),
+        ),
+    )
+
+    id: str = Field(primary_key=True)
+    type: str
+    payload: Dict[str, Any] = Field(sa_column=Column(JSONB, nullable=False))
+    received_at: datetime = Field(
+        default_factory=datetime.utcnow,
+        nullable=False,
+        sa_column_kwargs={"server_default": text("timezone('utc', now())")},
+    )
+    processed_at: Optional[datetime] = None
+    attempts: int = Field(
+        default=0, nullable=False, sa_column_kwargs={"server_default": "0"}
+    )
+    next_attempt_at: Optional[datetime] = None
+    last_error: Optional[str] = None
@@ -1,13 +1,21 @@
 from datetime import datetime
 from uuid import uuid4
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import DDL, Computed, DateTime, event, func
+from sqlalchemy.dialects.postgresql import (
+    ARRAY,
+    TSRANGE,
+    UUID,
+    ExcludeConstraint,
+)
+from sqlalchemy.sql.elements import ColumnElement
 
 from pydantic import UUID4
 from app.bookings.types import PostAvailabilityPayloadEvent
 from app.organization.model import OrganizationModel
 from ...base_model import DBModel
 from typing import TYPE_CHECKING, Callable, ClassVar, List, Optional, Union
-from sqlmodel import Column, Field, Relationship, Session
+from sqlmodel import Column, Field, Index, Relationship, Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 if TYPE_CHECKING:
 
@@ -21,10 +29,12 @@ class User(DBModel, table=True):
     email: str = Field(index=True)
     google_id: Optional[str] = Field(index=True, nullable=True)
     teacher: Optional["Teacher"] = Relationship(
-        back_populates="user",
+        back_populates="user", sa_relationship_kwargs={"uselist": False}
     )
-    student: Optional["Student"] = Relationship()
-    organization_id: int = Field(foreign_key="organization.id")
+    student: Optional["Student"] = Relationship(
+        back_populates="user", sa_relationship_kwargs={"uselist": False}
+    )
+    organization_id: int = Field(foreign_key="organization.id", index=True)
     organization: OrganizationModel = Relationship()
 
     @staticmethod
@@ -43,15 +53,31 @@ class User(DBModel, table=True):
         )
 
 
+class ReadYourWrites(DBModel, table=True):
+    """
+    Until when the user's reads go to the primary, set whenever they
+    write so they never read a replica which hasn't caught up with them
+    """
+
+    __tablename__: ClassVar[Union[str, Callable[..., str]]] = "read_your_writes"
+    user_id: int = Field(primary_key=True, foreign_key=User.id)
+    until: datetime
+
+
 class UserFull(User):
     id: ClassVar[int]
 
 
 class Teacher(DBModel, table=True):
+    __table_args__ = (Index("ix_teacher_user_id", "user_id", unique=True),)
     id: Optional[int] = Field(primary_key=True, default=None)
 
     user_id: int = Field(foreign_key=User.id)
     user: User = Relationship(back_populates="teacher")
+    # Bumped whenever the teacher's availability or rules change
+    availability_revision: int = Field(
+        default=0, nullable=False, sa_column_kwargs={"server_default": "0"}
+    )
     availability: List["TeacherAvailability"] = Relationship()
     course_teacher: List["CourseTeacher"] = Relationship()
 
@@ -62,8 +88,19 @@ class Teacher(DBModel, table=True):
             raise ValueError(f"No teacher found for user {user_id}")
         return teacher
 
+    @classmethod
+    async def get_teacher_by_user_id_async(
+        cls, session: AsyncSession, user_id: int
+    ) -> "Teacher":
+        result = await session.exec(select(cls).where(cls.user_id == user_id))
+        teacher = result.first()
+        if not teacher:
+            raise ValueError(f"No teacher found for user {user_id}")
+        return teacher
+
 
 class Student(DBModel, table=True):
+    __table_args__ = (Index("ix_student_user_id", "user_id", unique=True),)
     id: Optional[int] = Field(primary_key=True, default=None)
 
     user_id: int = Field(foreign_key=User.id)
@@ -80,13 +117,22 @@ class TeacherAvailability(DBModel, table=True):
     """
     Table which stores availability data for teachers.
 
-    Each row can be a single entry or instructions for setting up
-    a recurring event.
+    Each row is a single entry. Recurring availability is stored as a
+    TeacherAvailabilityRule instead.
     """
 
     __tablename__: ClassVar[
         Union[str, Callable[..., str]]
     ] = "teacher_availability"
+    __table_args__ = (
+        # Keyset pagination of a teacher's availability on (start, id)
+        Index(
+            "ix_teacher_availability_teacher_id_start_id",
+            "teacher_id",
+            "start",
+            "id",
+        ),
+    )
 
     id: Optional[UUID4] = Field(
         sa_column=Column(UUID(as_uuid=True), primary_key=True, default=uuid4),
@@ -104,3 +150,83 @@ class TeacherAvailability(DBModel, table=True):
         self.end = payload.end
         if payload.title:
             self.title = payload.title
+
+    @staticmethod
+    def during_within(start: datetime, end: datetime) -> ColumnElement:
+        """
+        Availability which lies entirely inside [start, end)
+        """
+        return availability_during.contained_by(func.tsrange(start, end, "[)"))
+
+    @staticmethod
+    def during_overlaps(start: datetime, end: datetime) -> ColumnElement:
+        """
+        Availability which shares any time with [start, end)
+        """
+        return availability_during.overlaps(func.tsrange(start, end, "[)"))
+
+
+# [start, end) as a range generated by the database. It isn't mapped on the
+# model, it only backs the exclusion constraint below. The timestamps are
+# stored without a time zone, so this is a tsrange.
+_availability_table = TeacherAvailability.__table__  # type: ignore
+availability_during = Column(
+    "during",
+    TSRANGE,
+    Computed("tsrange(start, \"end\", '[)')", persisted=True),
+)
+_availability_table.append_column(availability_during)
+# Rejects overlapping slots for the same teacher. Its GiST index on
+# (teacher_id, during) also serves the && and <@ window queries.
+# Checked at commit, so slots can be moved past each other in one save.
+_availability_table.append_constraint(
+    ExcludeConstraint(
+        (_availability_table.c.teacher_id, "="),
+        (availability_during, "&&"),
+        name="teacher_availability_no_overlap",
+        using="gist",
+        deferrable=True,
+        initially="DEFERRED",
+    )
+)
+# teacher_id = can only be part of a GiST index with btree_gist
+event.listen(
+    _availability_table,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS btree_gist"),
+)
+
+
+class TeacherAvailabilityRule(DBModel, table=True):
+    """
+    Recurring availability, stored as one row and expanded into
+    occurrences when a window of availability is read.
+
+    ``rrule`` is an RFC 5545 recurrence rule such as
+    ``FREQ=WEEKLY;BYDAY=MO,WE``. Each occurrence starts at a time
+    generated from ``dtstart`` and lasts ``duration`` minutes. Starts
+    listed in ``exdates`` are skipped.
+    """
+
+    __tablename__: ClassVar[
+        Union[str, Callable[..., str]]
+    ] = "teacher_availability_rule"
+
+    id: Optional[UUID4] = Field(
+        sa_column=Column(UUID(as_uuid=True), primary_key=True, default=uuid4),
+    )
+
+    teacher_id: int = Field(foreign_key="teacher.id", index=True)
+    title: str = Field(
+        default="available",
+        nullable=False,
+        sa_column_kwargs={"server_default": "available"},
+    )
+    rrule: str
+    dtstart: datetime
+    duration: int
+    until: Optional[datetime] = None
+    exdates: List[datetime] = Field(
+        default_factory=list,
+        sa_column=Column(ARRAY(DateTime), nullable=False, server_default="{}"),
+    )
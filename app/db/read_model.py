@@ -0,0 +1,36 @@
+from typing import Any
+
+from pydantic import BaseModel
+from pydantic.utils import GetterDict
+from sqlalchemy import inspect
+from sqlalchemy.exc import NoInspectionAvailable
+
+
+class LoadedGetterDict(GetterDict):
+    """
+    Reads only the attributes of a model which are already loaded, so
+    building a schema from it never triggers a lazy load
+    """
+
+    def __init__(self, obj: Any) -> None:
+        super().__init__(obj)
+        try:
+            self._unloaded = inspect(obj).unloaded
+        except NoInspectionAvailable:
+            self._unloaded = frozenset()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        if key in self._unloaded:
+            return default
+        return super().get(key, default)
+
+
+class ReadModel(BaseModel):
+    """
+    Response schema built from a table model with ``from_orm``.
+    Relationships which weren't loaded are left as their default.
+    """
+
+    class Config:
+        orm_mode = True
+        getter_dict = LoadedGetterDict
@@ -0,0 +1,143 @@
+"""
+Routes reads to the replicas, with read-your-writes. After a user
+writes, their reads go to the primary for READ_YOUR_WRITES_WINDOW
+seconds, so they never read a replica that hasn't caught up with them.
+
+The pin is stored on the primary by user, so it holds for whichever
+client, token or worker they use next, and clients can't set it. It is
+read with the principal, so routed reads still run that one query on
+the primary: a replica may not have received a pin written a moment ago.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import AsyncGenerator, Generator
+
+from fastapi import Depends
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.auth.principal import Principal, get_principal, get_sync_principal
+from app.core.config import settings
+from app.db.get_session import (
+    REPLICA,
+    get_async_engine,
+    get_async_session,
+    get_session,
+    next_replica,
+)
+from app.db.models.user.user import ReadYourWrites
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def pinned_to_primary(principal: Principal) -> bool:
+    until = principal.primary_reads_until
+    return until is not None and until > datetime.utcnow()
+
+
+async def pin_to_primary(user_id: int, window: int) -> None:
+    table = ReadYourWrites.__table__  # type: ignore
+    statement = insert(table).values(
+        user_id=user_id, until=datetime.utcnow() + timedelta(seconds=window)
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.user_id],
+        set_={"until": statement.excluded.until},
+    )
+    async with get_async_engine().begin() as conn:
+        await conn.execute(statement)
+
+
+def _needs_pin(principal: Principal, window: int) -> bool:
+    # Writes in quick succession share a pin instead of each writing one
+    until = principal.primary_reads_until
+    return until is None or until < datetime.utcnow() + timedelta(
+        seconds=window / 2
+    )
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pins the user to the primary after any successful write, before the
+    response is sent
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] in SAFE_METHODS
+            or not settings.READ_REPLICA_URLS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        async def send_after_pin(message: Message) -> None:
+            if message["type"] == "http.response.start" and (
+                message["status"] < 400
+            ):
+                await self._pin(scope)
+            await send(message)
+
+        await self.app(scope, receive, send_after_pin)
+
+    async def _pin(self, scope: Scope) -> None:
+        state = scope.get("state", {})
+        # Set on the request by get_current_user, so routes which don't
+        # resolve the principal pin their user too
+        user_id = state.get("user_id")
+        if user_id is None:
+            return
+        # Only known when a principal dependency ran
+        principal = state.get("principal")
+        window = settings.READ_YOUR_WRITES_WINDOW
+        if principal is not None and not _needs_pin(principal, window):
+            return
+        try:
+            await pin_to_primary(user_id, window)
+        except Exception:
+            # The write went through, so the response still goes out
+            logger.exception("Pinning user %s to the primary failed", user_id)
+
+
+def get_read_session(
+    session: Session = Depends(get_session),
+    principal: Principal = Depends(get_sync_principal),
+) -> Generator[Session, None, None]:
+    """
+    Session on a read replica, for GET routes which never write. Falls
+    back to the primary ``session``, which holds no connection until
+    used, without replicas or right after the user wrote.
+
+    The principal, and with it the user's pin, is always read from the
+    primary ``session``, which a replica can't stand in for.
+    """
+    replica = None if pinned_to_primary(principal) else next_replica()
+    if replica is None:
+        yield session
+        return
+    with Session(replica[0], info={REPLICA: True}) as read_session:
+        yield read_session
+
+
+async def get_async_read_session(
+    session: AsyncSession = Depends(get_async_session),
+    principal: Principal = Depends(get_principal),
+) -> AsyncGenerator[AsyncSession, None]:
+    """
+    Async counterpart of get_read_session
+    """
+    replica = None if pinned_to_primary(principal) else next_replica()
+    if replica is None:
+        yield session
+        return
+    async with AsyncSession(
+        replica[1], expire_on_commit=False, info={REPLICA: True}
+    ) as read_session:
+        yield read_session
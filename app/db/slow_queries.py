@@ -0,0 +1,202 @@
+"""
+Opt-in log of slow SQL. Statements slower than SLOW_QUERY_THRESHOLD are
+logged with the shape of their parameters, and their plan is captured
+with EXPLAIN on a background thread, so the request that ran them is not
+held up. Enabled with SLOW_QUERY_LOG.
+"""
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Union
+
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql.psycopg2 import PGDialect_psycopg2
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+# Execution option of connections the log leaves alone
+SKIP = "skip_slow_query_log"
+
+Parameters = Union[Dict[str, Any], List[Any], tuple, None]
+
+
+def parameter_shape(parameters: Parameters) -> Any:
+    """
+    Types of the bound parameters without their values, which may be
+    personal data, such as ``{"email_1": "str"}``
+    """
+
+    def shape(value: Any) -> str:
+        if isinstance(value, (list, tuple)):
+            return f"{type(value).__name__}[{len(value)}]"
+        return type(value).__name__
+
+    if isinstance(parameters, dict):
+        return {key: shape(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [shape(value) for value in parameters]
+    return None
+
+
+def _adapt(parameters: Parameters) -> Parameters:
+    # asyncpg takes UUIDs as they are, psycopg2 needs them as text
+    def adapt(value: Any) -> Any:
+        return str(value) if isinstance(value, uuid.UUID) else value
+
+    if isinstance(parameters, dict):
+        return {key: adapt(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return tuple(adapt(value) for value in parameters)
+    return parameters
+
+
+def is_select(statement: str) -> bool:
+    return statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "WITH")
+
+
+def explain(
+    conn: Connection,
+    statement: str,
+    parameters: Parameters = None,
+    analyze: bool = False,
+) -> List[Dict]:
+    """
+    JSON plan of a statement as the driver received it. ANALYZE runs the
+    statement, so callers only ask for it on reads.
+    """
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    return conn.exec_driver_sql(
+        f"EXPLAIN ({options}) {statement}", _adapt(parameters) or ()
+    ).scalar_one()
+
+
+def explain_statement(conn: Connection, statement: Any) -> List[Dict]:
+    """
+    JSON plan of an SQLAlchemy statement
+    """
+    compiled = statement.compile(dialect=PGDialect_psycopg2())
+    return explain(conn, str(compiled), compiled.params)
+
+
+def plan_nodes(plan: List[Dict]) -> List[Dict]:
+    """
+    Every node of a JSON plan, depth first
+    """
+    nodes: List[Dict] = []
+
+    def walk(node: Dict) -> None:
+        nodes.append(node)
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan[0]["Plan"])
+    return nodes
+
+
+def plan_indexes(plan: List[Dict]) -> List[str]:
+    """
+    Names of the indexes a JSON plan reads
+    """
+    return [
+        node["Index Name"] for node in plan_nodes(plan) if "Index Name" in node
+    ]
+
+
+class SlowQueryLog:
+    """
+    Times the statements of the engines it is installed on. Plans are
+    captured one at a time through ``explain_engine``, a sync engine on
+    the same database, and dropped when too many are already queued.
+    """
+
+    def __init__(
+        self,
+        explain_engine: Engine,
+        threshold: float,
+        analyze: bool = True,
+        statement_timeout: int = 10_000,  # milliseconds
+        max_pending: int = 10,
+    ) -> None:
+        self.explain_engine = explain_engine
+        self.threshold = threshold
+        self.analyze = analyze
+        self.statement_timeout = statement_timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="slow-query-explain"
+        )
+        self._pending = threading.BoundedSemaphore(max_pending)
+
+    def install(self, engine: Engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+
+    def uninstall(self, engine: Engine) -> None:
+        event.remove(engine, "before_cursor_execute", self._before)
+        event.remove(engine, "after_cursor_execute", self._after)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def _before(self, conn: Connection, *args: Any) -> None:
+        if conn.get_execution_options().get(SKIP):
+            return
+        conn.info["slow_query_started"] = time.perf_counter()
+
+    def _after(
+        self,
+        conn: Connection,
+        cursor: Any,
+        statement: str,
+        parameters: Parameters,
+        context: Any,
+        executemany: bool,
+    ) -> None:
+        started = conn.info.pop("slow_query_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        if elapsed < self.threshold:
+            return
+        logger.warning(
+            "Slow query took %.3f s: %s parameters=%s",
+            elapsed,
+            statement,
+            json.dumps(parameter_shape(parameters)),
+        )
+        if executemany or not self._pending.acquire(blocking=False):
+            return
+        self._executor.submit(self._log_plan, statement, parameters)
+
+    def _log_plan(self, statement: str, parameters: Parameters) -> None:
+        try:
+            plan = self.capture_plan(statement, parameters)
+        except Exception:
+            logger.exception("Could not explain slow query: %s", statement)
+        else:
+            logger.warning(
+                "Plan of slow query: %s\n%s",
+                statement,
+                json.dumps(plan, indent=2),
+            )
+        finally:
+            self._pending.release()
+
+    def capture_plan(
+        self, statement: str, parameters: Parameters
+    ) -> List[Dict]:
+        analyze = self.analyze and is_select(statement)
+        with self.explain_engine.connect() as conn:
+            # Or a slow plan would be logged and explained again
+            conn = conn.execution_options(**{SKIP: True})
+            # Rolled back, so an analyzed statement leaves nothing behind
+            with conn.begin() as transaction:
+                conn.exec_driver_sql(
+                    f"SET LOCAL statement_timeout = {self.statement_timeout}"
+                )
+                plan = explain(conn, statement, parameters, analyze=analyze)
+                transaction.rollback()
+        return plan
@@ -1,15 +1,25 @@
 from typing import Dict
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from sqlmodel import Session
 
 
 from app.bookings.router import booking_router
 from app.auth.router import auth_router
 
+from app.payment.api.dependencies import close_stripe_client
 from app.payment.api.router import payment_router
+from app.payment.events import stripe_event_processor
 from app.course.api.router import course_router
+from app.db import migrations
+from app.db.get_session import dispose_engine, init_engine
+from app.db.replicas import ReadYourWritesMiddleware
+from app.organization.cache import ensure_default_organization
+from app.stats.metrics import MetricsMiddleware
+from app.stats.router import metrics_router, stats_router
+from app.utils.responses import ORJSONResponse
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 origins = ["*"]
 
@@ -20,6 +30,30 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(ReadYourWritesMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+
+@app.on_event("startup")
+def on_startup() -> None:
+    engine = init_engine()
+    # Migrations run at deploy, so a worker only confirms they did.
+    # The full schema diff is left to python -m app.cli.migrate check.
+    migrations.check_version(engine)
+    with Session(engine) as session:  # type: ignore
+        ensure_default_organization(session)
+
+
+@app.on_event("startup")
+async def start_background_tasks() -> None:
+    stripe_event_processor.start()
+
+
+@app.on_event("shutdown")
+async def on_shutdown() -> None:
+    await stripe_event_processor.stop()
+    close_stripe_client()
+    await dispose_engine()
 
 
 @app.get("/test")
@@ -34,3 +68,5 @@ app.include_router(booking_router)
 app.include_router(auth_router)
 app.include_router(payment_router)
 app.include_router(course_router)
+app.include_router(stats_router)
+app.include_router(metrics_router)
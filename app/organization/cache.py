@@ -0,0 +1,99 @@
+import threading
+from typing import Dict, Optional
+
+from cachetools import TTLCache
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+from sqlmodel import Session
+
+from app.core.config import settings
+from app.organization.model import OrganizationModel
+
+
+class OrganizationCache:
+    """
+    Per process cache of organizations, which are read on most
+    requests but practically never change.
+
+    Cached rows are detached. They are merged into the caller's session
+    without a query, so each request gets its own instance.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 128) -> None:
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(
+        self, session: Session, organization_id: int
+    ) -> Optional[OrganizationModel]:
+        with self._lock:
+            cached: Optional[OrganizationModel] = self._cache.get(
+                organization_id
+            )
+            if cached is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        if cached is not None:
+            return session.merge(cached, load=False)
+        org = session.get(OrganizationModel, organization_id)
+        if org:
+            self.prime(org)
+        return org
+
+    def get_default(self, session: Session) -> OrganizationModel:
+        org = self.get(session, settings.DEFAULT_ORGANIZATION_ID)
+        if org:
+            return org
+        # Normally created at startup, see ensure_default_organization
+        org = OrganizationModel.get_default_organization(session)
+        self.prime(org)
+        return org
+
+    def prime(self, org: OrganizationModel) -> None:
+        detached = OrganizationModel(**org.dict())
+        make_transient_to_detached(detached)
+        with self._lock:
+            self._cache[org.id] = detached
+
+    def invalidate(self, organization_id: int) -> None:
+        with self._lock:
+            self._cache.pop(organization_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._cache),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+organization_cache = OrganizationCache(ttl=settings.ORGANIZATION_CACHE_TTL)
+
+
+def ensure_default_organization(session: Session) -> OrganizationModel:
+    """
+    Creates the default organization if needed and caches it.
+    Called once at startup so requests never have to insert it.
+    """
+    org = OrganizationModel.get_default_organization(session)
+    organization_cache.prime(org)
+    return org
+
+
+@event.listens_for(OrganizationModel, "after_update")
+@event.listens_for(OrganizationModel, "after_delete")
+def _invalidate_organization(
+    mapper: object, connection: object, target: OrganizationModel
+) -> None:
+    if target.id is not None:
+        organization_cache.invalidate(target.id)
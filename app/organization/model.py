@@ -9,6 +9,12 @@ from app.core.config import settings
 class OrganizationModel(DBModel, table=True):
     __tablename__: ClassVar[Union[str, CallableError]] = "organization"
     id: Optional[int] = Field(primary_key=True, default=None)
+    # Bumped by Course.touch whenever one of the organization's courses
+    # changes. Always read with a query, as cached organizations hold a
+    # stale copy.
+    courses_revision: int = Field(
+        default=0, nullable=False, sa_column_kwargs={"server_default": "0"}
+    )
 
     @staticmethod
     def get_default_organization(session: Session) -> "OrganizationModel":
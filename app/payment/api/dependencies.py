@@ -1,5 +1,25 @@
+from typing import Optional
+
 from app.core.config import settings
+from app.payment.stripe_client import StripeClient
+
+_stripe_client: Optional[StripeClient] = None
+
+
+def get_stripe_client() -> StripeClient:
+    global _stripe_client
+    if _stripe_client is None:
+        _stripe_client = StripeClient(
+            api_key=settings.STRIPE_API_KEY,
+            api_base=settings.STRIPE_API_BASE,
+            max_concurrency=settings.STRIPE_MAX_CONCURRENCY,
+            timeout=settings.STRIPE_TIMEOUT,
+        )
+    return _stripe_client
 
 
-async def get_stripe_api_key() -> str:
-    return settings.STRIPE_API_KEY
+def close_stripe_client() -> None:
+    global _stripe_client
+    if _stripe_client is not None:
+        _stripe_client.close()
+        _stripe_client = None
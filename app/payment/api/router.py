@@ -1,19 +1,23 @@
+import json
 from typing import Literal
 from fastapi import APIRouter, Depends, HTTPException, Header, Request, status
 from pydantic import BaseModel
-from sqlmodel import Session
-from stripe import PaymentIntent
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.auth.get_current_user import get_current_user
 from app.core.config import settings
-from app.db.models.payment.payment import Payment
 
 
-from app.db.get_session import get_session
+from app.db.get_session import get_async_session
 
 import stripe
 from app.db.models.user.user import UserFull
-from app.payment.api.dependencies import get_stripe_api_key
+from app.payment.api.dependencies import get_stripe_client
 from app.payment.api.types import StripePaymentIntentMetadata
+from app.payment.events import record_stripe_event, stripe_event_processor
+from app.payment.stripe_client import (
+    StripeClient,
+    payment_intent_idempotency_key,
+)
 
 
 payment_router = APIRouter(
@@ -33,11 +37,9 @@ class CreatePaymentIntentPayload(BaseModel):
 @payment_router.post("/create-payment-intent")
 async def create_payment_intent(
     payload: CreatePaymentIntentPayload,
-    stripe_api_key: str = Depends(get_stripe_api_key),
-    session: Session = Depends(get_session),
+    stripe_client: StripeClient = Depends(get_stripe_client),
     current_user: UserFull = Depends(get_current_user),
 ):
-    stripe.api_key = stripe_api_key
     if not current_user.google_id:
         raise HTTPException(
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
@@ -47,10 +49,16 @@ async def create_payment_intent(
         course_package=payload.course_package,
         user_google_id=current_user.google_id,
     )
-    intent = stripe.PaymentIntent.create(
+    intent = await stripe_client.create_payment_intent(
         amount=payload.amount,
         currency=payload.currency,
         metadata=metadata.__dict__,
+        idempotency_key=payment_intent_idempotency_key(
+            current_user.id,
+            payload.course_package,
+            payload.amount,
+            payload.currency,
+        ),
     )
     return {"secret": intent["client_secret"]}
 
@@ -59,30 +67,29 @@ async def create_payment_intent(
 async def receive_stripe_webhook(
     request: Request,
     stripe_signature: str = Header(str),
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
 ):
-    event = None
+    """
+    Verifies the event and stores it in the inbox, so Stripe gets its
+    response straight away. StripeEventProcessor handles it afterwards.
+    """
     data = await request.body()
 
     try:
-        event = stripe.Webhook.construct_event(
+        stripe.Webhook.construct_event(
             payload=data,
             sig_header=stripe_signature,
             secret=settings.STRIPE_WEBHOOK_SECRET,
         )
-    except ValueError as e:
-        # Invalid payload
-        raise e
-    except stripe.error.SignatureVerificationError as e:  # type: ignore
-        # Invalid signature
-        raise e
-    if event["type"] == "payment_intent.succeeded":
-        payment_intent: PaymentIntent = event["data"]["object"]
-
-        Payment.register_stripe_payment_intent(
-            session=session, payment_intent=payment_intent
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid payload"
+        )
+    except stripe.error.SignatureVerificationError:  # type: ignore
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid signature"
         )
 
-    # ... handle other event types
-    else:
-        print("Unhandled event type {}".format(event["type"]))
+    if await record_stripe_event(session, json.loads(data)):
+        stripe_event_processor.notify()
+    return {"received": True}
@@ -0,0 +1,208 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import and_, col, or_, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import settings
+from app.db.get_session import get_async_engine
+from app.db.models.payment.payment import Payment
+from app.db.models.payment.stripe_event import StripeEvent
+
+logger = logging.getLogger(__name__)
+
+StripeEventHandler = Callable[[AsyncSession, StripeEvent], Awaitable[None]]
+
+stripe_event_handlers: Dict[str, StripeEventHandler] = {}
+
+
+def stripe_event_handler(
+    event_type: str,
+) -> Callable[[StripeEventHandler], StripeEventHandler]:
+    """
+    Registers a handler for a Stripe event type. Handlers run inside the
+    processor's transaction and must not commit.
+    """
+
+    def register(handler: StripeEventHandler) -> StripeEventHandler:
+        stripe_event_handlers[event_type] = handler
+        return handler
+
+    return register
+
+
+@stripe_event_handler("payment_intent.succeeded")
+async def handle_payment_intent_succeeded(
+    session: AsyncSession, event: StripeEvent
+) -> None:
+    await Payment.register_stripe_payment_intent(
+        session=session, payment_intent=event.payload["data"]["object"]
+    )
+
+
+async def record_stripe_event(
+    session: AsyncSession, payload: Dict[str, Any]
+) -> bool:
+    """
+    Stores a verified webhook event in the inbox. Returns False when the
+    event had already been received.
+    """
+    statement = (
+        insert(StripeEvent.__table__)  # type: ignore
+        .values(
+            id=payload["id"],
+            type=payload["type"],
+            payload=payload,
+            received_at=datetime.utcnow(),
+            attempts=0,
+        )
+        .on_conflict_do_nothing(index_elements=["id"])
+    )
+    result = await session.execute(statement)
+    await session.commit()
+    return result.rowcount > 0
+
+
+@dataclass
+class StripeEventBatch:
+    read: int = 0
+    handled: int = 0
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """
+    Wait before retrying an event which has failed ``attempts`` times
+    """
+    return timedelta(
+        seconds=settings.STRIPE_EVENT_RETRY_DELAY * 2 ** (attempts - 1)
+    )
+
+
+def _failed(event: StripeEvent, error: Exception, now: datetime) -> None:
+    event.attempts += 1
+    event.last_error = str(error)
+    if event.attempts < settings.STRIPE_EVENT_MAX_ATTEMPTS:
+        event.next_attempt_at = now + retry_delay(event.attempts)
+        return
+    # Left pending with its error, for someone to look into and replay
+    logger.error(
+        "Stripe event %s (%s) failed %d times and won't be retried: %s",
+        event.id,
+        event.type,
+        event.attempts,
+        event.last_error,
+    )
+
+
+async def process_stripe_events(
+    session: AsyncSession, batch_size: int = settings.STRIPE_EVENT_BATCH_SIZE
+) -> StripeEventBatch:
+    """
+    Handles one batch of pending events which are due. Rows are locked
+    with SKIP LOCKED, so several workers can drain the inbox at once. An
+    event whose handler fails is retried after a delay which doubles
+    each time, up to STRIPE_EVENT_MAX_ATTEMPTS times.
+    """
+    now = datetime.utcnow()
+    statement = (
+        select(StripeEvent)
+        .where(
+            and_(
+                col(StripeEvent.processed_at).is_(None),
+                col(StripeEvent.attempts) < settings.STRIPE_EVENT_MAX_ATTEMPTS,
+                or_(
+                    col(StripeEvent.next_attempt_at).is_(None),
+                    col(StripeEvent.next_attempt_at) <= now,
+                ),
+            )
+        )
+        .order_by(col(StripeEvent.received_at))
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    events = (await session.exec(statement)).all()
+    batch = StripeEventBatch(read=len(events))
+    for event in events:
+        handler = stripe_event_handlers.get(event.type)
+        if handler is None:
+            logger.info("No handler for Stripe event type %s", event.type)
+        else:
+            try:
+                async with session.begin_nested():
+                    await handler(session, event)
+            except Exception as e:
+                logger.exception("Handling Stripe event %s failed", event.id)
+                _failed(event, e, now)
+                continue
+        event.processed_at = datetime.utcnow()
+        batch.handled += 1
+    await session.commit()
+    return batch
+
+
+class StripeEventProcessor:
+    """
+    Background task draining the Stripe event inbox. It wakes up when
+    the webhook stores an event, and polls in case an event was stored
+    by another worker process.
+    """
+
+    def __init__(
+        self,
+        poll_interval: float = settings.STRIPE_EVENT_POLL_INTERVAL,
+        batch_size: int = settings.STRIPE_EVENT_BATCH_SIZE,
+    ) -> None:
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    def start(self) -> None:
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def notify(self) -> None:
+        if self._wake is not None:
+            self._wake.set()
+
+    async def drain(self) -> int:
+        processed = 0
+        async with AsyncSession(
+            get_async_engine(), expire_on_commit=False
+        ) as session:
+            while True:
+                batch = await process_stripe_events(session, self.batch_size)
+                processed += batch.handled
+                # A full batch which all failed would only be read again
+                if batch.read < self.batch_size or not batch.handled:
+                    return processed
+
+    async def _run(self) -> None:
+        assert self._wake is not None
+        while True:
+            self._wake.clear()
+            try:
+                await self.drain()
+            except Exception:
+                logger.exception("Draining the Stripe event inbox failed")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+stripe_event_processor = StripeEventProcessor()
@@ -0,0 +1,104 @@
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from stripe import PaymentIntent
+from stripe.api_requestor import APIRequestor
+from stripe.http_client import RequestsClient
+from stripe.util import convert_to_stripe_object
+
+
+def payment_intent_idempotency_key(
+    user_id: int, course_package: str, amount: int, currency: str
+) -> str:
+    """
+    Retries of the same purchase get the same payment intent back from
+    Stripe instead of creating another one
+    """
+    raw = f"{user_id}:{course_package}:{amount}:{currency}".encode()
+    return f"payment-intent-{hashlib.sha256(raw).hexdigest()}"
+
+
+class StripeClient:
+    """
+    Per process Stripe client.
+
+    The api key and base are kept on the client rather than on the
+    ``stripe`` module, and connections are reused through one pooled
+    requests session. The stripe library is synchronous, so calls run
+    on a bounded pool of worker threads and never block the event loop.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        api_base: Optional[str] = None,
+        max_concurrency: int = 10,
+        timeout: float = 30,
+    ) -> None:
+        self._http = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=max_concurrency)
+        self._http.mount("https://", adapter)
+        self._http.mount("http://", adapter)
+        self._requestor = APIRequestor(
+            key=api_key,
+            client=RequestsClient(timeout=timeout, session=self._http),
+            api_base=api_base,
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="stripe"
+        )
+
+    def _request(
+        self,
+        method: str,
+        url: str,
+        params: Dict[str, Any],
+        idempotency_key: Optional[str] = None,
+    ) -> Any:
+        headers = (
+            {"Idempotency-Key": idempotency_key} if idempotency_key else {}
+        )
+        response, api_key = self._requestor.request(
+            method, url, params, headers
+        )
+        return convert_to_stripe_object(response, api_key)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        params: Dict[str, Any],
+        idempotency_key: Optional[str] = None,
+    ) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._executor,
+            self._request,
+            method,
+            url,
+            params,
+            idempotency_key,
+        )
+
+    async def create_payment_intent(
+        self,
+        *,
+        amount: int,
+        currency: str,
+        metadata: Dict[str, str],
+        idempotency_key: Optional[str] = None,
+    ) -> PaymentIntent:
+        return await self.request(
+            "post",
+            "/v1/payment_intents",
+            {"amount": amount, "currency": currency, "metadata": metadata},
+            idempotency_key,
+        )
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        self._http.close()
@@ -0,0 +1,122 @@
+"""
+Prometheus metrics per route template: latency, SQL statements, database
+time and pool wait. Requests running more statements than
+METRICS_QUERY_THRESHOLD are counted and logged, to catch N+1 queries.
+"""
+import logging
+import time
+from typing import Any, Dict
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.db.instrumentation import QueryStats, track_queries
+
+logger = logging.getLogger(__name__)
+
+registry = CollectorRegistry()
+
+LABELS = ["method", "route"]
+# Statements per request, up to well past any sane page
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+
+request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Time to send the whole response",
+    LABELS + ["status"],
+    registry=registry,
+)
+request_queries = Histogram(
+    "http_request_db_queries",
+    "SQL statements run per request",
+    LABELS,
+    buckets=QUERY_BUCKETS,
+    registry=registry,
+)
+request_db_time = Histogram(
+    "http_request_db_seconds",
+    "Time spent executing SQL per request",
+    LABELS,
+    registry=registry,
+)
+request_pool_wait = Histogram(
+    "http_request_db_pool_wait_seconds",
+    "Time spent waiting for a pooled connection per request",
+    LABELS,
+    registry=registry,
+)
+query_threshold_exceeded = Counter(
+    "http_requests_over_query_threshold",
+    "Requests that ran more SQL statements than METRICS_QUERY_THRESHOLD",
+    LABELS,
+    registry=registry,
+)
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+def render() -> bytes:
+    return generate_latest(registry)
+
+
+def route_template(scope: Scope) -> str:
+    """
+    Path the request was routed by, such as ``/course/{course_id}``.
+    Unrouted paths share one label so they can't blow up cardinality.
+    """
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "<unmatched>")
+    return "<unmatched>"
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status: Dict[str, Any] = {"code": 500}
+
+        async def send_status(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        with track_queries() as stats:
+            try:
+                await self.app(scope, receive, send_status)
+            finally:
+                self._observe(
+                    scope, status["code"], time.perf_counter() - started, stats
+                )
+
+    def _observe(
+        self, scope: Scope, status: int, duration: float, stats: QueryStats
+    ) -> None:
+        labels = {"method": scope["method"], "route": route_template(scope)}
+        request_duration.labels(status=str(status), **labels).observe(duration)
+        request_queries.labels(**labels).observe(stats.statements)
+        request_db_time.labels(**labels).observe(stats.db_time)
+        request_pool_wait.labels(**labels).observe(stats.pool_wait)
+        if stats.statements > settings.METRICS_QUERY_THRESHOLD:
+            query_threshold_exceeded.labels(**labels).inc()
+            logger.warning(
+                "%s %s ran %d SQL statements",
+                labels["method"],
+                labels["route"],
+                stats.statements,
+            )
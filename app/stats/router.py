@@ -0,0 +1,52 @@
+from typing import Dict
+
+from fastapi import APIRouter, Response
+
+from app.bookings.recurrence import recurrence_cache
+from app.db.get_session import get_pool_stats
+from app.organization.cache import organization_cache
+from app.stats import metrics
+
+stats_router = APIRouter(
+    prefix="/stats",
+    tags=["stats"],
+    responses={404: {"description": "Not found"}},
+    dependencies=[],
+)
+
+metrics_router = APIRouter(tags=["stats"])
+
+
+@stats_router.get("/db-pool")
+def db_pool_stats() -> Dict:
+    """
+    Connection pool usage for the current worker process
+    """
+    return {
+        name: {**stats.__dict__, "wait_time_avg": stats.wait_time_avg}
+        for name, stats in get_pool_stats().items()
+    }
+
+
+@stats_router.get("/organization-cache")
+def organization_cache_stats() -> Dict:
+    """
+    Hit and miss counts of the organization cache in this worker
+    """
+    return organization_cache.stats()
+
+
+@stats_router.get("/recurrence-cache")
+def recurrence_cache_stats() -> Dict:
+    """
+    Hit and miss counts of the recurring availability expansions
+    """
+    return recurrence_cache.stats()
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+def prometheus_metrics() -> Response:
+    """
+    Request and SQL metrics of this worker in Prometheus text format
+    """
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,11 @@
+from datetime import datetime, timezone
+
+
+def to_naive_utc(value: datetime) -> datetime:
+    """
+    Timestamp columns are stored without a timezone, in UTC.
+    Aware datetimes are converted so they can be bound by asyncpg.
+    """
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
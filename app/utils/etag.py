@@ -0,0 +1,52 @@
+"""
+Weak ETags for GET routes. The tag is built from a cheap version stamp
+of the resource, such as a revision counter, so a matching
+If-None-Match can be answered with a 304 before any rows are loaded.
+"""
+import hashlib
+from typing import Any, TypeVar
+
+from fastapi import Request, Response, status
+
+R = TypeVar("R", bound=Response)
+
+
+def weak_etag(request: Request, *version: Any) -> str:
+    """
+    ETag of the response to ``request`` while the resource is at
+    ``version``. The path and query string are part of it, since they
+    change what is returned.
+    """
+    raw = "\n".join(
+        [request.url.path, request.url.query, *(str(v) for v in version)]
+    )
+    return f'W/"{hashlib.blake2b(raw.encode(), digest_size=12).hexdigest()}"'
+
+
+def _opaque(tag: str) -> str:
+    tag = tag.strip()
+    return tag[2:] if tag.startswith("W/") else tag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Whether If-None-Match lists ``etag``, compared weakly
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(_opaque(tag) == _opaque(etag) for tag in header.split(","))
+
+
+def with_etag(response: R, etag: str) -> R:
+    # Responses depend on who is asking, so only the client may keep
+    # them, and it has to revalidate before reusing one
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def not_modified(etag: str) -> Response:
+    return with_etag(Response(status_code=status.HTTP_304_NOT_MODIFIED), etag)
@@ -1,22 +1,111 @@
-from pydantic import BaseModel
+import base64
+import json
+from typing import (
+    Any,
+    Callable,
+    Generic,
+    List,
+    Optional,
+    Sequence,
+    Type,
+    TypeVar,
+)
+
+from fastapi import HTTPException, status
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ValidationError
+from pydantic.generics import GenericModel
 
 from app.core.config import settings
 
+T = TypeVar("T")
+P = TypeVar("P", bound=BaseModel)
+
 
 class ListAPIParams(BaseModel):
     """
     Base model for list API routes
     specifies query params relating to
     pagination
+
+    Passing ``cursor`` switches to keyset pagination, which stays fast
+    however deep the client pages. An empty cursor asks for the first
+    page, after that send the ``next_cursor`` of the previous page.
     """
 
     limit: int = 100
     page: int = 0
+    cursor: Optional[str] = None
+
+    @property
+    def use_cursor(self) -> bool:
+        return self.cursor is not None
+
+    @property
+    def offset(self) -> int:
+        return self.limit * self.page
+
+
+class CursorPage(GenericModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Opaque cursor pointing just after the given sort key
+    """
+    raw = json.dumps([str(value) for value in values]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str, *parsers: Callable[[str], Any]) -> List[Any]:
+    """
+    Reverses encode_cursor, parsing each value of the sort key with the
+    matching parser
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(parsers):
+            raise ValueError("Cursor doesn't match the sort key")
+        # encode_cursor only writes strings
+        if not all(isinstance(value, str) for value in values):
+            raise ValueError("Cursor doesn't match the sort key")
+        return [parse(value) for parse, value in zip(parsers, values)]
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def to_cursor_page(
+    rows: Sequence[T], limit: int, sort_key: Callable[[T], Sequence[Any]]
+) -> CursorPage[T]:
+    """
+    Builds a page from up to limit + 1 rows, the extra row only tells us
+    whether there is a next page
+    """
+    items = list(rows[:limit])
+    next_cursor = None
+    if len(rows) > limit and items:
+        next_cursor = encode_cursor(*sort_key(items[-1]))
+    return CursorPage(items=items, next_cursor=next_cursor)
 
 
-async def list_params(limit: int = settings.DEFAULT_PAGE_SIZE, page: int = 0):
+def build_params(model: Type[P], **values: Any) -> P:
+    """
+    Builds the params of a list route, answering invalid values with a
+    422 like FastAPI's own query validation
+    """
     try:
-        params = ListAPIParams(limit=limit, page=page)
-        return params
-    except Exception as e:
-        print(e)
+        return model(**values)
+    except ValidationError as e:
+        raise RequestValidationError(e.raw_errors)
+
+
+async def list_params(
+    limit: int = settings.DEFAULT_PAGE_SIZE,
+    page: int = 0,
+    cursor: Optional[str] = None,
+) -> ListAPIParams:
+    return build_params(ListAPIParams, limit=limit, page=page, cursor=cursor)
@@ -0,0 +1,35 @@
+from typing import Any
+from uuid import UUID
+
+import orjson
+from fastapi.responses import ORJSONResponse as _ORJSONResponse
+from pydantic import BaseModel
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.dict()
+    if isinstance(value, UUID):
+        # asyncpg returns its own UUID subclass, which orjson skips
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(
+        content, default=_default, option=orjson.OPT_NON_STR_KEYS
+    )
+
+
+class ORJSONResponse(_ORJSONResponse):
+    """
+    The app's default response. orjson encodes dataclasses, datetimes
+    and UUIDs natively, and pydantic models through ``dict()``.
+
+    A route returning one of these directly skips the validation and
+    encoding FastAPI does for ``response_model``, so only return data
+    which is already in its response shape.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,132 @@
+"""
+Times replacing half of the students of a course with the old list based
+update (``in`` checks on lists, one DELETE per row, a commit per
+association) against the set based sync_association.
+
+Usage:
+    python -m benchmarks.bench_association_sync --students 100 300 1000
+"""
+import argparse
+import time
+from typing import Callable, List
+
+from sqlmodel import Session, SQLModel, col, create_engine
+
+from app.core.config import settings
+from app.db.models.course.course import Course, CourseStudent
+from app.db.models.user.user import Student, User
+from app.main import app as _app  # noqa: F401 registers every table model
+from app.organization.model import OrganizationModel
+
+
+def legacy_update_course_students(
+    course: Course, session: Session, student_ids: List[int]
+) -> None:
+    current_student_ids = [cs.student_id for cs in course.course_students]
+    for course_student in course.course_students:
+        if course_student.student_id not in student_ids:
+            session.delete(course_student)
+    session.add_all(
+        CourseStudent(student_id=student_id, course_id=course.id)
+        for student_id in student_ids
+        if student_id not in current_student_ids
+    )
+    session.commit()
+
+
+def set_based_update_course_students(
+    course: Course, session: Session, student_ids: List[int]
+) -> None:
+    course.update_course_students(session, student_ids)
+    session.commit()
+
+
+def create_students(session: Session, organization_id: int, count: int):
+    users = [
+        User.create_user(
+            name=f"bench {i}",
+            email=f"bench{i}@example.com",
+            organization_id=organization_id,
+        )
+        for i in range(count)
+    ]
+    session.add_all(users)
+    session.flush()
+    students = [Student(user_id=user.id) for user in users]
+    session.add_all(students)
+    session.commit()
+    return [student.id for student in students]
+
+
+def delete_students(session: Session, student_ids: List[int]) -> None:
+    students = session.query(Student).filter(col(Student.id).in_(student_ids))
+    user_ids = [student.user_id for student in students]
+    students.delete(synchronize_session=False)
+    session.query(User).filter(col(User.id).in_(user_ids)).delete(
+        synchronize_session=False
+    )
+    session.commit()
+
+
+def run(
+    session: Session,
+    organization_id: int,
+    student_ids: List[int],
+    update: Callable[[Course, Session, List[int]], None],
+) -> float:
+    course = Course.create_course(
+        session=session,
+        teacher_ids=[],
+        name="bench",
+        organization_id=organization_id,
+        price=0,
+        difficulty=0,
+        max_students=len(student_ids),
+        student_ids=student_ids[: len(student_ids) // 2],
+    )
+    quarter = len(student_ids) // 4
+    replacement = student_ids[quarter:]
+    session.expire_all()
+    started = time.perf_counter()
+    update(course, session, replacement)
+    elapsed = time.perf_counter() - started
+    assert {cs.student_id for cs in course.course_students} == set(replacement)
+    session.delete(course)
+    session.commit()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--students", type=int, nargs="+", default=[100, 300])
+    args = parser.parse_args()
+
+    engine = create_engine(settings.DATABASE_URL)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:  # type: ignore
+        organization = OrganizationModel.get_default_organization(session)
+        for count in args.students:
+            # Twice the roster, so the update adds as well as removes
+            student_ids = create_students(session, organization.id, count * 2)
+            legacy = run(
+                session,
+                organization.id,
+                student_ids,
+                legacy_update_course_students,
+            )
+            set_based = run(
+                session,
+                organization.id,
+                student_ids,
+                set_based_update_course_students,
+            )
+            print(
+                f"{count:6d} students: list based {legacy * 1000:8.1f} ms, "
+                f"set based {set_based * 1000:8.1f} ms "
+                f"({legacy / set_based:.1f}x)"
+            )
+            delete_students(session, student_ids)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compares requests per second for a route that depends on a database
+session, using the old per-request engine (create_engine + create_all on
+every call) against the process wide pooled engine.
+
+Usage:
+    python -m benchmarks.bench_get_session --requests 200 --concurrency 8
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Generator
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.core.config import settings
+from app.db.get_session import dispose_engine, get_pool_stats, get_session
+from app.main import app as _app  # noqa: F401 registers every table model
+
+
+def legacy_get_session() -> Generator[Session, None, None]:
+    engine = create_engine(settings.DATABASE_URL)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:  # type: ignore
+        yield session
+
+
+def build_app(dependency: Callable) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    def ping(session: Session = Depends(dependency)) -> int:
+        return session.execute(text("SELECT 1")).scalar_one()
+
+    return app
+
+
+def run(app: FastAPI, requests: int, concurrency: int) -> float:
+    client = TestClient(app)
+    client.get("/ping")  # warm up
+
+    def call(_: int) -> None:
+        response = client.get("/ping")
+        response.raise_for_status()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(call, range(requests)))
+    return requests / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    legacy = run(build_app(legacy_get_session), args.requests, args.concurrency)
+    pooled = run(build_app(get_session), args.requests, args.concurrency)
+    print(f"per-request engine: {legacy:8.1f} req/s")
+    print(f"pooled engine:      {pooled:8.1f} req/s ({pooled / legacy:.1f}x)")
+    print(f"pool stats: {get_pool_stats()['sync']}")
+    asyncio.run(dispose_engine())
+
+
+if __name__ == "__main__":
+    main()
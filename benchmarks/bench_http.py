@@ -0,0 +1,628 @@
+"""
+HTTP load benchmark of the API. Seeds a local database, boots
+app.main:app under uvicorn against it with Google and Stripe replaced by
+the local fakes in tests/fakes, then drives the /auth, /bookings,
+/course and /payment routes and records throughput and p50/p95/p99
+latency per route.
+
+Results are written as JSON, and ``--compare`` prints the change against
+an earlier results file, so runs on two commits can be compared.
+
+The database at --database-url is dropped and recreated, so it defaults
+to TEST_DATABASE_URL.
+
+Usage:
+    pip install -r requirements-bench.txt
+    python -m benchmarks.bench_http --requests 500 --concurrency 16 \\
+        --output bench-http.json --compare bench-http-main.json
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+from uuid import UUID
+
+import httpx
+from sqlalchemy import insert
+from sqlmodel import Session, create_engine
+
+from app.core.config import settings
+from app.db import migrations
+from app.db.models.course.course import (
+    Course,
+    CourseStudent,
+    CourseTeacher,
+    LiveClass,
+)
+from app.db.models.user.user import (
+    Student,
+    Teacher,
+    TeacherAvailability,
+    TeacherAvailabilityRule,
+    User,
+)
+from app.main import app as _app  # noqa: F401 registers every table model
+from app.organization.model import OrganizationModel
+from tests.fakes.google import FakeGoogleCertServer
+from tests.fakes.stripe import FakeStripeServer
+
+# Seeded availability starts here, one slot an hour per teacher
+SEED_START = datetime(2022, 1, 3)
+WEEKDAYS = ["MO", "TU", "WE", "TH", "FR"]
+
+
+@dataclass
+class Volumes:
+    teachers: int = 50
+    students: int = 500
+    courses: int = 100
+    availability: int = 2000  # rows per teacher
+    rules: int = 2  # recurring rules per teacher
+    course_teachers: int = 2
+    course_students: int = 8
+    classes: int = 4  # per course
+
+
+@dataclass
+class Seeded:
+    teacher_google_ids: List[str]
+    student_google_ids: List[str]
+    course_ids: List[int]
+
+
+def seed(url: str, volumes: Volumes, rng: random.Random) -> Seeded:
+    """
+    Recreates the schema at ``url`` and fills it with ``volumes``
+    """
+    engine = create_engine(url)
+    # The app only starts on a schema stamped by the migrations
+    migrations.reset(engine)
+    migrations.upgrade(engine)
+    with Session(engine) as session:  # type: ignore
+        organization = OrganizationModel.get_default_organization(session)
+        users = [
+            User.create_user(
+                name=f"{role} {i}",
+                email=f"{role}{i}@bench.local",
+                google_id=f"bench-{role}-{i}",
+                organization_id=organization.id,
+            )
+            for role, count in (
+                ("teacher", volumes.teachers),
+                ("student", volumes.students),
+            )
+            for i in range(count)
+        ]
+        session.add_all(users)
+        session.flush()
+        split = volumes.teachers
+        teacher_users, student_users = users[:split], users[split:]
+        teachers = [Teacher(user_id=u.id) for u in teacher_users]
+        students = [Student(user_id=u.id) for u in student_users]
+        session.add_all([*teachers, *students])
+        session.flush()
+
+        for teacher in teachers:
+            session.execute(
+                insert(TeacherAvailability),
+                [
+                    {
+                        "id": UUID(int=rng.getrandbits(128), version=4),
+                        "teacher_id": teacher.id,
+                        "start": SEED_START + timedelta(hours=hour),
+                        "end": SEED_START + timedelta(hours=hour, minutes=45),
+                        "type": "available",
+                        "title": "available",
+                    }
+                    for hour in range(volumes.availability)
+                ],
+            )
+            session.add_all(
+                TeacherAvailabilityRule(
+                    teacher_id=teacher.id,
+                    rrule=f"FREQ=WEEKLY;BYDAY={day}",
+                    dtstart=SEED_START + timedelta(minutes=50),
+                    duration=5,
+                )
+                for day in rng.sample(WEEKDAYS, min(volumes.rules, 5))
+            )
+
+        courses = [
+            Course(
+                organization_id=organization.id,
+                name=f"course {i}",
+                description="",
+                price=rng.randrange(1000, 10000),
+                difficulty=rng.randrange(5),
+                max_students=volumes.course_students,
+            )
+            for i in range(volumes.courses)
+        ]
+        session.add_all(courses)
+        session.flush()
+        for course in courses:
+            session.add_all(
+                CourseTeacher(course_id=course.id, teacher_id=t.id)
+                for t in rng.sample(teachers, volumes.course_teachers)
+            )
+            session.add_all(
+                CourseStudent(course_id=course.id, student_id=s.id)
+                for s in rng.sample(students, volumes.course_students)
+            )
+            session.add_all(
+                LiveClass(
+                    course_id=course.id,
+                    name=f"class {i}",
+                    url=f"https://meet.bench.local/{course.id}/{i}",
+                )
+                for i in range(volumes.classes)
+            )
+        session.commit()
+        seeded = Seeded(
+            teacher_google_ids=[u.google_id for u in teacher_users],
+            student_google_ids=[u.google_id for u in student_users],
+            course_ids=[c.id for c in courses],  # type: ignore
+        )
+    engine.dispose()
+    return seeded
+
+
+@dataclass
+class RequestSpec:
+    method: str
+    path: str
+    params: Dict[str, Any] = field(default_factory=dict)
+    headers: Dict[str, str] = field(default_factory=dict)
+    json: Optional[Any] = None
+    content: Optional[bytes] = None
+
+
+@dataclass
+class RouteResult:
+    name: str
+    requests: int
+    errors: int
+    status_codes: Dict[str, int]
+    throughput_rps: float
+    latency_ms: Dict[str, float]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, env: Dict[str, str], workers: int):
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.main:app",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ],
+        env={**os.environ, **env},
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/test").raise_for_status()
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("uvicorn did not start within 30s")
+
+
+def sign_webhook(payload: bytes, secret: str) -> str:
+    timestamp = int(time.time())
+    signature = hmac.new(
+        secret.encode(), f"{timestamp}.".encode() + payload, hashlib.sha256
+    ).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """
+    Nearest rank percentile of an ordered list
+    """
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+async def run_route(
+    client: httpx.AsyncClient, specs: List[RequestSpec], concurrency: int
+) -> Dict[str, Any]:
+    latencies = [0.0] * len(specs)
+    statuses: Counter = Counter()
+    pending = iter(enumerate(specs))
+
+    async def worker() -> None:
+        for i, spec in pending:
+            started = time.perf_counter()
+            try:
+                response = await client.request(
+                    spec.method,
+                    spec.path,
+                    params=spec.params,
+                    headers=spec.headers,
+                    json=spec.json,
+                    content=spec.content,
+                )
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError:
+                statuses["error"] += 1
+            latencies[i] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    ordered = sorted(latencies)
+    return {
+        "requests": len(specs),
+        "errors": sum(n for s, n in statuses.items() if s[0] not in "23"),
+        "status_codes": dict(sorted(statuses.items())),
+        "throughput_rps": len(specs) / elapsed,
+        "latency_ms": {
+            "mean": sum(ordered) / len(ordered) * 1000,
+            "p50": percentile(ordered, 0.50) * 1000,
+            "p95": percentile(ordered, 0.95) * 1000,
+            "p99": percentile(ordered, 0.99) * 1000,
+            "max": ordered[-1] * 1000,
+        },
+    }
+
+
+async def log_in(
+    client: httpx.AsyncClient, google: FakeGoogleCertServer, google_id: str
+) -> Dict[str, Any]:
+    role, i = google_id.split("-")[1:]
+    response = await client.post(
+        "/auth/google",
+        json={
+            "token": google.sign(
+                settings.GOOGLE_CLIENT_ID,
+                sub=google_id,
+                email=f"{role}{i}@bench.local",
+                name=f"{role} {i}",
+            ),
+            "email": f"{role}{i}@bench.local",
+            "google_id": google_id,
+        },
+    )
+    response.raise_for_status()
+    return response.json()["tokens"]
+
+
+def bearer(tokens: Dict[str, Any]) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {tokens['access_token']}"}
+
+
+async def build_routes(
+    client: httpx.AsyncClient,
+    google: FakeGoogleCertServer,
+    seeded: Seeded,
+    volumes: Volumes,
+    rng: random.Random,
+) -> Dict[str, Callable[[int], RequestSpec]]:
+    """
+    A request builder per benchmarked route, called with the request's
+    index. Logs in the seeded users first.
+    """
+    teachers = [
+        await log_in(client, google, google_id)
+        for google_id in seeded.teacher_google_ids
+    ]
+    students = [
+        await log_in(client, google, google_id)
+        for google_id in seeded.student_google_ids[: len(teachers)]
+    ]
+    google_tokens = [
+        google.sign(
+            settings.GOOGLE_CLIENT_ID,
+            sub=google_id,
+            email=f"student{i}@bench.local",
+            name=f"student {i}",
+        )
+        for i, google_id in enumerate(seeded.student_google_ids)
+    ]
+    seeded_hours = volumes.availability
+
+    def window(days: int) -> Dict[str, str]:
+        start = SEED_START + timedelta(
+            hours=rng.randrange(max(1, seeded_hours - days * 24))
+        )
+        return {
+            "from_date": start.isoformat(),
+            "until_date": (start + timedelta(days=days)).isoformat(),
+        }
+
+    def teacher(i: int) -> Dict[str, str]:
+        return bearer(teachers[i % len(teachers)])
+
+    def student(i: int) -> Dict[str, str]:
+        return bearer(students[i % len(students)])
+
+    def save_week(i: int) -> RequestSpec:
+        # Past the seeded slots, so saves never overlap them
+        start = SEED_START + timedelta(hours=seeded_hours, weeks=i % 4)
+        events = [
+            {
+                "id": str(UUID(int=rng.getrandbits(128), version=4)),
+                "start": (start + timedelta(hours=h)).isoformat(),
+                "end": (start + timedelta(hours=h, minutes=45)).isoformat(),
+            }
+            for h in range(0, 7 * 24, 6)
+        ]
+        return RequestSpec(
+            "POST",
+            "/bookings/teacher-availability",
+            headers=teacher(i),
+            json={
+                "timeframe": {
+                    "start": start.isoformat(),
+                    "end": (start + timedelta(weeks=1)).isoformat(),
+                },
+                "events": events,
+            },
+        )
+
+    def webhook(i: int) -> RequestSpec:
+        payload = json.dumps(
+            {
+                "id": f"evt_bench_{rng.getrandbits(64):x}",
+                "type": "payment_intent.created",
+                "data": {"object": {}},
+            }
+        ).encode()
+        return RequestSpec(
+            "POST",
+            "/payment/stripe-webhook",
+            headers={
+                "Stripe-Signature": sign_webhook(
+                    payload, settings.STRIPE_WEBHOOK_SECRET
+                ),
+                "Content-Type": "application/json",
+            },
+            content=payload,
+        )
+
+    course_list = await client.get(
+        "/course", params={"limit": 50}, headers=student(0)
+    )
+    course_list_etag = course_list.headers["etag"]
+
+    return {
+        "auth.google": lambda i: RequestSpec(
+            "POST",
+            "/auth/google",
+            json={
+                "token": google_tokens[i % len(google_tokens)],
+                "email": f"student{i % len(google_tokens)}@bench.local",
+                "google_id": seeded.student_google_ids[i % len(google_tokens)],
+            },
+        ),
+        "auth.refresh": lambda i: RequestSpec(
+            "POST",
+            "/auth/refresh",
+            json={
+                "refresh_token": students[i % len(students)]["refresh_token"]
+            },
+        ),
+        "bookings.availability.week": lambda i: RequestSpec(
+            "GET",
+            "/bookings/teacher-availability",
+            params=window(7),
+            headers=teacher(i),
+        ),
+        "bookings.availability.cursor": lambda i: RequestSpec(
+            "GET",
+            "/bookings/teacher-availability",
+            params={**window(30), "cursor": "", "limit": 100},
+            headers=teacher(i),
+        ),
+        "bookings.availability.stream": lambda i: RequestSpec(
+            "GET",
+            "/bookings/teacher-availability",
+            params={**window(30), "stream": "true"},
+            headers=teacher(i),
+        ),
+        "bookings.rules": lambda i: RequestSpec(
+            "GET", "/bookings/teacher-availability-rules", headers=teacher(i)
+        ),
+        "bookings.save": save_week,
+        "bookings.free_slots": lambda i: RequestSpec(
+            "GET",
+            "/bookings/free-slots",
+            params={**window(28), "duration": 45, "limit": 20},
+            headers=student(i),
+        ),
+        "course.list": lambda i: RequestSpec(
+            "GET", "/course", params={"limit": 50}, headers=student(i)
+        ),
+        "course.list.revalidate": lambda i: RequestSpec(
+            "GET",
+            "/course",
+            params={"limit": 50},
+            headers={**student(i), "If-None-Match": course_list_etag},
+        ),
+        "course.list.include": lambda i: RequestSpec(
+            "GET",
+            "/course",
+            params={"cursor": "", "limit": 50, "include": "teachers"},
+            headers=student(i),
+        ),
+        "course.detail": lambda i: RequestSpec(
+            "GET",
+            f"/course/{rng.choice(seeded.course_ids)}",
+            params={"include": "teachers,students,classes"},
+            headers=student(i),
+        ),
+        "payment.intent": lambda i: RequestSpec(
+            "POST",
+            "/payment/create-payment-intent",
+            headers=student(i),
+            json={
+                "amount": 1000 + i,
+                "currency": "usd",
+                "course_package": "bench",
+            },
+        ),
+        "payment.webhook": webhook,
+    }
+
+
+async def benchmark(args: argparse.Namespace, port: int) -> List[RouteResult]:
+    # Its own stream, so generated ids never repeat the seeded ones
+    rng = random.Random(f"{args.seed}-requests")
+    volumes = Volumes(teachers=args.teachers, availability=args.availability)
+    results = []
+    async with httpx.AsyncClient(
+        base_url=f"http://127.0.0.1:{port}",
+        timeout=60,
+        limits=httpx.Limits(max_connections=args.concurrency),
+    ) as client:
+        routes = await build_routes(
+            client, args.google, args.seeded, volumes, rng
+        )
+        for name, build in routes.items():
+            if args.routes and not any(name.startswith(r) for r in args.routes):
+                continue
+            warmup = [build(i) for i in range(args.warmup)]
+            await run_route(client, warmup, args.concurrency)
+            specs = [build(i) for i in range(args.requests)]
+            result = RouteResult(
+                name=name, **await run_route(client, specs, args.concurrency)
+            )
+            print(
+                f"{name:30s} {result.throughput_rps:8.1f} req/s  "
+                f"p50 {result.latency_ms['p50']:7.1f}  "
+                f"p95 {result.latency_ms['p95']:7.1f}  "
+                f"p99 {result.latency_ms['p99']:7.1f} ms  "
+                f"errors {result.errors}"
+            )
+            results.append(result)
+    return results
+
+
+def compare(results: List[RouteResult], path: str) -> None:
+    with open(path) as f:
+        before = {r["name"]: r for r in json.load(f)["routes"]}
+    print(f"\nchange against {path}:")
+    for result in results:
+        old = before.get(result.name)
+        if not old:
+            continue
+        rps = result.throughput_rps / old["throughput_rps"] - 1
+        p95 = result.latency_ms["p95"] / old["latency_ms"]["p95"] - 1
+        print(f"{result.name:30s} req/s {rps:+7.1%}  p95 {p95:+7.1%}")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument(
+        "--database-url", default=str(settings.TEST_DATABASE_URL)
+    )
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--teachers", type=int, default=50)
+    parser.add_argument(
+        "--availability",
+        type=int,
+        default=2000,
+        help="availability rows per teacher",
+    )
+    parser.add_argument("--stripe-latency", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--routes", nargs="*", help="only routes starting with these"
+    )
+    parser.add_argument("--output", default="bench-http.json")
+    parser.add_argument("--compare", help="earlier results file")
+    args = parser.parse_args()
+
+    started_at = datetime.utcnow()
+    args.seeded = seed(
+        args.database_url,
+        Volumes(teachers=args.teachers, availability=args.availability),
+        random.Random(args.seed),
+    )
+    args.google = FakeGoogleCertServer().start()
+    stripe = FakeStripeServer(latency=args.stripe_latency).start()
+    port = free_port()
+    server = start_server(
+        port,
+        {
+            "DATABASE_URL": args.database_url,
+            "GOOGLE_CERTS_URL": args.google.url,
+            "STRIPE_API_BASE": stripe.url,
+            "STRIPE_API_KEY": "sk_test_bench",
+        },
+        args.workers,
+    )
+    try:
+        results = asyncio.run(benchmark(args, port))
+    finally:
+        server.terminate()
+        server.wait()
+        stripe.stop()
+        args.google.stop()
+
+    with open(args.output, "w") as f:
+        json.dump(
+            {
+                "commit": git_commit(),
+                "started_at": started_at.isoformat(),
+                "config": {
+                    key: value
+                    for key, value in vars(args).items()
+                    if key not in ("seeded", "google", "database_url")
+                },
+                "routes": [asdict(result) for result in results],
+            },
+            f,
+            indent=2,
+        )
+    print(f"\nresults written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Times turning availability rows into a response body: the old path
+(TeacherAvailability rows validated against response_model and encoded
+with the stdlib json) against AvailabilityRead dataclasses encoded by
+ORJSONResponse.
+
+Usage:
+    python -m benchmarks.bench_serialization --rows 1000 10000 100000
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List
+from uuid import uuid4
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.bookings.types import AvailabilityRead
+from app.db.models.user.user import TeacherAvailability
+from app.main import app as _app  # noqa: F401 registers every table model
+from app.utils.responses import ORJSONResponse
+
+
+def make_rows(count: int) -> List[AvailabilityRead]:
+    start = datetime(2022, 1, 1)
+    return [
+        AvailabilityRead(
+            id=uuid4(),
+            type="available",
+            start=start + timedelta(hours=i),
+            end=start + timedelta(hours=i, minutes=30),
+            teacher_id=1,
+            title="available",
+        )
+        for i in range(count)
+    ]
+
+
+def legacy(rows: List[AvailabilityRead]) -> Callable[[], bytes]:
+    models = [TeacherAvailability(**row.__dict__) for row in rows]
+    field = create_response_field(
+        name="legacy", type_=List[TeacherAvailability]
+    )
+
+    def encode() -> bytes:
+        content = asyncio.run(
+            serialize_response(field=field, response_content=models)
+        )
+        return JSONResponse(content).body
+
+    return encode
+
+
+def orjson(rows: List[AvailabilityRead]) -> Callable[[], bytes]:
+    def encode() -> bytes:
+        return ORJSONResponse(rows).body
+
+    return encode
+
+
+def best_of(encode: Callable[[], bytes], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        encode()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--rows", type=int, nargs="+", default=[1000, 10000, 100000]
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for count in args.rows:
+        rows = make_rows(count)
+        old = best_of(legacy(rows), args.repeat)
+        new = best_of(orjson(rows), args.repeat)
+        print(
+            f"{count:7d} rows: response_model + json {old * 1000:9.1f} ms, "
+            f"dataclass + orjson {new * 1000:7.1f} ms ({old / new:.0f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Compares reading a teacher's availability window as one orjson body
+against streaming it as NDJSON from a server side cursor: time to the
+first byte, total time and peak Python memory.
+
+Usage:
+    python -m benchmarks.bench_streaming --rows 10000 100000
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Callable, Tuple
+from uuid import uuid4
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.bookings.streaming import stream_availability
+from app.bookings.utils import availability_read_statement, read_availability
+from app.core.config import settings
+from app.db.get_session import _get_async_engine
+from app.db.models.user.user import Teacher, TeacherAvailability, User
+from app.main import app as _app  # noqa: F401 registers every table model
+from app.organization.model import OrganizationModel
+from app.utils.responses import ORJSONResponse
+
+START = datetime(2022, 1, 1)
+
+
+def create_teacher(session: Session, rows: int) -> int:
+    organization = OrganizationModel.get_default_organization(session)
+    user = User.create_user(
+        name="bench",
+        email=f"bench-{uuid4().hex}@example.com",
+        organization_id=organization.id,
+    )
+    session.add(user)
+    session.flush()
+    teacher = Teacher(user_id=user.id)
+    session.add(teacher)
+    session.flush()
+    session.bulk_insert_mappings(
+        TeacherAvailability,  # type: ignore
+        [
+            {
+                "id": uuid4(),
+                "teacher_id": teacher.id,
+                "type": "available",
+                "title": "available",
+                "start": START + timedelta(hours=i),
+                "end": START + timedelta(hours=i, minutes=30),
+            }
+            for i in range(rows)
+        ],
+    )
+    session.commit()
+    return teacher.id
+
+
+def delete_teacher(session: Session, teacher_id: int) -> None:
+    teacher = session.get(Teacher, teacher_id)
+    session.execute(
+        delete(TeacherAvailability).where(
+            TeacherAvailability.teacher_id == teacher_id
+        )
+    )
+    session.delete(teacher)
+    session.delete(session.get(User, teacher.user_id))
+    session.commit()
+
+
+async def as_one_body(
+    session: AsyncSession, teacher_id: int, end: datetime
+) -> AsyncIterator[bytes]:
+    statement = availability_read_statement(teacher_id, START, end)
+    rows = await read_availability(session, statement)
+    yield ORJSONResponse(rows).body
+
+
+async def as_stream(
+    session: AsyncSession, teacher_id: int, end: datetime
+) -> AsyncIterator[bytes]:
+    statement = availability_read_statement(teacher_id, START, end)
+    async for chunk in stream_availability(
+        session,
+        statement,
+        [],
+        START,
+        end,
+        settings.AVAILABILITY_STREAM_BATCH_SIZE,
+    ):
+        yield chunk
+
+
+async def measure(
+    engine: AsyncEngine, body: Callable, teacher_id: int, end: datetime
+) -> Tuple[float, float, int]:
+    async with AsyncSession(engine) as session:
+        tracemalloc.start()
+        started = time.perf_counter()
+        first_byte = None
+        async for _ in body(session, teacher_id, end):
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+        total = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return first_byte or total, total, peak
+
+
+async def compare(count: int, teacher_id: int) -> None:
+    engine = _get_async_engine(settings.DATABASE_URL)
+    end = START + timedelta(hours=count)
+    for name, body in (("one body", as_one_body), ("ndjson", as_stream)):
+        first_byte, total, peak = await measure(engine, body, teacher_id, end)
+        print(
+            f"{count:7d} rows {name:8s}: "
+            f"first byte {first_byte * 1000:8.1f} ms, "
+            f"total {total * 1000:8.1f} ms, peak {peak / 2**20:6.1f} MiB"
+        )
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    args = parser.parse_args()
+
+    engine = create_engine(settings.DATABASE_URL)
+    SQLModel.metadata.create_all(engine)
+    for count in args.rows:
+        with Session(engine) as session:  # type: ignore
+            teacher_id = create_teacher(session, count)
+        asyncio.run(compare(count, teacher_id))
+        with Session(engine) as session:  # type: ignore
+            delete_teacher(session, teacher_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Compares throughput of a route creating Stripe payment intents against a
+local fake Stripe with the given latency. The old route called the
+synchronous stripe library straight from ``async def``, blocking the
+event loop; StripeClient runs calls on its worker pool.
+
+Usage:
+    pip install -r requirements-bench.txt
+    python -m benchmarks.bench_stripe_client --requests 40 --latency 0.1
+"""
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+import stripe
+from fastapi import FastAPI
+
+from app.payment.stripe_client import StripeClient
+from tests.fakes.stripe import FakeStripeServer
+
+CreateIntent = Callable[[int], Awaitable[Dict]]
+
+
+def build_app(create_intent: CreateIntent) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/intent/{amount}")
+    async def intent(amount: int) -> Dict:
+        created = await create_intent(amount)
+        return {"secret": created["client_secret"]}
+
+    return app
+
+
+async def run(app: FastAPI, requests: int) -> List[float]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+
+        async def call(i: int) -> float:
+            started = time.perf_counter()
+            response = await client.post(f"/intent/{100 + i}")
+            response.raise_for_status()
+            return time.perf_counter() - started
+
+        return await asyncio.gather(*(call(i) for i in range(requests)))
+
+
+def report(name: str, latencies: List[float], elapsed: float) -> None:
+    latencies = sorted(latencies)
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{name:18s} {len(latencies) / elapsed:8.1f} req/s, "
+        f"p50 {p50 * 1000:7.1f} ms, p95 {p95 * 1000:7.1f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    fake = FakeStripeServer(latency=args.latency).start()
+
+    async def blocking(amount: int) -> Dict:
+        stripe.api_key = "sk_test_fake"
+        stripe.api_base = fake.url
+        return stripe.PaymentIntent.create(amount=amount, currency="usd")
+
+    client = StripeClient(
+        api_key="sk_test_fake",
+        api_base=fake.url,
+        max_concurrency=args.concurrency,
+    )
+
+    async def offloaded(amount: int) -> Dict:
+        return await client.create_payment_intent(
+            amount=amount, currency="usd", metadata={}
+        )
+
+    for name, create_intent in (
+        ("blocking stripe", blocking),
+        ("StripeClient", offloaded),
+    ):
+        started = time.perf_counter()
+        latencies = asyncio.run(run(build_app(create_intent), args.requests))
+        report(name, latencies, time.perf_counter() - started)
+
+    client.close()
+    fake.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+from typing import Generator
+
+import pytest
+
+from tests.fakes.google import FakeGoogleCertServer
+
+
+@pytest.fixture(scope="module")
+def google_certs() -> Generator[FakeGoogleCertServer, None, None]:
+    server = FakeGoogleCertServer().start()
+    yield server
+    server.stop()
@@ -0,0 +1,142 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from google.auth import exceptions
+
+from app.auth import google_certs as google_certs_module
+from app.auth.google_certs import (
+    GoogleCertStore,
+    GoogleTokenVerifier,
+    verify_google_token_async,
+)
+from tests.fakes.google import FakeGoogleCertServer
+
+AUDIENCE = "test-client"
+
+
+@pytest.fixture
+def verifier(google_certs: FakeGoogleCertServer) -> GoogleTokenVerifier:
+    google_certs.requests = 0
+    return GoogleTokenVerifier(
+        cert_store=GoogleCertStore(google_certs.url),
+        audience=AUDIENCE,
+        maxsize=100,
+    )
+
+
+class TestGoogleCertStore:
+    def test_certs_are_fetched_once_within_max_age(
+        self, google_certs: FakeGoogleCertServer, verifier: GoogleTokenVerifier
+    ):
+        for i in range(5):
+            verifier.verify(google_certs.sign(AUDIENCE, sub=str(i)))
+        assert google_certs.requests == 1
+
+    def test_refreshes_in_background_before_expiry(
+        self, google_certs: FakeGoogleCertServer
+    ):
+        google_certs.requests = 0
+        google_certs.max_age = 1
+        store = GoogleCertStore(google_certs.url, refresh_margin=1)
+        try:
+            first = store.get_certs()
+            # Inside the refresh margin the cached certs are still served
+            assert store.get_certs() == first
+            for _ in range(50):
+                if google_certs.requests == 2:
+                    break
+                time.sleep(0.01)
+            assert google_certs.requests == 2
+        finally:
+            google_certs.max_age = 3600
+
+    def test_unknown_key_id_forces_refresh(
+        self, google_certs: FakeGoogleCertServer, verifier: GoogleTokenVerifier
+    ):
+        verifier.verify(google_certs.sign(AUDIENCE))
+        google_certs.rotate("rotated-key")
+        idinfo = verifier.verify(google_certs.sign(AUDIENCE, sub="rotated"))
+        assert idinfo["sub"] == "rotated"
+        assert google_certs.requests == 2
+
+    def test_callers_waiting_on_a_fetch_reuse_it(
+        self, google_certs: FakeGoogleCertServer
+    ):
+        google_certs.requests = 0
+        store = GoogleCertStore(google_certs.url)
+        with ThreadPoolExecutor(8) as pool:
+            list(pool.map(lambda _: store.get_certs(), range(8)))
+        assert google_certs.requests == 1
+
+        # Two callers finding the same certs lacking refetch once
+        stale = store.get_certs()
+        store.refresh(stale=stale)
+        store.refresh(stale=stale)
+        assert google_certs.requests == 2
+
+
+class TestGoogleTokenVerifier:
+    def test_repeat_tokens_skip_verification(
+        self, google_certs: FakeGoogleCertServer, verifier: GoogleTokenVerifier
+    ):
+        token = google_certs.sign(AUDIENCE)
+        first = verifier.verify(token)
+        second = verifier.verify(token)
+        assert first == second
+        assert verifier.misses == 1
+        assert verifier.hits == 1
+
+    def test_cached_token_expires_at_exp(
+        self, google_certs: FakeGoogleCertServer, verifier: GoogleTokenVerifier
+    ):
+        # Signed tokens expire on second boundaries
+        token = google_certs.sign(AUDIENCE, expires_in=1)
+        verifier.verify(token)
+        time.sleep(2)
+        with pytest.raises(ValueError):
+            verifier.verify(token)
+
+    def test_rejects_wrong_audience(
+        self, google_certs: FakeGoogleCertServer, verifier: GoogleTokenVerifier
+    ):
+        with pytest.raises(ValueError):
+            verifier.verify(google_certs.sign("someone-else"))
+
+    def test_rejects_wrong_issuer(
+        self, google_certs: FakeGoogleCertServer, verifier: GoogleTokenVerifier
+    ):
+        with pytest.raises(exceptions.GoogleAuthError):
+            verifier.verify(
+                google_certs.sign(AUDIENCE, issuer="https://evil.example")
+            )
+
+
+def test_async_verification_runs_off_the_event_loop(
+    google_certs: FakeGoogleCertServer,
+    verifier: GoogleTokenVerifier,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    monkeypatch.setattr(google_certs_module, "google_token_verifier", verifier)
+    decoded_on = []
+    decode = verifier._decode
+
+    def recording_decode(token):
+        decoded_on.append(threading.get_ident())
+        return decode(token)
+
+    monkeypatch.setattr(verifier, "_decode", recording_decode)
+    token = google_certs.sign(AUDIENCE, sub="async")
+
+    async def verify_twice():
+        first = await verify_google_token_async(token)
+        second = await verify_google_token_async(token)
+        return first, second, threading.get_ident()
+
+    first, second, loop_thread = asyncio.run(verify_twice())
+    assert first["sub"] == second["sub"] == "async"
+    # Verified once, in a worker thread, then answered from the cache
+    assert len(decoded_on) == 1
+    assert decoded_on[0] != loop_thread
@@ -0,0 +1,123 @@
+import logging
+from typing import List
+
+from fastapi import Request
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.future.engine import Engine
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.auth.principal import get_principal, get_sync_principal
+from app.auth.session_tokens import SessionClaims
+from app.core.config import Settings
+from app.db.models.user.user import Teacher, User
+
+
+def make_request() -> Request:
+    return Request({"type": "http", "headers": []})
+
+
+class TestPrincipal:
+    async def test_loads_everything_in_one_query(
+        self, async_engine: AsyncEngine, user: User, teacher: Teacher
+    ):
+        statements: List[str] = []
+        event.listen(
+            async_engine.sync_engine,
+            "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+        request = make_request()
+        async with AsyncSession(async_engine) as session:
+            principal = await get_principal(
+                request=request, current_user=user, session=session
+            )
+            assert len(statements) == 1
+            assert principal.user.id == user.id
+            assert principal.teacher and principal.teacher.id == teacher.id
+            assert principal.student is None
+            assert principal.organization.id == user.organization_id
+
+            again = await get_principal(
+                request=request, current_user=user, session=session
+            )
+            assert again is principal
+            assert len(statements) == 1
+        await async_engine.dispose()
+
+    def test_sync_routes_resolve_on_their_own_session(
+        self,
+        engine: Engine,
+        async_engine: AsyncEngine,
+        session: Session,
+        user: User,
+        teacher: Teacher,
+    ):
+        # Refresh what the test session expired so only the lookup counts
+        assert user.id
+        statements: List[str] = []
+        async_statements: List[str] = []
+        event.listen(
+            engine,
+            "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+        event.listen(
+            async_engine.sync_engine,
+            "before_cursor_execute",
+            lambda *args: async_statements.append(args[2]),
+        )
+        principal = get_sync_principal(
+            request=make_request(), current_user=user, session=session
+        )
+        assert len(statements) == 1
+        assert async_statements == []
+        assert principal.teacher and principal.teacher.id == teacher.id
+        assert principal.organization.id == user.organization_id
+
+    def test_session_token_roles_limit_the_joins(
+        self, engine: Engine, session: Session, user: User, teacher: Teacher
+    ):
+        assert user.id
+        statements: List[str] = []
+        event.listen(
+            engine,
+            "before_cursor_execute",
+            lambda *args: statements.append(args[2]),
+        )
+        request = make_request()
+        request.state.session_claims = SessionClaims(
+            uid=user.id,
+            org=user.organization_id,
+            name=user.name,
+            email=user.email,
+            teacher=True,
+        )
+        principal = get_sync_principal(
+            request=request, current_user=user, session=session
+        )
+        assert principal.teacher and principal.teacher.id == teacher.id
+        assert principal.student is None
+        assert len(statements) == 1
+        assert "teacher" in statements[0]
+        assert "student" not in statements[0]
+
+    def test_debug_logs_the_queries_run(
+        self,
+        session: Session,
+        user: User,
+        app_settings: Settings,
+        monkeypatch: pytest.MonkeyPatch,
+        caplog: pytest.LogCaptureFixture,
+    ):
+        assert user.id
+        monkeypatch.setattr(app_settings, "DEBUG", True)
+        with caplog.at_level(logging.DEBUG, logger="app.auth.principal"):
+            get_sync_principal(
+                request=make_request(), current_user=user, session=session
+            )
+        assert caplog.messages == [
+            f"Resolved principal for user {user.id} in 1 queries, saving 4"
+        ]
@@ -0,0 +1,159 @@
+import time
+from typing import Generator
+
+import pytest
+from fastapi import HTTPException, Request
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.auth.get_current_user import get_current_user
+from app.auth.google_certs import GoogleCertStore, google_token_verifier
+from app.auth.session_tokens import (
+    ExpiredSessionToken,
+    InvalidSessionToken,
+    decode_access_token,
+    decode_refresh_token,
+    issue_session_tokens,
+)
+from app.core.config import Settings
+from app.db.models.user.user import Teacher, User
+from tests.fakes.google import FakeGoogleCertServer
+
+
+@pytest.fixture
+def fake_google(
+    google_certs: FakeGoogleCertServer,
+) -> Generator[FakeGoogleCertServer, None, None]:
+    cert_store = google_token_verifier.cert_store
+    google_token_verifier.cert_store = GoogleCertStore(google_certs.url)
+    yield google_certs
+    google_token_verifier.cert_store = cert_store
+    google_token_verifier.clear()
+
+
+class TestSessionTokens:
+    def test_access_token_round_trip(self, user: User):
+        tokens = issue_session_tokens(user, is_teacher=True, is_student=False)
+        claims = decode_access_token(tokens.access_token)
+        assert claims.uid == user.id
+        assert claims.org == user.organization_id
+        assert claims.teacher
+        assert not claims.student
+        assert decode_refresh_token(tokens.refresh_token) == user.id
+
+    def test_tampered_token_is_rejected(self, user: User):
+        tokens = issue_session_tokens(user, is_teacher=False, is_student=False)
+        with pytest.raises(InvalidSessionToken):
+            decode_access_token(tokens.access_token[:-2] + "xx")
+
+    def test_refresh_token_is_not_an_access_token(self, user: User):
+        tokens = issue_session_tokens(user, is_teacher=False, is_student=False)
+        with pytest.raises(InvalidSessionToken):
+            decode_access_token(tokens.refresh_token)
+
+    def test_expired_token_is_rejected(self, user: User):
+        tokens = issue_session_tokens(user, is_teacher=False, is_student=False)
+        time.sleep(2)
+        with pytest.raises(ExpiredSessionToken):
+            decode_access_token(tokens.access_token, max_age=1)
+
+    async def test_current_user_skips_the_database(self, user: User):
+        tokens = issue_session_tokens(user, is_teacher=False, is_student=False)
+        request = Request({"type": "http", "headers": []})
+        current_user = await get_current_user(
+            request=request,
+            authorization=f"Bearer {tokens.access_token}",
+            session=None,  # type: ignore
+        )
+        assert current_user.id == user.id
+        assert current_user.google_id == user.google_id
+        assert request.state.user_id == user.id
+
+    @pytest.mark.parametrize("signed", [False, True])
+    async def test_current_user_rejects_bad_or_unknown_tokens(
+        self,
+        user: User,
+        async_engine: AsyncEngine,
+        fake_google: FakeGoogleCertServer,
+        app_settings: Settings,
+        signed: bool,
+    ):
+        token = (
+            fake_google.sign(app_settings.GOOGLE_CLIENT_ID, sub="unknown")
+            if signed
+            else "not-a-token"
+        )
+        async with AsyncSession(async_engine) as session:
+            with pytest.raises(HTTPException) as error:
+                await get_current_user(
+                    request=Request({"type": "http", "headers": []}),
+                    authorization=f"Bearer {token}",
+                    session=session,
+                )
+        assert error.value.status_code == 401
+        await async_engine.dispose()
+
+
+class TestAuthRoutes:
+    def test_google_login_issues_session_tokens(
+        self,
+        client: TestClient,
+        fake_google: FakeGoogleCertServer,
+        app_settings: Settings,
+        user: User,
+        teacher: Teacher,
+    ):
+        google_token = fake_google.sign(
+            app_settings.GOOGLE_CLIENT_ID, sub=user.google_id or ""
+        )
+        response = client.post(
+            "/auth/google",
+            json={
+                "token": google_token,
+                "email": user.email,
+                "google_id": user.google_id,
+            },
+        )
+        assert response.status_code == 200
+        body = response.json()
+        assert body["is_teacher"]
+        claims = decode_access_token(body["tokens"]["access_token"])
+        assert claims.uid == user.id
+        assert claims.teacher
+
+        response = client.post(
+            "/auth/refresh",
+            json={"refresh_token": body["tokens"]["refresh_token"]},
+        )
+        assert response.status_code == 200
+        claims = decode_access_token(response.json()["access_token"])
+        assert claims.uid == user.id
+
+    def test_google_login_rejects_wrong_issuer(
+        self,
+        client: TestClient,
+        fake_google: FakeGoogleCertServer,
+        app_settings: Settings,
+        user: User,
+    ):
+        google_token = fake_google.sign(
+            app_settings.GOOGLE_CLIENT_ID,
+            sub=user.google_id or "",
+            issuer="https://evil.example",
+        )
+        response = client.post(
+            "/auth/google",
+            json={
+                "token": google_token,
+                "email": user.email,
+                "google_id": user.google_id,
+            },
+        )
+        assert response.status_code == 401
+
+    def test_refresh_rejects_bad_token(self, client: TestClient):
+        response = client.post(
+            "/auth/refresh", json={"refresh_token": "not-a-token"}
+        )
+        assert response.status_code == 401
@@ -125,9 +125,122 @@ class TestAvailabilitiesRouter:
         )
         assert response.status_code == 200
 
+        assert response.json() == {
+            "inserted": 1,
+            "updated": 0,
+            "deleted": 2,
+            "unchanged": 0,
+            "ignored": 0,
+        }
+
         all_availability = session.query(TeacherAvailability).all()
         assert len(all_availability) == 2
 
+    def test_create_availabilities_writes_only_changes(
+        self,
+        app_user_override: FastAPI,
+        session: Session,
+        client: TestClient,
+        teacher: Teacher,
+        schedule: List[TeacherAvailability],
+    ):
+        """
+        GIVEN: A save where every slot moves an hour later, so each one
+            takes the place of the slot before it
+        AND: The last slot is unchanged, stored without a title
+        THEN: Only the moved slots are updated
+        """
+        first, second, third = schedule
+        third.title = None
+        session.add(third)
+        session.commit()
+        payload = PostAvailabilityPayload(
+            events=[
+                PostAvailabilityPayloadEvent(
+                    id=first.id,  # type: ignore
+                    start=datetime(2022, 6, 23, 8),
+                    end=datetime(2022, 6, 23, 13),
+                ),
+                PostAvailabilityPayloadEvent(
+                    id=second.id,  # type: ignore
+                    start=datetime(2022, 6, 23, 13),
+                    end=datetime(2022, 6, 23, 18),
+                ),
+                PostAvailabilityPayloadEvent(
+                    id=third.id,  # type: ignore
+                    start=third.start,
+                    end=third.end,
+                ),
+            ],
+            timeframe=PostAvailabilityPayloadTimeframe(
+                start=datetime(2022, 6, 23), end=datetime(2022, 6, 25)
+            ),
+        )
+        response = client.post(
+            "/bookings/teacher-availability",
+            data=json.dumps(payload.dict(), default=str),
+        )
+        assert response.status_code == 200
+        assert response.json() == {
+            "inserted": 0,
+            "updated": 2,
+            "deleted": 0,
+            "unchanged": 1,
+            "ignored": 0,
+        }
+        moved = session.get(TeacherAvailability, first.id)
+        assert moved
+        assert moved.end == datetime(2022, 6, 23, 13)
+
+    def test_create_availabilities_cannot_take_other_teachers_slots(
+        self,
+        app_user_override: FastAPI,
+        session: Session,
+        client: TestClient,
+        user: User,
+        teacher: Teacher,
+        schedule: List[TeacherAvailability],
+    ):
+        other_user = User.create_user(
+            name="other teacher",
+            email="other@domain.com",
+            organization_id=user.organization_id,
+        )
+        session.add(other_user)
+        session.commit()
+        other_teacher = Teacher(user_id=other_user.id)
+        session.add(other_teacher)
+        session.commit()
+        slot = TeacherAvailability(
+            start=datetime(2022, 7, 1, 9),
+            end=datetime(2022, 7, 1, 10),
+            teacher_id=other_teacher.id,
+        )
+        session.add(slot)
+        session.commit()
+
+        payload = PostAvailabilityPayload(
+            events=[
+                PostAvailabilityPayloadEvent(
+                    id=slot.id,  # type: ignore
+                    start=datetime(2022, 7, 2, 9),
+                    end=datetime(2022, 7, 2, 10),
+                )
+            ],
+            timeframe=PostAvailabilityPayloadTimeframe(
+                start=datetime(2022, 6, 20), end=datetime(2022, 7, 20)
+            ),
+        )
+        response = client.post(
+            "/bookings/teacher-availability",
+            data=json.dumps(payload.dict(), default=str),
+        )
+        assert response.status_code == 403
+        assert len(session.query(TeacherAvailability).all()) == 4
+        unchanged = session.get(TeacherAvailability, slot.id)
+        assert unchanged
+        assert unchanged.start == datetime(2022, 7, 1, 9)
+
     def test_delete_availability(
         self,
         app_user_override: FastAPI,
@@ -175,3 +288,80 @@ class TestAvailabilitiesRouter:
         response_json = response.json()
         assert response_json["end"] == new_end.isoformat()
         assert response_json["start"] == new_start.isoformat()
+
+    def test_get_availabilities_with_cursor(
+        self,
+        app_user_override: FastAPI,
+        client: TestClient,
+        teacher: Teacher,
+        schedule: List[TeacherAvailability],
+    ):
+        """
+        GIVEN: A call to GET availability with a cursor
+        THEN: Pages through the availabilities in start order
+        """
+        params = {
+            "limit": 2,
+            "cursor": "",
+            "from_date": datetime(2022, 6, 20).isoformat(),
+            "until_date": datetime(2022, 7, 20).isoformat(),
+        }
+        response = client.get("/bookings/teacher-availability", params=params)
+        assert response.status_code == 200
+        first_page = response.json()
+        assert len(first_page["items"]) == 2
+        assert first_page["next_cursor"]
+
+        params["cursor"] = first_page["next_cursor"]
+        response = client.get("/bookings/teacher-availability", params=params)
+        assert response.status_code == 200
+        second_page = response.json()
+        assert len(second_page["items"]) == 1
+        assert second_page["next_cursor"] is None
+        starts = [
+            item["start"] for item in first_page["items"] + second_page["items"]
+        ]
+        assert starts == sorted(e.start.isoformat() for e in schedule)
+
+    def test_get_availabilities_with_invalid_cursor(
+        self,
+        app_user_override: FastAPI,
+        client: TestClient,
+        teacher: Teacher,
+    ):
+        response = client.get(
+            "/bookings/teacher-availability",
+            params={
+                "cursor": "nonsense",
+                "from_date": datetime(2022, 6, 20).isoformat(),
+                "until_date": datetime(2022, 7, 20).isoformat(),
+            },
+        )
+        assert response.status_code == 400
+
+    def test_overlapping_availability_is_rejected(
+        self,
+        app_user_override: FastAPI,
+        session: Session,
+        client: TestClient,
+        teacher: Teacher,
+        schedule: List[TeacherAvailability],
+    ):
+        """
+        GIVEN: An update which would overlap another slot of the teacher
+        THEN: It is rejected with a 409 and nothing changes
+        """
+        availability_id = schedule[0].id
+        update = PostAvailabilityPayloadEvent(
+            id=availability_id,  # type: ignore
+            start=datetime(2022, 6, 23, 11),
+            end=datetime(2022, 6, 23, 14),
+        )
+        response = client.put(
+            f"/bookings/teacher-availability/{availability_id}",
+            data=json.dumps(update.dict(), default=str),
+        )
+        assert response.status_code == 409
+        model_in_db = session.get(TeacherAvailability, availability_id)
+        assert model_in_db
+        assert model_in_db.end == datetime(2022, 6, 23, 12)
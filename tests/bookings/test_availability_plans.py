@@ -0,0 +1,83 @@
+"""
+Checks the availability window queries use the GiST index on
+(teacher_id, during) once the table is realistically large.
+
+Seeding a few million rows takes minutes, so these only run with
+--run-slow. Set AVAILABILITY_PLAN_ROWS to change the volume.
+"""
+import os
+from datetime import datetime
+from typing import Generator
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.future.engine import Engine
+from sqlmodel import SQLModel, create_engine
+
+from app.bookings.utils import availability_window_statement
+from app.core.config import settings
+from app.db.models.user.user import TeacherAvailability
+from tests.plans import assert_uses_index
+
+ROWS = int(os.environ.get("AVAILABILITY_PLAN_ROWS", 2_000_000))
+TEACHERS = 200
+INDEX = "teacher_availability_no_overlap"
+
+pytestmark = pytest.mark.slow
+
+
+@pytest.fixture(scope="module")
+def seeded_engine() -> Generator[Engine, None, None]:
+    engine = create_engine(settings.TEST_DATABASE_URL)
+    meta = SQLModel.metadata
+    meta.drop_all(engine)
+    meta.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO organization (id) VALUES (1)"))
+        conn.execute(
+            text(
+                'INSERT INTO "user" (name, email, organization_id) '
+                "SELECT 'teacher ' || g, 'teacher' || g || '@example.com', 1 "
+                "FROM generate_series(1, :teachers) g"
+            ),
+            {"teachers": TEACHERS},
+        )
+        conn.execute(
+            text('INSERT INTO teacher (user_id) SELECT id FROM "user"')
+        )
+        # One hour slots every two hours, for every teacher
+        conn.execute(
+            text(
+                "INSERT INTO teacher_availability "
+                '(id, type, start, "end", teacher_id, title) '
+                "SELECT gen_random_uuid(), 'available', ts, "
+                "ts + interval '1 hour', t.id, 'available' "
+                "FROM teacher t, generate_series(timestamp '2020-01-01', "
+                "timestamp '2020-01-01' + (:per_teacher - 1) * interval '2h', "
+                "interval '2 hours') ts"
+            ),
+            {"per_teacher": ROWS // TEACHERS},
+        )
+        conn.execute(text("ANALYZE teacher_availability"))
+    yield engine
+    meta.drop_all(engine)
+    engine.dispose()
+
+
+class TestAvailabilityPlans:
+    def test_window_query_uses_gist_index(self, seeded_engine: Engine):
+        statement = availability_window_statement(
+            teacher_id=7,
+            start=datetime(2020, 3, 1),
+            end=datetime(2020, 3, 8),
+        )
+        assert_uses_index(seeded_engine, statement, INDEX)
+
+    def test_overlap_query_uses_gist_index(self, seeded_engine: Engine):
+        statement = TeacherAvailability.__table__.select().where(
+            TeacherAvailability.__table__.c.teacher_id == 7,
+            TeacherAvailability.during_overlaps(
+                datetime(2020, 3, 1, 10, 30), datetime(2020, 3, 1, 12)
+            ),
+        )
+        assert_uses_index(seeded_engine, statement, INDEX)
@@ -0,0 +1,74 @@
+from datetime import datetime
+from typing import List
+
+from fastapi.testclient import TestClient
+
+from app.db.models.user.user import Teacher, TeacherAvailability
+
+WINDOW = {
+    "from_date": datetime(2022, 6, 1).isoformat(),
+    "until_date": datetime(2022, 7, 1).isoformat(),
+}
+
+
+class TestAvailabilityETags:
+    def test_revalidates_until_availability_changes(
+        self,
+        client: TestClient,
+        teacher: Teacher,
+        schedule: List[TeacherAvailability],
+    ):
+        """
+        GIVEN: A client holding the ETag of the teacher's availability
+        THEN: It gets a 304 until the availability or rules change
+        """
+        url = "/bookings/teacher-availability"
+        response = client.get(url, params=WINDOW)
+        assert len(response.json()) == 3
+        etag = response.headers["etag"]
+
+        response = client.get(
+            url, params=WINDOW, headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.content == b""
+
+        response = client.post(
+            "/bookings/teacher-availability-rules",
+            json={
+                "dtstart": datetime(2022, 6, 20, 6).isoformat(),
+                "rrule": "FREQ=DAILY;COUNT=2",
+                "duration": 30,
+            },
+        )
+        assert response.status_code == 200
+        response = client.get(
+            url, params=WINDOW, headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 200
+        assert len(response.json()) == 5
+        changed = response.headers["etag"]
+        assert changed != etag
+
+        client.delete(f"{url}/{schedule[0].id}")
+        response = client.get(
+            url, params=WINDOW, headers={"If-None-Match": changed}
+        )
+        assert response.status_code == 200
+        assert len(response.json()) == 4
+
+    def test_window_is_part_of_the_etag(
+        self,
+        client: TestClient,
+        teacher: Teacher,
+        schedule: List[TeacherAvailability],
+    ):
+        url = "/bookings/teacher-availability"
+        etag = client.get(url, params=WINDOW).headers["etag"]
+        response = client.get(
+            url,
+            params={**WINDOW, "until_date": datetime(2022, 6, 24).isoformat()},
+            headers={"If-None-Match": etag},
+        )
+        assert response.status_code == 200
+        assert len(response.json()) == 2
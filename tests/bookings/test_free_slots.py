@@ -0,0 +1,252 @@
+from datetime import datetime, timedelta
+from typing import List
+from uuid import uuid4
+
+from fastapi.testclient import TestClient
+import pytest
+from sqlmodel import Session
+
+from app.bookings.free_slots import free_intervals, long_enough, rank
+from app.bookings.recurrence import recurrence_cache
+from app.bookings.types import TeacherFreeSlots
+from app.db.models.course.course import (
+    ClassTeacher,
+    Course,
+    CourseTeacher,
+    LiveClass,
+)
+from app.db.models.user.user import (
+    Teacher,
+    TeacherAvailability,
+    TeacherAvailabilityRule,
+    User,
+)
+from app.organization.model import OrganizationModel
+
+WINDOW = {
+    "from_date": "2022-06-20T00:00:00",
+    "until_date": "2022-06-27T00:00:00",
+}
+
+
+def at(day: int, hour: int, minute: int = 0) -> datetime:
+    return datetime(2022, 6, day, hour, minute)
+
+
+class TestFreeIntervals:
+    def test_overlapping_and_adjacent_availability_is_merged(self):
+        free = free_intervals(
+            [(at(20, 9), at(20, 11)), (at(20, 10), at(20, 12))]
+            + [(at(20, 12), at(20, 13))],
+            [],
+            at(20, 0),
+            at(21, 0),
+        )
+        assert free == [(at(20, 9), at(20, 13))]
+
+    def test_busy_time_is_taken_out(self):
+        free = free_intervals(
+            [(at(20, 9), at(20, 17))],
+            [(at(20, 10), at(20, 11)), (at(20, 10, 30), at(20, 12))],
+            at(20, 0),
+            at(21, 0),
+        )
+        assert free == [(at(20, 9), at(20, 10)), (at(20, 12), at(20, 17))]
+
+    def test_clipped_to_the_window(self):
+        free = free_intervals(
+            [(at(19, 20), at(20, 2)), (at(20, 23), at(21, 3))],
+            [(at(19, 0), at(20, 1))],
+            at(20, 0),
+            at(21, 0),
+        )
+        assert free == [(at(20, 1), at(20, 2)), (at(20, 23), at(21, 0))]
+
+    def test_busy_without_availability_is_not_free(self):
+        assert (
+            free_intervals([], [(at(20, 9), at(20, 10))], at(20, 0), at(21, 0))
+            == []
+        )
+
+    def test_only_intervals_fitting_the_duration_are_kept(self):
+        slots = long_enough(
+            [(at(20, 9), at(20, 9, 45)), (at(20, 12), at(20, 14))],
+            timedelta(hours=1),
+        )
+        assert slots == [(at(20, 12), at(20, 14))]
+
+    def test_ranked_soonest_then_most_free_time(self):
+        results = [
+            TeacherFreeSlots(1, "a", at(21, 9), 600),
+            TeacherFreeSlots(2, "b", at(20, 9), 60),
+            TeacherFreeSlots(3, "c", at(20, 9), 120),
+        ]
+        assert [r.teacher_id for r in rank(results)] == [3, 2, 1]
+
+
+def add_teacher(
+    session: Session, organization: OrganizationModel, name: str
+) -> Teacher:
+    user = User.create_user(
+        name=name,
+        email=f"{name}@domain.com",
+        google_id=name,
+        organization_id=organization.id,
+    )
+    session.add(user)
+    session.flush()
+    teacher = Teacher(user_id=user.id)
+    session.add(teacher)
+    session.flush()
+    return teacher
+
+
+def add_availability(session: Session, teacher: Teacher, spans: List) -> None:
+    session.add_all(
+        TeacherAvailability(
+            id=uuid4(), teacher_id=teacher.id, start=start, end=end
+        )
+        for start, end in spans
+    )
+
+
+def add_class(
+    session: Session,
+    organization: OrganizationModel,
+    teacher: Teacher,
+    start: datetime,
+    end: datetime,
+) -> None:
+    course = Course(
+        organization_id=organization.id,
+        max_students=4,
+        name="Conversation",
+        description="",
+        price=1000,
+        difficulty=1,
+    )
+    session.add(course)
+    session.flush()
+    course_teacher = CourseTeacher(course_id=course.id, teacher_id=teacher.id)
+    live_class = LiveClass(
+        name="Class 1", course_id=course.id, url="", start=start, end=end
+    )
+    session.add_all([course_teacher, live_class])
+    session.flush()
+    session.add(
+        ClassTeacher(
+            class_id=live_class.id, course_teacher_id=course_teacher.id
+        )
+    )
+
+
+class TestFreeSlotsRouter:
+    url = "/bookings/free-slots"
+
+    @pytest.fixture
+    def teachers(
+        self, session: Session, organization: OrganizationModel
+    ) -> List[Teacher]:
+        busy = add_teacher(session, organization, "busy")
+        add_availability(session, busy, [(at(20, 9), at(20, 12))])
+        add_class(session, organization, busy, at(20, 9), at(20, 11))
+
+        late = add_teacher(session, organization, "late")
+        add_availability(session, late, [(at(22, 9), at(22, 17))])
+
+        ruled = add_teacher(session, organization, "ruled")
+        session.add(
+            TeacherAvailabilityRule(
+                id=uuid4(),
+                teacher_id=ruled.id,
+                rrule="FREQ=DAILY",
+                dtstart=at(20, 10),
+                duration=60,
+            )
+        )
+        session.commit()
+        return [busy, late, ruled]
+
+    def test_ranks_teachers_with_time_free(
+        self, client: TestClient, teachers: List[Teacher]
+    ):
+        busy, late, ruled = teachers
+        recurrence_cache.clear()
+        response = client.get(self.url, params={**WINDOW, "duration": 60})
+        assert response.status_code == 200
+        results = response.json()
+        # The busy teacher's class leaves them a single free hour
+        assert [r["teacher_id"] for r in results] == [
+            ruled.id,
+            busy.id,
+            late.id,
+        ]
+        assert results[1]["slots"] == [
+            {
+                "start": "2022-06-20T11:00:00",
+                "end": "2022-06-20T12:00:00",
+                "latest_start": "2022-06-20T11:00:00",
+            }
+        ]
+        assert results[0]["free_minutes"] == 7 * 60
+        assert results[2]["name"] == "late"
+        # Searches don't take the availability route's cache entries
+        assert recurrence_cache.stats()["size"] == 0
+
+    def test_duration_teacher_ids_and_limit(
+        self, client: TestClient, teachers: List[Teacher]
+    ):
+        busy, late, ruled = teachers
+        response = client.get(self.url, params={**WINDOW, "duration": 90})
+        assert [r["teacher_id"] for r in response.json()] == [late.id]
+
+        response = client.get(
+            self.url, params={**WINDOW, "teacher_ids": [busy.id, late.id]}
+        )
+        assert [r["teacher_id"] for r in response.json()] == [busy.id, late.id]
+
+        # Found searching the first day only, but with the whole week's
+        # free time
+        response = client.get(self.url, params={**WINDOW, "limit": 1})
+        assert [r["teacher_id"] for r in response.json()] == [ruled.id]
+        assert response.json()[0]["free_minutes"] == 7 * 60
+        assert len(response.json()[0]["slots"]) == 7
+
+        # Searched further until someone is free for long enough
+        response = client.get(
+            self.url, params={**WINDOW, "duration": 90, "limit": 1}
+        )
+        assert [r["teacher_id"] for r in response.json()] == [late.id]
+
+    def test_other_organizations_are_not_searched(
+        self,
+        client: TestClient,
+        session: Session,
+        organization: OrganizationModel,
+        teachers: List[Teacher],
+    ):
+        other = OrganizationModel(id=organization.id + 1)
+        session.add(other)
+        session.commit()
+        outsider = add_teacher(session, other, "outsider")
+        add_availability(session, outsider, [(at(20, 0), at(21, 0))])
+        session.commit()
+        response = client.get(self.url, params=WINDOW)
+        assert outsider.id not in [r["teacher_id"] for r in response.json()]
+
+    @pytest.mark.parametrize(
+        "params",
+        [
+            {
+                "from_date": "2022-06-27T00:00:00",
+                "until_date": "2022-06-20T00:00:00",
+            },
+            {
+                "from_date": "2022-01-01T00:00:00",
+                "until_date": "2022-06-20T00:00:00",
+            },
+            {**WINDOW, "duration": 0},
+        ],
+    )
+    def test_rejects_bad_searches(self, client: TestClient, params: dict):
+        assert client.get(self.url, params=params).status_code == 400
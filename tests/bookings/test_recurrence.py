@@ -0,0 +1,282 @@
+from datetime import datetime
+import json
+from itertools import islice
+from typing import List
+from uuid import UUID, uuid4
+
+from fastapi.testclient import TestClient
+import pytest
+from sqlmodel import Session
+
+from app.bookings.recurrence import RecurrenceCache, expand_rule
+from app.db.models.user.user import (
+    Teacher,
+    TeacherAvailability,
+    TeacherAvailabilityRule,
+)
+
+
+def weekly_rule(**kwargs) -> TeacherAvailabilityRule:
+    fields = dict(
+        id=uuid4(),
+        teacher_id=1,
+        rrule="FREQ=WEEKLY;BYDAY=MO,WE",
+        dtstart=datetime(2022, 6, 20, 9),
+        duration=60,
+    )
+    fields.update(kwargs)
+    return TeacherAvailabilityRule(**fields)
+
+
+class TestExpandRule:
+    def test_only_occurrences_inside_the_window(self):
+        occurrences = list(
+            expand_rule(
+                weekly_rule(),
+                datetime(2022, 6, 21),
+                datetime(2022, 7, 4, 9, 30),
+            )
+        )
+        assert occurrences == [
+            (datetime(2022, 6, 22, 9), datetime(2022, 6, 22, 10)),
+            (datetime(2022, 6, 27, 9), datetime(2022, 6, 27, 10)),
+            (datetime(2022, 6, 29, 9), datetime(2022, 6, 29, 10)),
+        ]
+
+    def test_exdates_and_until_are_respected(self):
+        rule = weekly_rule(
+            exdates=[datetime(2022, 6, 22, 9)], until=datetime(2022, 6, 28)
+        )
+        occurrences = list(
+            expand_rule(rule, datetime(2022, 6, 1), datetime(2022, 8, 1))
+        )
+        assert [start for start, _ in occurrences] == [
+            datetime(2022, 6, 20, 9),
+            datetime(2022, 6, 27, 9),
+        ]
+
+    def test_open_ended_rule_is_expanded_lazily(self):
+        rule = weekly_rule(rrule="FREQ=MINUTELY", duration=1)
+        occurrences = expand_rule(
+            rule, datetime(2022, 6, 20), datetime(3000, 1, 1)
+        )
+        first = next(occurrences)
+        assert first[0] == datetime(2022, 6, 20, 9)
+
+
+class TestRecurrenceCache:
+    def test_expansions_are_memoized_per_rule_and_window(self):
+        cache = RecurrenceCache(maxsize=8)
+        rule = weekly_rule()
+        window = (datetime(2022, 6, 1), datetime(2022, 8, 1))
+
+        partial = list(islice(cache.occurrences(rule, *window), 2))
+        full = list(cache.occurrences(rule, *window))
+        assert full[:2] == partial
+        assert full == list(expand_rule(rule, *window))
+        assert cache.stats()["hits"] == 1
+
+        list(cache.occurrences(rule, datetime(2022, 7, 1), window[1]))
+        assert cache.stats()["misses"] == 2
+
+    def test_edited_rule_is_expanded_again(self):
+        cache = RecurrenceCache(maxsize=8)
+        rule = weekly_rule()
+        window = (datetime(2022, 6, 1), datetime(2022, 8, 1))
+        before = list(cache.occurrences(rule, *window))
+
+        rule.exdates = [before[0][0]]
+        assert list(cache.occurrences(rule, *window)) == before[1:]
+
+    def test_cache_is_bounded(self):
+        cache = RecurrenceCache(maxsize=2)
+        rule = weekly_rule()
+        for day in range(1, 5):
+            cache.occurrences(
+                rule, datetime(2022, 6, day), datetime(2022, 8, 1)
+            )
+        assert cache.stats()["size"] == 2
+
+
+@pytest.fixture
+def rule_payload() -> dict:
+    return {
+        "title": "mornings",
+        "dtstart": datetime(2022, 6, 20, 6).isoformat(),
+        "rrule": "FREQ=DAILY",
+        "duration": 30,
+    }
+
+
+class TestAvailabilityRulesRouter:
+    def test_rule_occurrences_are_merged_into_availability(
+        self,
+        client: TestClient,
+        teacher: Teacher,
+        schedule: List[TeacherAvailability],
+        rule_payload: dict,
+    ):
+        """
+        GIVEN: A daily rule stored as a single row
+        THEN: GET availability returns its occurrences inside the window
+            in start order with the stored availability
+        """
+        response = client.post(
+            "/bookings/teacher-availability-rules", json=rule_payload
+        )
+        assert response.status_code == 200
+        rule_id = response.json()["id"]
+
+        response = client.get(
+            "/bookings/teacher-availability",
+            params={
+                "from_date": datetime(2022, 6, 23).isoformat(),
+                "until_date": datetime(2022, 6, 25).isoformat(),
+            },
+        )
+        assert response.status_code == 200
+        availability = response.json()
+        assert [(a["start"], a["type"]) for a in availability] == [
+            ("2022-06-23T06:00:00", "recurring"),
+            ("2022-06-23T07:00:00", "available"),
+            ("2022-06-23T13:00:00", "available"),
+            ("2022-06-24T06:00:00", "recurring"),
+            ("2022-06-24T09:00:00", "available"),
+        ]
+        # Occurrences name their rule and can't pass for stored rows
+        occurrence = availability[0]
+        assert occurrence["rule_id"] == rule_id
+        assert UUID(occurrence["id"]).version == 5
+        assert availability[1]["rule_id"] is None
+
+        response = client.post(
+            f"/bookings/teacher-availability-rules/{rule_id}/exceptions",
+            json={"start": datetime(2022, 6, 24, 6).isoformat()},
+        )
+        assert response.status_code == 200
+        response = client.get(
+            "/bookings/teacher-availability",
+            params={
+                "from_date": datetime(2022, 6, 24).isoformat(),
+                "until_date": datetime(2022, 6, 25).isoformat(),
+            },
+        )
+        assert [a["type"] for a in response.json()] == ["available"]
+
+    def test_occurrences_saved_back_are_not_stored(
+        self,
+        client: TestClient,
+        session: Session,
+        teacher: Teacher,
+        schedule: List[TeacherAvailability],
+        rule_payload: dict,
+    ):
+        """
+        GIVEN: A calendar posting back the window it read
+        THEN: Its rule occurrences are left to the rule, not stored
+        """
+        client.post("/bookings/teacher-availability-rules", json=rule_payload)
+        window = {
+            "start": datetime(2022, 6, 23).isoformat(),
+            "end": datetime(2022, 6, 25).isoformat(),
+        }
+        availability = client.get(
+            "/bookings/teacher-availability",
+            params={"from_date": window["start"], "until_date": window["end"]},
+        ).json()
+        events = [
+            {key: a[key] for key in ("id", "title", "start", "end")}
+            for a in availability
+        ]
+        response = client.post(
+            "/bookings/teacher-availability",
+            json={"timeframe": window, "events": events},
+        )
+        assert response.status_code == 200
+        assert response.json() == {
+            "inserted": 0,
+            "updated": 0,
+            "deleted": 0,
+            "unchanged": 3,
+            "ignored": 2,
+        }
+        assert len(session.query(TeacherAvailability).all()) == len(schedule)
+
+    def test_pages_through_rule_occurrences(
+        self, client: TestClient, teacher: Teacher, rule_payload: dict
+    ):
+        client.post("/bookings/teacher-availability-rules", json=rule_payload)
+        params = {
+            "limit": 4,
+            "from_date": datetime(2022, 7, 1).isoformat(),
+            "until_date": datetime(2022, 7, 11).isoformat(),
+        }
+        second_page = client.get(
+            "/bookings/teacher-availability", params={**params, "page": 1}
+        ).json()
+        assert [a["start"][:10] for a in second_page] == [
+            "2022-07-05",
+            "2022-07-06",
+            "2022-07-07",
+            "2022-07-08",
+        ]
+
+        starts = []
+        params["cursor"] = ""
+        while params["cursor"] is not None:
+            page = client.get(
+                "/bookings/teacher-availability", params=params
+            ).json()
+            starts += [a["start"] for a in page["items"]]
+            params["cursor"] = page["next_cursor"]
+        assert len(starts) == 10
+        assert starts == sorted(set(starts))
+
+    def test_invalid_rrule_is_rejected(
+        self, client: TestClient, teacher: Teacher, rule_payload: dict
+    ):
+        rule_payload["rrule"] = "FREQ=SOMETIMES"
+        response = client.post(
+            "/bookings/teacher-availability-rules",
+            data=json.dumps(rule_payload),
+        )
+        assert response.status_code == 422
+
+    @pytest.mark.parametrize("freq", ["MINUTELY", "SECONDLY"])
+    def test_rrule_more_frequent_than_hourly_is_rejected(
+        self, client: TestClient, teacher: Teacher, rule_payload: dict, freq
+    ):
+        rule_payload["rrule"] = f"FREQ={freq}"
+        response = client.post(
+            "/bookings/teacher-availability-rules", json=rule_payload
+        )
+        assert response.status_code == 422
+
+    def test_window_longer_than_the_maximum_is_rejected(
+        self, client: TestClient, teacher: Teacher, rule_payload: dict
+    ):
+        client.post("/bookings/teacher-availability-rules", json=rule_payload)
+        response = client.get(
+            "/bookings/teacher-availability",
+            params={
+                "from_date": datetime(2022, 6, 1).isoformat(),
+                "until_date": datetime(2032, 6, 1).isoformat(),
+            },
+        )
+        assert response.status_code == 422
+
+    def test_delete_rule(
+        self,
+        client: TestClient,
+        session: Session,
+        teacher: Teacher,
+        rule_payload: dict,
+    ):
+        rule_id = client.post(
+            "/bookings/teacher-availability-rules", json=rule_payload
+        ).json()["id"]
+        response = client.delete(
+            f"/bookings/teacher-availability-rules/{rule_id}"
+        )
+        assert response.status_code == 202
+        assert not session.query(TeacherAvailabilityRule).all()
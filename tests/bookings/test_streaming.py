@@ -0,0 +1,77 @@
+from datetime import datetime
+import json
+from typing import List
+
+from fastapi.testclient import TestClient
+import pytest
+
+from app.core.config import settings
+from app.db.models.user.user import Teacher, TeacherAvailability
+
+
+def stream_lines(client: TestClient, **params) -> List[dict]:
+    response = client.get(
+        "/bookings/teacher-availability", params={"stream": True, **params}
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+class TestStreamingAvailability:
+    @pytest.fixture(autouse=True)
+    def small_batches(self, monkeypatch):
+        monkeypatch.setattr(settings, "AVAILABILITY_STREAM_BATCH_SIZE", 2)
+
+    def test_streams_rows_as_ndjson_in_start_order(
+        self,
+        client: TestClient,
+        teacher: Teacher,
+        schedule: List[TeacherAvailability],
+    ):
+        """
+        GIVEN: More rows than fit in one batch
+        THEN: Every row is sent, one per line, in start order, and
+            paging params are ignored
+        """
+        lines = stream_lines(
+            client,
+            limit=1,
+            from_date=datetime(2022, 6, 1).isoformat(),
+            until_date=datetime(2022, 7, 1).isoformat(),
+        )
+        assert [line["start"] for line in lines] == [
+            "2022-06-23T07:00:00",
+            "2022-06-23T13:00:00",
+            "2022-06-24T09:00:00",
+        ]
+        assert lines[0]["teacher_id"] == teacher.id
+
+    def test_rule_occurrences_are_merged_into_the_stream(
+        self,
+        client: TestClient,
+        teacher: Teacher,
+        schedule: List[TeacherAvailability],
+    ):
+        client.post(
+            "/bookings/teacher-availability-rules",
+            json={
+                "dtstart": datetime(2022, 6, 20, 8).isoformat(),
+                "rrule": "FREQ=DAILY",
+                "duration": 30,
+            },
+        )
+        lines = stream_lines(
+            client,
+            from_date=datetime(2022, 6, 23).isoformat(),
+            until_date=datetime(2022, 6, 27).isoformat(),
+        )
+        assert [(line["start"], line["type"]) for line in lines] == [
+            ("2022-06-23T07:00:00", "available"),
+            ("2022-06-23T08:00:00", "recurring"),
+            ("2022-06-23T13:00:00", "available"),
+            ("2022-06-24T08:00:00", "recurring"),
+            ("2022-06-24T09:00:00", "available"),
+            ("2022-06-25T08:00:00", "recurring"),
+            ("2022-06-26T08:00:00", "recurring"),
+        ]
@@ -0,0 +1,78 @@
+from sqlalchemy import text
+from sqlalchemy.schema import CreateTable
+from sqlalchemy.future.engine import Engine
+from sqlmodel import Session, SQLModel
+
+from app.cli.generate_data import Volumes, generate
+from app.db.models.user.user import TeacherAvailability, User
+
+VOLUMES = Volumes(
+    organizations=2,
+    teachers=6,
+    students=30,
+    courses=8,
+    availability=3000,
+    classes_per_course=2,
+)
+
+AVAILABILITY_DIGEST = text(
+    "SELECT md5(string_agg(id::text || teacher_id || start || \"end\", ','"
+    " ORDER BY id)) FROM teacher_availability"
+)
+
+
+class TestGenerateData:
+    def test_loads_the_requested_volumes(
+        self, session: Session, engine: Engine
+    ):
+        generated = generate(engine, VOLUMES, seed=3)
+
+        assert generated.rows["teacher_availability"] == 3000
+        assert generated.rows["user"] == 36
+        assert len(generated.course_ids) == 8
+        assert generated.availability_start < generated.availability_end
+        overlaps = session.execute(
+            text(
+                "SELECT count(*) FROM teacher_availability a"
+                " JOIN teacher_availability b ON a.teacher_id = b.teacher_id"
+                " AND a.id < b.id AND a.during && b.during"
+            )
+        ).scalar_one()
+        assert overlaps == 0
+        constraint = session.execute(
+            text(
+                "SELECT count(*) FROM pg_constraint"
+                " WHERE conname = 'teacher_availability_no_overlap'"
+            )
+        ).scalar_one()
+        assert constraint == 1
+        # and the models still create it along with the table
+        assert "EXCLUDE USING gist" in str(
+            CreateTable(TeacherAvailability.__table__).compile(engine)
+        )
+
+        # Sequences were moved past the loaded ids
+        user = User.create_user(
+            name="new", email="new@domain.com", organization_id=1
+        )
+        session.add(user)
+        session.commit()
+        assert user.id == max(generated.student_user_ids) + 1
+
+    def test_same_seed_gives_the_same_data(
+        self, session: Session, engine: Engine
+    ):
+        generate(engine, VOLUMES, seed=3)
+        first = session.execute(AVAILABILITY_DIGEST).scalar_one()
+        session.close()
+        SQLModel.metadata.drop_all(engine)
+        SQLModel.metadata.create_all(engine)
+
+        generate(engine, VOLUMES, seed=3)
+        assert session.execute(AVAILABILITY_DIGEST).scalar_one() == first
+        session.close()
+        SQLModel.metadata.drop_all(engine)
+        SQLModel.metadata.create_all(engine)
+
+        generate(engine, VOLUMES, seed=4)
+        assert session.execute(AVAILABILITY_DIGEST).scalar_one() != first
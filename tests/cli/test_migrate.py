@@ -0,0 +1,39 @@
+import sys
+from typing import Generator
+
+import pytest
+from sqlalchemy.future.engine import Engine
+
+from app.cli import migrate
+from app.core.config import Settings
+from app.db import migrations
+
+
+@pytest.fixture
+def empty(engine: Engine) -> Generator[Engine, None, None]:
+    migrations.reset(engine)
+    yield engine
+    migrations.reset(engine)
+
+
+def run(monkeypatch: pytest.MonkeyPatch, url: str, command: str) -> int:
+    monkeypatch.setattr(
+        sys, "argv", ["migrate", command, "--database-url", url]
+    )
+    return migrate.main()
+
+
+def test_check_fails_until_upgraded(
+    empty: Engine,
+    app_settings: Settings,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture,
+):
+    url = app_settings.TEST_DATABASE_URL
+    assert run(monkeypatch, url, "check") == 1
+    assert "python -m app.cli.migrate upgrade" in capsys.readouterr().err
+
+    assert run(monkeypatch, url, "upgrade") == 0
+    assert run(monkeypatch, url, "check") == 0
+    assert run(monkeypatch, url, "current") == 0
+    assert capsys.readouterr().out.splitlines()[-1] == str(migrations.HEAD)
@@ -1,24 +1,50 @@
-from typing import Any, AsyncGenerator, Optional
+from typing import Any, AsyncGenerator, List, Optional
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 import pytest
 import pytest_asyncio
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.future.engine import Engine
+from sqlalchemy.pool import NullPool
 from sqlmodel import SQLModel, Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.auth.get_current_user import get_current_user
 from app.db.models.user.user import Teacher, User, UserFull
 from app.main import app
 from app.core.config import Settings
 from fastapi.testclient import TestClient
-from app.db.get_session import get_session
+from app.db.get_session import get_async_session, get_session, to_async_url
+from app.organization.cache import organization_cache
 from app.organization.model import OrganizationModel
 
 
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption(
+        "--run-slow", action="store_true", help="run tests marked slow"
+    )
+
+
+def pytest_collection_modifyitems(
+    config: pytest.Config, items: List[pytest.Item]
+) -> None:
+    if config.getoption("--run-slow"):
+        return
+    skip_slow = pytest.mark.skip(reason="needs --run-slow")
+    for item in items:
+        if "slow" in item.keywords:
+            item.add_marker(skip_slow)
+
+
 @pytest.fixture(scope="session", autouse=True)
 def load_env() -> None:
     load_dotenv()
 
 
+@pytest.fixture(autouse=True)
+def clear_organization_cache() -> None:
+    organization_cache.clear()
+
+
 @pytest.fixture
 def app_settings() -> Settings:
     from app.core.config import settings
@@ -32,6 +58,15 @@ async def engine(app_settings: Settings) -> AsyncGenerator[Engine, Any]:
     yield engine
 
 
+@pytest.fixture
+def async_engine(app_settings: Settings) -> AsyncEngine:
+    # Each TestClient request runs in its own event loop, so connections
+    # can't be pooled between requests
+    return create_async_engine(
+        to_async_url(app_settings.TEST_DATABASE_URL), poolclass=NullPool
+    )
+
+
 @pytest_asyncio.fixture
 async def session(engine: Engine) -> AsyncGenerator[Session, Any]:
     meta = SQLModel.metadata
@@ -88,12 +123,40 @@ async def teacher(session: Session, user: UserFull):
 
 @pytest.fixture
 def client(
-    fast_api_app: FastAPI, session: Session, user: UserFull
+    fast_api_app: FastAPI,
+    session: Session,
+    async_engine: AsyncEngine,
+    user: UserFull,
 ) -> TestClient:
     async def override_get_session() -> AsyncGenerator[TestClient, None]:
         yield session  # type: ignore
         return
 
+    async def override_get_async_session() -> AsyncGenerator[
+        AsyncSession, None
+    ]:
+        async with AsyncSession(
+            async_engine, expire_on_commit=False
+        ) as async_session:
+            yield async_session
+
     fast_api_app.dependency_overrides[get_session] = override_get_session
-    fast_api_app.dependency_overrides[get_current_user] = lambda: user
-    return TestClient(fast_api_app)
+    fast_api_app.dependency_overrides[
+        get_async_session
+    ] = override_get_async_session
+
+    def override_get_current_user(request: Request) -> UserFull:
+        # Recorded like get_current_user does, for read-your-writes
+        request.state.user_id = user.id
+        return user
+
+    fast_api_app.dependency_overrides[
+        get_current_user
+    ] = override_get_current_user
+    test_client = TestClient(fast_api_app)
+    # Async routes write through their own connection, so anything the
+    # test session already loaded has to be reloaded after each request
+    test_client.hooks["response"].append(
+        lambda response, *args, **kwargs: session.expire_all()
+    )
+    return test_client
@@ -0,0 +1,153 @@
+from typing import List
+
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy import event
+from sqlalchemy.future.engine import Engine
+from sqlmodel import Session
+
+from app.db.models.course.course import Course, CourseStudent, LiveClass
+from app.db.models.user.user import Student, Teacher, User
+
+
+@pytest.fixture
+def students(session: Session, course: Course) -> List[Student]:
+    users = [
+        User.create_user(
+            name=f"student {i}",
+            email=f"student{i}@domain.com",
+            organization_id=course.organization_id,
+        )
+        for i in range(4)
+    ]
+    session.add_all(users)
+    session.commit()
+    students = [Student(user_id=user.id) for user in users]
+    session.add_all(students)
+    session.commit()
+    return students
+
+
+@pytest.fixture
+def statements(engine: Engine) -> List[str]:
+    executed: List[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement.split()[0])
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine, "before_cursor_execute", record)
+
+
+class TestAssociationSync:
+    def test_only_the_difference_is_written(
+        self,
+        session: Session,
+        course: Course,
+        students: List[Student],
+        statements: List[str],
+    ):
+        first, second, third, fourth = [s.id for s in students]
+        course.update_course_students(session, [first, second, third])
+        session.commit()
+        assert course.id
+        statements.clear()
+
+        diff = course.update_course_students(session, [second, third, fourth])
+        session.commit()
+
+        assert diff.added == {fourth}
+        assert diff.removed == {first}
+        assert statements == ["SELECT", "DELETE", "INSERT"]
+        assert {cs.student_id for cs in course.course_students} == {
+            second,
+            third,
+            fourth,
+        }
+
+    def test_unchanged_members_write_nothing(
+        self,
+        session: Session,
+        course: Course,
+        teacher: Teacher,
+        statements: List[str],
+    ):
+        teacher_id = teacher.id
+        assert course.id
+        statements.clear()
+        diff = course.update_course_teachers(session, [teacher_id, teacher_id])
+        assert not diff.added and not diff.removed
+        assert statements == ["SELECT"]
+
+    def test_members_are_compared_by_member_id(
+        self, session: Session, course: Course, students: List[Student]
+    ):
+        """
+        GIVEN: A course student row whose id differs from its student_id
+        THEN: Syncing the same student ids keeps the row
+        """
+        student_id = students[-1].id
+        course.update_course_students(session, [student_id])
+        session.commit()
+        (row,) = course.course_students
+        assert row.id != student_id
+
+        diff = course.update_course_students(session, [student_id])
+        assert not diff.added and not diff.removed
+
+    def test_update_course_syncs_students(
+        self,
+        session: Session,
+        client: TestClient,
+        course: Course,
+        students: List[Student],
+    ):
+        student_ids = [s.id for s in students]
+        response = client.put(
+            f"/course/{course.id}",
+            json={"teacher_ids": [], "student_ids": student_ids},
+            params={"include": "teachers,students"},
+        )
+        assert response.status_code == 200
+        updated = response.json()
+        assert updated["course_teachers"] == []
+        assert sorted(
+            cs["student_id"] for cs in updated["course_students"]
+        ) == sorted(student_ids)
+
+    def test_update_course_without_teacher_ids_keeps_teachers(
+        self, client: TestClient, course: Course, teacher: Teacher
+    ):
+        response = client.put(
+            f"/course/{course.id}",
+            json={"name": "renamed"},
+            params={"include": "teachers"},
+        )
+        assert response.status_code == 200
+        updated = response.json()
+        assert updated["name"] == "renamed"
+        assert [ct["teacher_id"] for ct in updated["course_teachers"]] == [
+            teacher.id
+        ]
+
+    def test_live_class_roster(
+        self, session: Session, course: Course, students: List[Student]
+    ):
+        course.update_course_students(session, [s.id for s in students])
+        live_class = LiveClass(
+            name="class", course_id=course.id, url="https://example.com"
+        )
+        session.add(live_class)
+        session.commit()
+        course_student_ids = [cs.id for cs in course.course_students]
+
+        live_class.update_class_students(session, course_student_ids[:3])
+        session.commit()
+        live_class.update_class_students(session, course_student_ids[1:])
+        session.commit()
+
+        roster = {cs.course_student_id for cs in live_class.class_students}
+        assert roster == set(course_student_ids[1:])
+        assert not any(cs.attended for cs in live_class.class_students)
+        assert session.query(CourseStudent).count() == len(students)
@@ -0,0 +1,135 @@
+from typing import List
+
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy import event
+from sqlalchemy.future.engine import Engine
+from sqlmodel import Session
+
+from app.db.models.course.course import Course, LiveClass
+from app.db.models.user.user import User
+from app.organization.model import OrganizationModel
+
+
+@pytest.fixture
+def statements(engine: Engine) -> List[str]:
+    executed: List[str] = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    yield executed
+    event.remove(engine, "before_cursor_execute", count)
+
+
+class TestCourseETags:
+    def test_unchanged_course_is_not_loaded_again(
+        self,
+        client: TestClient,
+        user: User,
+        course: Course,
+        statements: List[str],
+    ):
+        """
+        GIVEN: A client holding the course's ETag
+        THEN: It gets a 304 from a lookup of the revision alone, until
+            the course is updated
+        """
+        url = f"/course/{course.id}"
+        response = client.get(url, params={"include": "teachers"})
+        etag = response.headers["etag"]
+
+        assert user.id
+        statements.clear()
+        response = client.get(
+            url, params={"include": "teachers"}, headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+        # The principal, then the revision
+        assert len(statements) == 2
+
+        response = client.put(url, json={"name": "renamed", "teacher_ids": []})
+        assert response.status_code == 200
+        response = client.get(
+            url, params={"include": "teachers"}, headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 200
+        assert response.json()["name"] == "renamed"
+        assert response.json()["course_teachers"] == []
+        assert response.headers["etag"] != etag
+
+    def test_course_writes_bump_the_course_and_list_revisions(
+        self,
+        client: TestClient,
+        session: Session,
+        course: Course,
+        organization: OrganizationModel,
+    ):
+        revision = course.revision
+        courses_revision = organization.courses_revision
+        response = client.put(
+            f"/course/{course.id}", json={"name": "renamed", "teacher_ids": []}
+        )
+        assert response.status_code == 200
+        session.refresh(course)
+        session.refresh(organization)
+        assert course.revision == revision + 1
+        assert organization.courses_revision == courses_revision + 1
+
+    def test_include_changes_the_etag(self, client: TestClient, course: Course):
+        url = f"/course/{course.id}"
+        etag = client.get(url).headers["etag"]
+        response = client.get(
+            url, params={"include": "teachers"}, headers={"If-None-Match": etag}
+        )
+        assert response.status_code == 200
+
+    def test_course_list_is_revalidated_on_any_course_change(
+        self, client: TestClient, course: Course, statements: List[str]
+    ):
+        etag = client.get("/course").headers["etag"]
+        response = client.get("/course", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+
+        statements.clear()
+        response = client.get("/course", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        # The principal, then the organization's course list revision
+        assert len(statements) == 2
+
+        response = client.put(
+            f"/course/{course.id}", json={"name": "new", "teacher_ids": []}
+        )
+        assert response.status_code == 200
+        response = client.get("/course", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+
+        response = client.delete(f"/course/{course.id}")
+        assert response.status_code == 200
+        response = client.get("/course", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.json() == []
+
+    def test_class_roster_change_revalidates_the_course(
+        self, client: TestClient, session: Session, course: Course
+    ):
+        live_class = LiveClass(
+            name="class", course_id=course.id, url="https://example.com"
+        )
+        session.add(live_class)
+        session.commit()
+        course_etag = client.get(f"/course/{course.id}").headers["etag"]
+        list_etag = client.get("/course").headers["etag"]
+
+        live_class.update_class_students(session, [])
+        session.commit()
+        response = client.get(
+            f"/course/{course.id}", headers={"If-None-Match": course_etag}
+        )
+        assert response.status_code == 200
+        response = client.get("/course", headers={"If-None-Match": list_etag})
+        assert response.status_code == 200
@@ -0,0 +1,112 @@
+from typing import List
+
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.future.engine import Engine
+from sqlmodel import Session
+
+from app.course.api.dependencies import course_load_options
+from app.course.api.router import load_course
+from app.db.models.course.course import Course, CourseStudent, CourseTeacher
+from app.db.models.user.user import Student, Teacher, User
+
+
+@pytest.fixture
+def crowded_course(session: Session, course: Course) -> Course:
+    """
+    The course fixture with two more teachers and three students
+    """
+    for i in range(5):
+        user = User.create_user(
+            name=f"user {i}",
+            email=f"user{i}@domain.com",
+            organization_id=course.organization_id,
+        )
+        session.add(user)
+        session.commit()
+        if i < 2:
+            teacher = Teacher(user_id=user.id)
+            session.add(teacher)
+            session.commit()
+            session.add(
+                CourseTeacher(course_id=course.id, teacher_id=teacher.id)
+            )
+        else:
+            student = Student(user_id=user.id)
+            session.add(student)
+            session.commit()
+            session.add(
+                CourseStudent(course_id=course.id, student_id=student.id)
+            )
+    session.commit()
+    return course
+
+
+@pytest.fixture
+def statements(engine: Engine) -> List[str]:
+    executed: List[str] = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    yield executed
+    event.remove(engine, "before_cursor_execute", count)
+
+
+class TestCourseIncludes:
+    def test_includes_load_in_a_fixed_number_of_queries(
+        self,
+        client: TestClient,
+        user: User,
+        crowded_course: Course,
+        statements: List[str],
+    ):
+        # Refresh what the test session expired so only the request counts
+        url = f"/course/{crowded_course.id}"
+        assert user.id
+        statements.clear()
+        response = client.get(
+            url, params={"include": "teachers,students,classes"}
+        )
+        assert response.status_code == 200
+        course = response.json()
+        assert len(course["course_teachers"]) == 3
+        assert len(course["course_students"]) == 3
+        assert course["live_classes"] == []
+        assert {
+            t["teacher"]["user"]["name"] for t in course["course_teachers"]
+        } == {"test user", "user 0", "user 1"}
+        # The principal, the course, then one query per included
+        # relationship
+        assert len(statements) == 5
+
+    def test_relationships_are_null_unless_included(
+        self, client: TestClient, crowded_course: Course
+    ):
+        response = client.get(
+            f"/course/{crowded_course.id}", params={"include": "teachers"}
+        )
+        assert response.status_code == 200
+        course = response.json()
+        assert len(course["course_teachers"]) == 3
+        assert course["course_students"] is None
+        assert course["live_classes"] is None
+
+    def test_unknown_include_is_rejected(
+        self, client: TestClient, course: Course
+    ):
+        response = client.get(
+            f"/course/{course.id}", params={"include": "teachers,everything"}
+        )
+        assert response.status_code == 400
+
+    def test_lazy_loading_a_relationship_raises(
+        self, session: Session, course: Course
+    ):
+        assert course.id
+        loaded = load_course(session, course.id, course_load_options())
+        with pytest.raises(InvalidRequestError):
+            loaded.course_teachers
@@ -16,6 +16,33 @@ class TestCourseRoutes:
         course_response = response_json[0]
         assert course.name == course_response["name"]
 
+    def test_list_courses_with_cursor(
+        self, session: Session, client: TestClient, course: Course
+    ):
+        second = Course(
+            organization_id=course.organization_id,
+            name="second course",
+            description="description",
+            difficulty=1,
+            max_students=4,
+            price=1000,
+        )
+        session.add(second)
+        session.commit()
+
+        response = client.get("/course", params={"cursor": "", "limit": 1})
+        assert response.status_code == 200
+        first_page = response.json()
+        assert [c["id"] for c in first_page["items"]] == [course.id]
+
+        response = client.get(
+            "/course",
+            params={"cursor": first_page["next_cursor"], "limit": 1},
+        )
+        second_page = response.json()
+        assert [c["id"] for c in second_page["items"]] == [second.id]
+        assert second_page["next_cursor"] is None
+
     def test_get_course_by_id(self, client: TestClient, course: Course):
         response = client.get(f"/course/{course.id}")
         assert response.status_code == 200
@@ -47,6 +74,16 @@ class TestCourseRoutes:
         course_response["teacher_ids"] = [new_teacher_id]
         res = client.put(f"/course/{course.id}", json=course_response)
         assert res.status_code == 200
+        assert [t["teacher_id"] for t in res.json()["course_teachers"]] == [
+            new_teacher_id
+        ]
+        res = client.put(
+            f"/course/{course.id}",
+            json={"teacher_ids": [new_teacher_id]},
+            params={"include": ""},
+        )
+        assert res.status_code == 200
+        assert res.json()["course_teachers"] is None
         course_in_db = session.get(Course, course.id)
         assert course_in_db
         assert course_in_db.name == new_name
@@ -69,6 +106,11 @@ class TestCourseRoutes:
         assert res.status_code == 200
         course_response = res.json()
         assert course_response.get("id")
+        # Teachers are returned without asking, students only when included
+        assert [
+            t["teacher_id"] for t in course_response["course_teachers"]
+        ] == [teacher.id]
+        assert course_response["course_students"] is None
         course_in_db = session.get(Course, course_response.get("id"))
         assert course_in_db
         assert course_in_db.name == course_payload.name
@@ -0,0 +1,150 @@
+CREATE TABLE organization (
+    id SERIAL,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE study_level (
+    id SERIAL,
+    name VARCHAR NOT NULL,
+    difficulty INTEGER NOT NULL,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE study_level_unit (
+    id SERIAL,
+    name VARCHAR NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (id)
+);
+
+CREATE TABLE course (
+    id SERIAL,
+    organization_id INTEGER NOT NULL,
+    max_students INTEGER NOT NULL,
+    name VARCHAR NOT NULL,
+    description VARCHAR NOT NULL,
+    price INTEGER NOT NULL,
+    difficulty INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(organization_id) REFERENCES organization (id)
+);
+
+CREATE TABLE "user" (
+    id SERIAL,
+    name VARCHAR NOT NULL,
+    email VARCHAR NOT NULL,
+    google_id VARCHAR,
+    organization_id INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(organization_id) REFERENCES organization (id)
+);
+
+CREATE INDEX ix_user_google_id ON "user" (google_id);
+
+CREATE INDEX ix_user_email ON "user" (email);
+
+CREATE TABLE live_class (
+    id SERIAL,
+    name VARCHAR NOT NULL,
+    description VARCHAR,
+    course_id INTEGER NOT NULL,
+    url VARCHAR NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(course_id) REFERENCES course (id)
+);
+
+CREATE TABLE payment (
+    id SERIAL,
+    user_id INTEGER NOT NULL,
+    amount INTEGER NOT NULL,
+    payment_date TIMESTAMP WITHOUT TIME ZONE,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES "user" (id)
+);
+
+CREATE TABLE student (
+    id SERIAL,
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES "user" (id)
+);
+
+CREATE TABLE teacher (
+    id SERIAL,
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES "user" (id)
+);
+
+CREATE TABLE course_teacher (
+    id SERIAL,
+    course_id INTEGER NOT NULL,
+    teacher_id INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(course_id) REFERENCES course (id),
+    FOREIGN KEY(teacher_id) REFERENCES teacher (id)
+);
+
+CREATE TABLE payment_package (
+    id SERIAL,
+    payment_id INTEGER,
+    course_id INTEGER,
+    student_id INTEGER NOT NULL,
+    courses_booked INTEGER NOT NULL,
+    courses_bought INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(payment_id) REFERENCES payment (id),
+    FOREIGN KEY(course_id) REFERENCES course (id),
+    FOREIGN KEY(student_id) REFERENCES student (id)
+);
+
+CREATE TABLE teacher_availability (
+    id UUID NOT NULL,
+    type VARCHAR,
+    start TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    "end" TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    teacher_id INTEGER,
+    title VARCHAR,
+    PRIMARY KEY (id),
+    FOREIGN KEY(teacher_id) REFERENCES teacher (id)
+);
+
+CREATE TABLE class_teacher (
+    id SERIAL,
+    class_id INTEGER NOT NULL,
+    course_teacher_id INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(class_id) REFERENCES live_class (id),
+    FOREIGN KEY(course_teacher_id) REFERENCES course_teacher (id)
+);
+
+CREATE TABLE course_student (
+    id SERIAL,
+    payment_package_id INTEGER,
+    course_id INTEGER NOT NULL,
+    student_id INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(payment_package_id) REFERENCES payment_package (id),
+    FOREIGN KEY(course_id) REFERENCES course (id),
+    FOREIGN KEY(student_id) REFERENCES student (id)
+);
+
+CREATE TABLE payment_package_limitations (
+    id SERIAL,
+    used BOOLEAN,
+    course_permitted VARCHAR NOT NULL,
+    payment_package_id INTEGER NOT NULL,
+    PRIMARY KEY (id),
+    FOREIGN KEY(payment_package_id) REFERENCES payment_package (id)
+);
+
+CREATE TABLE class_student (
+    id SERIAL,
+    class_id INTEGER NOT NULL,
+    attended BOOLEAN,
+    course_student_id INTEGER NOT NULL,
+    note VARCHAR,
+    PRIMARY KEY (id),
+    FOREIGN KEY(class_id) REFERENCES live_class (id),
+    FOREIGN KEY(course_student_id) REFERENCES course_student (id)
+);
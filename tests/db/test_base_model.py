@@ -0,0 +1,24 @@
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.db.models.user.user import Teacher, User
+
+
+class TestDBModelAsync:
+    async def test_save_and_delete_with_async_session(
+        self, session: Session, async_engine: AsyncEngine, user: User
+    ):
+        async with AsyncSession(
+            async_engine, expire_on_commit=False
+        ) as async_session:
+            teacher = Teacher(user_id=user.id)  # type: ignore
+            await teacher.save(async_session)
+            assert teacher.id
+            found = await Teacher.get_teacher_by_user_id_async(
+                session=async_session, user_id=user.id  # type: ignore
+            )
+            assert found.id == teacher.id
+            await teacher.delete(async_session)
+        assert not session.get(Teacher, teacher.id)
+        await async_engine.dispose()
@@ -0,0 +1,25 @@
+from sqlalchemy import text
+from sqlalchemy.future.engine import Engine
+
+from app.db.instrumentation import track_queries
+
+
+def test_counts_statements_inside_the_block(engine: Engine):
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        with track_queries() as stats:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT pg_sleep(0.01)"))
+        conn.execute(text("SELECT 1"))
+    assert stats.statements == 2
+    assert stats.db_time >= 0.01
+
+
+def test_nested_blocks_count_towards_the_outer_one(engine: Engine):
+    with engine.connect() as conn:
+        with track_queries() as outer:
+            conn.execute(text("SELECT 1"))
+            with track_queries() as inner:
+                conn.execute(text("SELECT 1"))
+    assert inner.statements == 1
+    assert outer.statements == 2
@@ -0,0 +1,222 @@
+from pathlib import Path
+from typing import Generator
+
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.future.engine import Engine
+from sqlmodel import SQLModel
+
+from app.db import migrations
+from app.db.migrations import v0001_baseline as v0001
+from app.db.migrations import v0002_foreign_key_indexes as v0002
+
+# The schema create_all built from the models before migrations existed
+BASELINE = Path(__file__).with_name("baseline_schema.sql")
+
+
+@pytest.fixture
+def empty(engine: Engine) -> Generator[Engine, None, None]:
+    migrations.reset(engine)
+    yield engine
+    migrations.reset(engine)
+
+
+@pytest.fixture
+def baseline(empty: Engine) -> Engine:
+    with empty.begin() as conn:
+        conn.exec_driver_sql(BASELINE.read_text())
+    return empty
+
+
+@pytest.fixture
+def unindexed(empty: Engine) -> Engine:
+    """
+    The schema without the foreign key indexes or class times, and with
+    no schema version
+    """
+    SQLModel.metadata.create_all(empty)
+    with empty.begin() as conn:
+        for name, *_ in v0002.INDEXES:
+            conn.execute(text(f'DROP INDEX "{name}"'))
+        conn.execute(text('ALTER TABLE live_class DROP start, DROP "end"'))
+    return empty
+
+
+def indexes(engine: Engine) -> dict:
+    inspector = inspect(engine)
+    return {
+        index["name"]: (table, tuple(index["column_names"]), index["unique"])
+        for table in inspector.get_table_names()
+        for index in inspector.get_indexes(table)
+    }
+
+
+class TestMigrations:
+    def test_empty_database_is_built_at_the_latest_version(self, empty: Engine):
+        with pytest.raises(migrations.SchemaMismatch, match="no schema"):
+            migrations.check(empty)
+
+        assert migrations.upgrade(empty) == [migrations.HEAD]
+        assert migrations.check(empty).version == migrations.HEAD
+        assert migrations.upgrade(empty) == []
+
+    def test_database_from_before_migrations_matches_the_models(
+        self, baseline: Engine
+    ):
+        """
+        Fails when a model changes without a migration bringing existing
+        databases along
+        """
+        assert migrations.current(baseline) is None
+        assert "table stripe_event" in migrations.differences(baseline)
+
+        applied = migrations.upgrade(baseline)
+        assert applied == list(range(1, migrations.HEAD + 1))
+        assert migrations.differences(baseline) == []
+        assert migrations.check(baseline).version == migrations.HEAD
+        built = indexes(baseline)
+        assert "ix_teacher_user_id" in built
+        assert built["ix_live_class_start"] == ("live_class", ("start",), False)
+
+    def test_database_from_before_migrations_passes_check(
+        self, baseline: Engine
+    ):
+        """
+        The columns v0001 adds are as strict as the models, NOT NULL
+        included
+        """
+        migrations.upgrade(baseline)
+        assert migrations.check(baseline).version == migrations.HEAD
+        inspector = inspect(baseline)
+        for table, column in [
+            ("course", "revision"),
+            ("teacher", "availability_revision"),
+            ("organization", "courses_revision"),
+            ("stripe_event", "received_at"),
+            ("stripe_event", "attempts"),
+            ("teacher_availability_rule", "title"),
+        ]:
+            live = {c["name"]: c for c in inspector.get_columns(table)}
+            assert not live[column]["nullable"], f"{table}.{column}"
+
+    def test_rejects_a_database_missing_part_of_the_schema(self, empty: Engine):
+        migrations.upgrade(empty)
+        with empty.begin() as conn:
+            conn.execute(text("DROP INDEX ix_live_class_start"))
+            conn.execute(
+                text(
+                    "ALTER TABLE teacher_availability "
+                    f"DROP CONSTRAINT {v0001.NO_OVERLAP}"
+                )
+            )
+            conn.execute(
+                text("ALTER TABLE course ALTER revision DROP NOT NULL")
+            )
+        with pytest.raises(
+            migrations.SchemaMismatch,
+            match="not null on course.revision, index ix_live_class_start, "
+            "exclusion constraint",
+        ):
+            migrations.check(empty)
+
+    def test_check_version_only_compares_versions(self, empty: Engine):
+        with pytest.raises(migrations.SchemaMismatch, match="no schema"):
+            migrations.check_version(empty)
+
+        migrations.upgrade(empty)
+        with empty.begin() as conn:
+            conn.execute(text("DROP INDEX ix_live_class_start"))
+        # Left to python -m app.cli.migrate check
+        assert migrations.check_version(empty).version == migrations.HEAD
+
+
+class TestBaseline:
+    def test_refuses_overlapping_availability(self, baseline: Engine):
+        with baseline.begin() as conn:
+            conn.execute(text("INSERT INTO organization (id) VALUES (1)"))
+            conn.execute(
+                text(
+                    'INSERT INTO "user" (id, name, email, organization_id) '
+                    "VALUES (1, 'teacher', 'teacher@domain.com', 1)"
+                )
+            )
+            conn.execute(
+                text("INSERT INTO teacher (id, user_id) VALUES (1, 1)")
+            )
+            conn.execute(
+                text(
+                    "INSERT INTO teacher_availability "
+                    '(id, start, "end", teacher_id) VALUES '
+                    "(gen_random_uuid(), '2022-06-20 09:00', "
+                    "'2022-06-20 11:00', 1), "
+                    "(gen_random_uuid(), '2022-06-20 10:00', "
+                    "'2022-06-20 12:00', 1)"
+                )
+            )
+
+        with pytest.raises(v0001.OverlappingRowsError):
+            v0001.upgrade(baseline)
+        assert "during" not in {
+            column["name"]
+            for column in inspect(baseline).get_columns("teacher_availability")
+        }
+
+        with baseline.begin() as conn:
+            conn.execute(
+                text(
+                    "UPDATE teacher_availability "
+                    "SET start = '2022-06-20 11:00' "
+                    "WHERE start = '2022-06-20 10:00'"
+                )
+            )
+        v0001.upgrade(baseline)
+        v0001.upgrade(baseline)
+        # Left to the later migrations
+        assert set(migrations.differences(baseline)) == {
+            f"index {name}" for name, *_ in v0002.INDEXES
+        } | {
+            "column live_class.start",
+            "column live_class.end",
+            "index ix_live_class_start",
+        }
+
+
+class TestForeignKeyIndexes:
+    def test_matches_the_models(self):
+        declared = {
+            index.name: (
+                table.name,
+                tuple(column.name for column in index.columns),
+                bool(index.unique),
+            )
+            for table in SQLModel.metadata.tables.values()
+            for index in table.indexes
+        }
+        for name, table, columns, unique in v0002.INDEXES:
+            assert declared[name] == (table, columns, unique)
+
+    def test_builds_missing_indexes(self, unindexed: Engine):
+        v0002.upgrade(unindexed)
+        v0002.upgrade(unindexed)
+
+        built = indexes(unindexed)
+        for name, table, columns, unique in v0002.INDEXES:
+            assert built[name] == (table, columns, unique)
+
+    @pytest.mark.parametrize("table", ["teacher", "student"])
+    def test_refuses_duplicates_of_unique_indexes(
+        self, unindexed: Engine, table: str
+    ):
+        with unindexed.begin() as conn:
+            conn.execute(text("INSERT INTO organization (id) VALUES (1)"))
+            conn.execute(
+                text(
+                    'INSERT INTO "user" (id, name, email, organization_id) '
+                    "VALUES (1, 'user', 'user@domain.com', 1)"
+                )
+            )
+            conn.execute(text(f"INSERT INTO {table} (user_id) VALUES (1), (1)"))
+
+        with pytest.raises(v0002.DuplicateRowsError, match=table):
+            v0002.upgrade(unindexed)
+        assert "ix_user_organization_id" not in indexes(unindexed)
@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import exc, text
+from sqlmodel import create_engine
+
+from app.core.config import Settings
+from app.db.pool import InstrumentedQueuePool
+
+
+class TestInstrumentedQueuePool:
+    def test_records_checkouts(self, app_settings: Settings):
+        engine = create_engine(
+            app_settings.TEST_DATABASE_URL,
+            poolclass=InstrumentedQueuePool,
+            pool_size=2,
+            max_overflow=1,
+        )
+        pool = engine.pool
+        assert isinstance(pool, InstrumentedQueuePool)
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            stats = pool.stats()
+            assert stats.checked_out == 1
+        stats = pool.stats()
+        assert stats.checked_out == 0
+        assert stats.checkouts == 1
+        assert stats.timeouts == 0
+        assert stats.wait_time_total >= 0
+        engine.dispose()
+
+    def test_records_timeouts(self, app_settings: Settings):
+        engine = create_engine(
+            app_settings.TEST_DATABASE_URL,
+            poolclass=InstrumentedQueuePool,
+            pool_size=1,
+            max_overflow=0,
+            pool_timeout=0.1,
+        )
+        pool = engine.pool
+        assert isinstance(pool, InstrumentedQueuePool)
+        with engine.connect():
+            with pytest.raises(exc.TimeoutError):
+                engine.connect()
+        assert pool.stats().timeouts == 1
+        engine.dispose()
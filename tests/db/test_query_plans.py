@@ -0,0 +1,67 @@
+"""
+Checks the lookups behind course lists, payment webhooks and sign in use
+their indexes once the tables are realistically large. Seeding takes a
+while, so these only run with --run-slow.
+"""
+from typing import Generator
+
+import pytest
+from sqlmodel import SQLModel, col, create_engine, select
+from sqlalchemy.future.engine import Engine
+
+from app.cli.generate_data import Volumes, generate
+from app.core.config import settings
+from app.db.models.course.course import Course
+from app.db.models.payment.payment import Payment
+from app.db.models.user.user import User
+from tests.plans import assert_uses_index
+
+pytestmark = pytest.mark.slow
+
+
+@pytest.fixture(scope="module")
+def seeded_engine() -> Generator[Engine, None, None]:
+    engine = create_engine(settings.TEST_DATABASE_URL)
+    meta = SQLModel.metadata
+    meta.drop_all(engine)
+    meta.create_all(engine)
+    generate(
+        engine,
+        Volumes(
+            organizations=50,
+            teachers=1000,
+            students=50_000,
+            courses=20_000,
+            availability=0,
+        ),
+    )
+    yield engine
+    meta.drop_all(engine)
+    engine.dispose()
+
+
+class TestQueryPlans:
+    def test_course_list_uses_organization_index(self, seeded_engine: Engine):
+        statement = (
+            select(Course)
+            .where(Course.organization_id == 7)
+            .order_by(col(Course.id))
+            .limit(settings.DEFAULT_PAGE_SIZE)
+        )
+        assert_uses_index(
+            seeded_engine, statement, "ix_course_organization_id_id"
+        )
+
+    def test_payment_intent_lookup_uses_unique_index(
+        self, seeded_engine: Engine
+    ):
+        statement = select(Payment).where(
+            Payment.stripe_payment_intent_id == "pi_missing"
+        )
+        assert_uses_index(
+            seeded_engine, statement, "payment_stripe_payment_intent_id_key"
+        )
+
+    def test_sign_in_uses_google_id_index(self, seeded_engine: Engine):
+        statement = select(User).where(User.google_id == "synthetic-42")
+        assert_uses_index(seeded_engine, statement, "ix_user_google_id")
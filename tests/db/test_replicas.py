@@ -0,0 +1,192 @@
+"""
+Routes reads to a second database standing in for a replica. It starts
+with only the default organization, so whatever a route returns shows
+which database it read.
+"""
+from datetime import datetime, timedelta
+from typing import Generator, Optional
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.future.engine import Engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.auth.get_current_user import get_current_user
+from app.auth.principal import Principal
+from app.auth.session_tokens import issue_session_tokens
+from app.core.config import Settings
+from app.db import get_session as sessions
+from app.db import replicas
+from app.db.models.course.course import Course
+from app.db.models.user.user import (
+    ReadYourWrites,
+    Teacher,
+    TeacherAvailabilityRule,
+    User,
+)
+from app.organization.model import OrganizationModel
+
+
+@pytest.fixture
+def replica(
+    engine: Engine,
+    async_engine: AsyncEngine,
+    app_settings: Settings,
+    monkeypatch: pytest.MonkeyPatch,
+) -> Generator[Engine, None, None]:
+    url = make_url(app_settings.TEST_DATABASE_URL)
+    url = url.set(database=f"{url.database}_replica")
+    with engine.connect().execution_options(
+        isolation_level="AUTOCOMMIT"
+    ) as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM pg_database WHERE datname = :name"),
+            {"name": url.database},
+        ).first()
+        if not exists:
+            conn.execute(text(f'CREATE DATABASE "{url.database}"'))
+
+    replica = create_engine(url)
+    SQLModel.metadata.drop_all(replica)
+    SQLModel.metadata.create_all(replica)
+    with Session(replica) as session:  # type: ignore
+        OrganizationModel.get_default_organization(session)
+    # Each TestClient request runs in its own event loop
+    async_replica = create_async_engine(
+        sessions.to_async_url(str(url)), poolclass=NullPool
+    )
+    monkeypatch.setattr(sessions, "_replicas", [(replica, async_replica)])
+    monkeypatch.setattr(app_settings, "READ_REPLICA_URLS", [str(url)])
+    # Pins are written on the primary, the test database
+    monkeypatch.setattr(replicas, "get_async_engine", lambda: async_engine)
+    yield replica
+    SQLModel.metadata.drop_all(replica)
+    replica.dispose()
+
+
+def principal(until: Optional[datetime] = None) -> Principal:
+    return Principal(
+        user=User(id=1, name="user", email="user@domain.com"),
+        organization=OrganizationModel(id=1),
+        primary_reads_until=until,
+    )
+
+
+class TestReadReplicas:
+    def test_reads_go_to_the_replica_until_the_client_writes(
+        self,
+        client: TestClient,
+        replica: Engine,
+        session: Session,
+        teacher: Teacher,
+    ):
+        """
+        GIVEN: A course on the primary the replica hasn't received
+        THEN: The course list is read from the replica, until the user
+            writes and is pinned to the primary, without any cookie
+        """
+        course = Course.create_course(
+            session=session,
+            teacher_ids=[],
+            name="on the primary",
+            organization_id=teacher.user.organization_id,
+            difficulty=1,
+            price=1000,
+            max_students=4,
+            student_ids=[],
+        )
+        response = client.get("/course")
+        assert response.json() == []
+        assert client.get(f"/course/{course.id}").status_code == 404
+        replica_etag = response.headers["etag"]
+
+        response = client.post(
+            "/bookings/teacher-availability-rules",
+            json={
+                "dtstart": datetime(2022, 6, 20, 6).isoformat(),
+                "rrule": "FREQ=DAILY;COUNT=2",
+                "duration": 30,
+            },
+        )
+        assert response.status_code == 200
+        assert not response.cookies
+        pin = session.get(ReadYourWrites, teacher.user_id)
+        assert pin and pin.until > datetime.utcnow()
+
+        response = client.get("/course")
+        assert [c["name"] for c in response.json()] == ["on the primary"]
+        assert response.headers["etag"] != replica_etag
+        assert len(client.get("/bookings/teacher-availability-rules").json())
+
+    def test_writes_without_a_principal_pin_the_user(
+        self, replica: Engine, session: Session, user: User
+    ):
+        """
+        GIVEN: A write route which only depends on get_current_user,
+            like the payment routes
+        THEN: The user is still pinned to the primary
+        """
+        app = FastAPI()
+        app.add_middleware(replicas.ReadYourWritesMiddleware)
+        # Session tokens are checked without the database
+        app.dependency_overrides[sessions.get_async_session] = lambda: None
+
+        @app.post("/write")
+        async def write(current_user: User = Depends(get_current_user)):
+            return {"id": current_user.id}
+
+        tokens = issue_session_tokens(user, is_teacher=False, is_student=False)
+        response = TestClient(app).post(
+            "/write", headers={"Authorization": f"Bearer {tokens.access_token}"}
+        )
+        assert response.status_code == 200
+        pin = session.get(ReadYourWrites, user.id)
+        assert pin and pin.until > datetime.utcnow()
+
+    def test_async_reads_go_to_the_replica(
+        self,
+        client: TestClient,
+        replica: Engine,
+        session: Session,
+        teacher: Teacher,
+    ):
+        session.add(
+            TeacherAvailabilityRule(
+                teacher_id=teacher.id,
+                dtstart=datetime(2022, 6, 20, 6),
+                rrule="FREQ=DAILY;COUNT=2",
+                duration=30,
+            )
+        )
+        session.commit()
+        assert client.get("/bookings/teacher-availability-rules").json() == []
+
+    def test_expired_pin_reads_the_replica_again(self):
+        now = datetime.utcnow()
+        assert not replicas.pinned_to_primary(principal())
+        assert not replicas.pinned_to_primary(
+            principal(now - timedelta(seconds=1))
+        )
+        assert replicas.pinned_to_primary(principal(now + timedelta(seconds=5)))
+
+    def test_writes_in_quick_succession_share_a_pin(self):
+        now = datetime.utcnow()
+        assert replicas._needs_pin(principal(), 10)
+        assert replicas._needs_pin(principal(now + timedelta(seconds=4)), 10)
+        assert not replicas._needs_pin(
+            principal(now + timedelta(seconds=9)), 10
+        )
+
+    def test_balances_across_replicas(
+        self, replica: Engine, monkeypatch: pytest.MonkeyPatch
+    ):
+        pairs = [(replica, i) for i in range(3)]
+        monkeypatch.setattr(sessions, "_replicas", pairs)
+        picked = [sessions.next_replica() for _ in range(6)]
+        assert picked[:3] == picked[3:]
+        assert sorted(picked[:3], key=lambda pair: pair[1]) == pairs
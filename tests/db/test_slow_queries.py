@@ -0,0 +1,102 @@
+import logging
+from datetime import datetime
+from typing import Generator
+
+import pytest
+from sqlalchemy import select, text, update
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.future.engine import Engine
+from sqlmodel import Session
+
+from app.db.models.user.user import Teacher, TeacherAvailability
+from app.db.slow_queries import SlowQueryLog, parameter_shape, plan_nodes
+
+
+@pytest.fixture
+def slow_query_log(engine: Engine) -> Generator[SlowQueryLog, None, None]:
+    log = SlowQueryLog(engine, threshold=0.05)
+    log.install(engine)
+    yield log
+    log.uninstall(engine)
+    log.shutdown()
+
+
+class TestSlowQueryLog:
+    def test_logs_slow_statements_with_their_plan(
+        self,
+        engine: Engine,
+        slow_query_log: SlowQueryLog,
+        caplog: pytest.LogCaptureFixture,
+    ):
+        """
+        GIVEN: A slow and a fast statement
+        THEN: Only the slow one is logged, with its parameter types and
+            a plan captured in the background, which is not logged again
+        """
+        caplog.set_level(logging.WARNING, "app.db.slow_queries")
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(
+                text("SELECT pg_sleep(:seconds), :email"),
+                {"seconds": 0.06, "email": "someone@domain.com"},
+            )
+        slow_query_log.shutdown()
+
+        messages = [record.getMessage() for record in caplog.records]
+        assert len(messages) == 2
+        assert "SELECT pg_sleep" in messages[0]
+        assert '{"seconds": "float", "email": "str"}' in messages[0]
+        assert "someone@domain.com" not in messages[0]
+        assert messages[1].startswith("Plan of slow query")
+        assert '"Actual Total Time"' in messages[1]
+
+    @pytest.mark.asyncio
+    async def test_explains_async_statements(
+        self,
+        session: Session,
+        engine: Engine,
+        async_engine: AsyncEngine,
+        teacher: Teacher,
+    ):
+        availability = TeacherAvailability(
+            teacher_id=teacher.id,
+            start=datetime(2022, 6, 1, 9),
+            end=datetime(2022, 6, 1, 10),
+        )
+        session.add(availability)
+        session.commit()
+        statements = []
+        log = SlowQueryLog(engine, threshold=0)
+        log._log_plan = lambda *args: statements.append(args)  # type: ignore
+        log.install(async_engine.sync_engine)
+        async with async_engine.connect() as conn:
+            await conn.execute(
+                select(TeacherAvailability.__table__).where(
+                    TeacherAvailability.__table__.c.id == availability.id
+                )
+            )
+        log.shutdown()
+
+        ((statement, parameters),) = statements
+        plan = log.capture_plan(statement, parameters)
+        assert plan_nodes(plan)[0]["Actual Rows"] == 1
+
+    def test_does_not_run_writes(
+        self, session: Session, engine: Engine, teacher: Teacher
+    ):
+        statement = update(Teacher.__table__).values(user_id=None)
+        compiled = statement.compile(engine)
+        log = SlowQueryLog(engine, threshold=0)
+        plan = log.capture_plan(str(compiled), compiled.params)
+        log.shutdown()
+        assert "Actual Rows" not in plan_nodes(plan)[0]
+        session.refresh(teacher)
+        assert teacher.user_id is not None
+
+
+def test_parameter_shape():
+    assert parameter_shape({"ids": [1, 2], "name": "x"}) == {
+        "ids": "list[2]",
+        "name": "str",
+    }
+    assert parameter_shape((1, None)) == ["int", "NoneType"]
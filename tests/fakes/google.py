@@ -0,0 +1,102 @@
+"""
+Local stand-in for Google's OAuth2 cert endpoint, so ID token
+verification can be exercised offline.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+import rsa
+from google.auth import crypt, jwt
+
+
+class FakeGoogleCertServer:
+    """
+    Serves ``{key id: public key}`` like Google's v1 certs endpoint and
+    signs ID tokens with the matching private key.
+
+    Keys are served as PKCS#1 PEM, which google-auth's python-rsa verifier
+    accepts in place of an x509 certificate.
+    """
+
+    def __init__(self, max_age: int = 3600, key_id: str = "fake-key") -> None:
+        self.max_age = max_age
+        self.requests = 0
+        self._keys: Dict[str, rsa.PrivateKey] = {}
+        self.rotate(key_id)
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                server.requests += 1
+                body = json.dumps(server.public_keys()).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header(
+                    "Cache-Control", f"public, max-age={server.max_age}"
+                )
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/oauth2/v1/certs"
+
+    def rotate(self, key_id: str) -> None:
+        """
+        Replaces the signing key, like Google does every few days
+        """
+        _, private_key = rsa.newkeys(1024)
+        self._keys = {key_id: private_key}
+        self.key_id = key_id
+
+    def public_keys(self) -> Dict[str, str]:
+        return {
+            kid: rsa.PublicKey(key.n, key.e).save_pkcs1().decode()
+            for kid, key in self._keys.items()
+        }
+
+    def sign(
+        self,
+        audience: str,
+        sub: str = "abc",
+        email: str = "email@domain.com",
+        name: str = "test user",
+        expires_in: int = 3600,
+        issuer: str = "https://accounts.google.com",
+        extra: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        now = int(time.time())
+        payload = {
+            "iss": issuer,
+            "aud": audience,
+            "sub": sub,
+            "email": email,
+            "name": name,
+            "iat": now,
+            "exp": now + expires_in,
+            **(extra or {}),
+        }
+        pem = self._keys[self.key_id].save_pkcs1().decode()
+        signer = crypt.RSASigner.from_string(pem, self.key_id)
+        return jwt.encode(signer, payload).decode()
+
+    def start(self) -> "FakeGoogleCertServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
@@ -0,0 +1,118 @@
+"""
+Local stand-in for the Stripe API, so payment calls can be exercised
+offline and their latency and throughput measured.
+"""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl
+
+
+def _form_to_dict(body: str) -> Dict[str, Any]:
+    """
+    Undoes Stripe's form encoding of nested params, e.g. metadata[key]
+    """
+    params: Dict[str, Any] = {}
+    for key, value in parse_qsl(body):
+        if "[" in key:
+            outer, inner = key[:-1].split("[", 1)
+            params.setdefault(outer, {})[inner] = value
+        else:
+            params[key] = value
+    return params
+
+
+class FakeStripeServer:
+    """
+    Creates payment intents like POST /v1/payment_intents. Requests with
+    an Idempotency-Key seen before get the original response back.
+
+    ``latency`` is added to every response to stand in for the round
+    trip to Stripe.
+    """
+
+    def __init__(self, latency: float = 0) -> None:
+        self.latency = latency
+        self.requests = 0
+        self.idempotency_keys: List[Optional[str]] = []
+        self.max_in_flight = 0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._responses: Dict[str, bytes] = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:
+                with server._lock:
+                    server.requests += 1
+                    server._in_flight += 1
+                    server.max_in_flight = max(
+                        server.max_in_flight, server._in_flight
+                    )
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    params = _form_to_dict(self.rfile.read(length).decode())
+                    key = self.headers.get("Idempotency-Key")
+                    time.sleep(server.latency)
+                    body = server.respond(self.path, params, key)
+                finally:
+                    with server._lock:
+                        server._in_flight -= 1
+                status = 200 if body else 404
+                body = body or b'{"error": {"message": "Unknown path"}}'
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever, daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def respond(
+        self, path: str, params: Dict[str, Any], key: Optional[str]
+    ) -> Optional[bytes]:
+        if path != "/v1/payment_intents":
+            return None
+        with self._lock:
+            self.idempotency_keys.append(key)
+            if key and key in self._responses:
+                return self._responses[key]
+            intent_id = f"pi_{uuid.uuid4().hex[:24]}"
+            body = json.dumps(
+                {
+                    "id": intent_id,
+                    "object": "payment_intent",
+                    "amount": int(params["amount"]),
+                    "currency": params["currency"],
+                    "metadata": params.get("metadata", {}),
+                    "client_secret": f"{intent_id}_secret_fake",
+                    "status": "requires_payment_method",
+                }
+            ).encode()
+            if key:
+                self._responses[key] = body
+            return body
+
+    def start(self) -> "FakeStripeServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
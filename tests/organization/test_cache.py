@@ -0,0 +1,44 @@
+from sqlmodel import Session
+
+from app.organization.cache import OrganizationCache, organization_cache
+from app.organization.model import OrganizationModel
+
+
+class TestOrganizationCache:
+    def test_second_lookup_is_a_hit(
+        self, session: Session, organization: OrganizationModel
+    ):
+        cache = OrganizationCache(ttl=60)
+        assert organization.id
+        first = cache.get(session, organization.id)
+        second = cache.get(session, organization.id)
+        assert first and second
+        assert second.id == organization.id
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+
+    def test_hit_is_merged_into_the_callers_session(
+        self, engine, organization: OrganizationModel
+    ):
+        cache = OrganizationCache(ttl=60)
+        cache.prime(organization)
+        with Session(engine) as other_session:
+            org = cache.get(other_session, organization.id)  # type: ignore
+            assert org in other_session
+        assert cache.stats()["misses"] == 0
+
+    def test_delete_invalidates(
+        self, session: Session, organization: OrganizationModel
+    ):
+        organization_cache.prime(organization)
+        assert organization_cache.stats()["size"] == 1
+        session.delete(organization)
+        session.commit()
+        assert organization_cache.stats()["size"] == 0
+
+    def test_default_organization_is_created_on_miss(self, session: Session):
+        cache = OrganizationCache(ttl=60)
+        org = cache.get_default(session)
+        assert org.id
+        assert cache.get_default(session).id == org.id
+        assert cache.stats()["hits"] == 1
@@ -0,0 +1,28 @@
+from typing import Generator
+
+from fastapi import FastAPI
+import pytest
+
+from app.payment.api.dependencies import get_stripe_client
+from app.payment.stripe_client import StripeClient
+from tests.fakes.stripe import FakeStripeServer
+
+
+@pytest.fixture(scope="module")
+def fake_stripe() -> Generator[FakeStripeServer, None, None]:
+    server = FakeStripeServer().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def stripe_client(
+    fast_api_app: FastAPI, fake_stripe: FakeStripeServer
+) -> Generator[StripeClient, None, None]:
+    client = StripeClient(
+        api_key="sk_test_fake", api_base=fake_stripe.url, max_concurrency=4
+    )
+    fast_api_app.dependency_overrides[get_stripe_client] = lambda: client
+    yield client
+    fast_api_app.dependency_overrides.pop(get_stripe_client, None)
+    client.close()
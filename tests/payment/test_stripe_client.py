@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+import pytest
+import stripe
+
+from app.payment.stripe_client import StripeClient
+from tests.fakes.stripe import FakeStripeServer
+
+
+@pytest.fixture
+def slow_stripe(fake_stripe: FakeStripeServer):
+    fake_stripe.latency = 0.2
+    fake_stripe.max_in_flight = 0
+    yield fake_stripe
+    fake_stripe.latency = 0
+
+
+class TestCreatePaymentIntent:
+    def test_retries_get_the_same_intent(
+        self,
+        client: TestClient,
+        stripe_client: StripeClient,
+        fake_stripe: FakeStripeServer,
+    ):
+        payload = {"amount": 2500, "currency": "usd", "course_package": "a"}
+        first = client.post("/payment/create-payment-intent", json=payload)
+        retry = client.post("/payment/create-payment-intent", json=payload)
+        assert first.status_code == 200
+        assert first.json()["secret"].endswith("_secret_fake")
+        assert retry.json() == first.json()
+
+        payload["amount"] = 5000
+        other = client.post("/payment/create-payment-intent", json=payload)
+        assert other.json() != first.json()
+        assert len(set(fake_stripe.idempotency_keys[-3:])) == 2
+
+    def test_global_stripe_state_is_untouched(
+        self, client: TestClient, stripe_client: StripeClient
+    ):
+        api_key = stripe.api_key
+        client.post(
+            "/payment/create-payment-intent",
+            json={"amount": 100, "currency": "usd", "course_package": "a"},
+        )
+        assert stripe.api_key == api_key
+
+
+class TestStripeClient:
+    async def test_calls_do_not_block_the_event_loop(
+        self, stripe_client: StripeClient, slow_stripe: FakeStripeServer
+    ):
+        """
+        GIVEN: Stripe takes 0.2s to respond
+        THEN: Four calls at once take about as long as one
+        """
+        started = time.perf_counter()
+        intents = await asyncio.gather(
+            *(
+                stripe_client.create_payment_intent(
+                    amount=100 + i, currency="usd", metadata={"i": str(i)}
+                )
+                for i in range(4)
+            )
+        )
+        elapsed = time.perf_counter() - started
+        assert [intent["amount"] for intent in intents] == [100, 101, 102, 103]
+        assert intents[0]["metadata"]["i"] == "0"
+        assert slow_stripe.max_in_flight == 4
+        assert elapsed < 0.6
+
+    async def test_concurrency_is_bounded(
+        self, stripe_client: StripeClient, slow_stripe: FakeStripeServer
+    ):
+        await asyncio.gather(
+            *(
+                stripe_client.create_payment_intent(
+                    amount=100, currency="usd", metadata={}
+                )
+                for _ in range(8)
+            )
+        )
+        assert slow_stripe.max_in_flight == 4
@@ -0,0 +1,230 @@
+import hashlib
+import hmac
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict
+
+from fastapi.testclient import TestClient
+import pytest
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.core.config import Settings
+from app.db.models.payment.payment import Payment
+from app.db.models.payment.stripe_event import StripeEvent
+from app.db.models.user.user import User
+from app.payment import events as events_module
+from app.payment.events import (
+    StripeEventBatch,
+    StripeEventProcessor,
+    process_stripe_events,
+    stripe_event_handlers,
+)
+
+
+def payment_intent_event(event_id: str, google_id: str) -> Dict[str, Any]:
+    return {
+        "id": event_id,
+        "object": "event",
+        "type": "payment_intent.succeeded",
+        "data": {
+            "object": {
+                "id": "pi_123",
+                "object": "payment_intent",
+                "amount": 2500,
+                "metadata": {
+                    "course_package": "package",
+                    "user_google_id": google_id,
+                },
+            }
+        },
+    }
+
+
+def sign(payload: str, secret: str) -> str:
+    timestamp = int(time.time())
+    signature = hmac.new(
+        secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256
+    ).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+async def process(async_engine: AsyncEngine) -> StripeEventBatch:
+    async with AsyncSession(
+        async_engine, expire_on_commit=False
+    ) as async_session:
+        return await process_stripe_events(async_session)
+
+
+class TestStripeWebhook:
+    def post_event(
+        self, client: TestClient, app_settings: Settings, event: Dict
+    ):
+        payload = json.dumps(event)
+        return client.post(
+            "/payment/stripe-webhook",
+            data=payload,
+            headers={
+                "stripe-signature": sign(
+                    payload, app_settings.STRIPE_WEBHOOK_SECRET
+                )
+            },
+        )
+
+    def test_events_are_stored_once(
+        self,
+        client: TestClient,
+        session: Session,
+        app_settings: Settings,
+        google_id: str,
+    ):
+        event = payment_intent_event("evt_1", google_id)
+        for _ in range(2):
+            response = self.post_event(client, app_settings, event)
+            assert response.status_code == 200
+
+        (stored,) = session.exec(select(StripeEvent)).all()
+        assert stored.type == "payment_intent.succeeded"
+        assert stored.processed_at is None
+        # Handling is left to the processor
+        assert not session.exec(select(Payment)).all()
+
+    def test_invalid_signature_is_rejected(
+        self, client: TestClient, session: Session, google_id: str
+    ):
+        response = client.post(
+            "/payment/stripe-webhook",
+            data=json.dumps(payment_intent_event("evt_1", google_id)),
+            headers={"stripe-signature": "t=1,v1=nonsense"},
+        )
+        assert response.status_code == 400
+        assert not session.exec(select(StripeEvent)).all()
+
+
+class TestProcessStripeEvents:
+    async def test_payment_is_registered_once(
+        self,
+        session: Session,
+        async_engine: AsyncEngine,
+        user: User,
+        google_id: str,
+    ):
+        """
+        GIVEN: Two events for the same payment intent
+        THEN: Both are processed and one payment is recorded
+        """
+        for event_id in ("evt_1", "evt_2"):
+            event = payment_intent_event(event_id, google_id)
+            session.add(
+                StripeEvent(id=event_id, type=event["type"], payload=event)
+            )
+        session.commit()
+
+        assert await process(async_engine) == StripeEventBatch(2, 2)
+        assert await process(async_engine) == StripeEventBatch(0, 0)
+
+        (payment,) = session.exec(select(Payment)).all()
+        assert payment.user_id == user.id
+        assert payment.amount == 2500
+        assert payment.stripe_payment_intent_id == "pi_123"
+        session.expire_all()
+        events = session.exec(select(StripeEvent)).all()
+        assert all(event.processed_at for event in events)
+        await async_engine.dispose()
+
+    async def test_unhandled_types_are_marked_processed(
+        self, session: Session, async_engine: AsyncEngine
+    ):
+        session.add(StripeEvent(id="evt_1", type="charge.refunded", payload={}))
+        session.commit()
+        assert await process(async_engine) == StripeEventBatch(1, 1)
+        session.expire_all()
+        event = session.get(StripeEvent, "evt_1")
+        assert event and event.processed_at
+        await async_engine.dispose()
+
+    async def test_failed_events_are_retried(
+        self,
+        session: Session,
+        async_engine: AsyncEngine,
+        monkeypatch: pytest.MonkeyPatch,
+        app_settings: Settings,
+        caplog: pytest.LogCaptureFixture,
+    ):
+        """
+        GIVEN: An event whose handler keeps failing
+        THEN: It is retried once its delay has passed, until it runs out
+            of attempts and is logged as given up on
+        """
+        monkeypatch.setattr(app_settings, "STRIPE_EVENT_MAX_ATTEMPTS", 2)
+        monkeypatch.setattr(app_settings, "STRIPE_EVENT_RETRY_DELAY", 60)
+
+        async def fail(session: AsyncSession, event: StripeEvent) -> None:
+            raise RuntimeError("boom")
+
+        monkeypatch.setitem(stripe_event_handlers, "test.failing", fail)
+
+        session.add(StripeEvent(id="evt_1", type="test.failing", payload={}))
+        session.commit()
+
+        assert await process(async_engine) == StripeEventBatch(1, 0)
+        # Not read again until it is due
+        assert await process(async_engine) == StripeEventBatch(0, 0)
+        session.expire_all()
+        event = session.get(StripeEvent, "evt_1")
+        assert event and event.next_attempt_at
+        assert event.next_attempt_at > datetime.utcnow() + timedelta(seconds=50)
+
+        event.next_attempt_at = datetime.utcnow()
+        session.add(event)
+        session.commit()
+        with caplog.at_level(logging.ERROR, logger=events_module.__name__):
+            assert await process(async_engine) == StripeEventBatch(1, 0)
+        assert "evt_1 (test.failing) failed 2 times" in caplog.text
+        assert await process(async_engine) == StripeEventBatch(0, 0)
+        session.expire_all()
+        event = session.get(StripeEvent, "evt_1")
+        assert event
+        assert event.processed_at is None
+        assert event.attempts == 2
+        assert event.last_error == "boom"
+        await async_engine.dispose()
+
+    def test_retry_delay_doubles(self, app_settings: Settings):
+        delays = [events_module.retry_delay(n) for n in (1, 2, 3)]
+        base = timedelta(seconds=app_settings.STRIPE_EVENT_RETRY_DELAY)
+        assert delays == [base, base * 2, base * 4]
+
+    async def test_drain_stops_when_a_batch_makes_no_progress(
+        self,
+        session: Session,
+        async_engine: AsyncEngine,
+        monkeypatch: pytest.MonkeyPatch,
+        app_settings: Settings,
+    ):
+        """
+        GIVEN: A full batch of events which all fail and are due again
+            straight away
+        THEN: Draining reads them once instead of spinning on them
+        """
+        monkeypatch.setattr(app_settings, "STRIPE_EVENT_MAX_ATTEMPTS", 100)
+        monkeypatch.setattr(app_settings, "STRIPE_EVENT_RETRY_DELAY", 0)
+        monkeypatch.setattr(
+            events_module, "get_async_engine", lambda: async_engine
+        )
+
+        async def fail(session: AsyncSession, event: StripeEvent) -> None:
+            raise RuntimeError("boom")
+
+        monkeypatch.setitem(stripe_event_handlers, "test.failing", fail)
+        session.add(StripeEvent(id="evt_1", type="test.failing", payload={}))
+        session.commit()
+
+        assert await StripeEventProcessor(batch_size=1).drain() == 0
+        session.expire_all()
+        event = session.get(StripeEvent, "evt_1")
+        assert event and event.attempts == 1
+        await async_engine.dispose()
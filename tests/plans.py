@@ -0,0 +1,20 @@
+"""
+Assertions on the plans Postgres picks, so key queries can't silently
+fall back to sequential scans as tables grow
+"""
+from typing import Any
+
+from sqlalchemy.future.engine import Engine
+
+from app.db.slow_queries import explain_statement, plan_indexes, plan_nodes
+
+
+def assert_uses_index(engine: Engine, statement: Any, index: str) -> None:
+    with engine.connect() as conn:
+        plan = explain_statement(conn, statement)
+    nodes = [
+        f"{node['Node Type']} on {node.get('Relation Name', '-')}"
+        f" using {node.get('Index Name', '-')}"
+        for node in plan_nodes(plan)
+    ]
+    assert index in plan_indexes(plan), f"{index} not used by: {nodes}"
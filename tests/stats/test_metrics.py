@@ -0,0 +1,87 @@
+from typing import Dict, Optional
+
+from fastapi.testclient import TestClient
+import pytest
+
+from app.core.config import Settings
+from app.stats import metrics
+
+
+def sample(name: str, **labels: str) -> float:
+    value: Optional[float] = metrics.registry.get_sample_value(name, labels)
+    return value or 0.0
+
+
+COURSE: Dict[str, str] = {"method": "GET", "route": "/course/{course_id}"}
+
+
+class TestMetrics:
+    def test_records_queries_per_route_template(self, client: TestClient):
+        """
+        GIVEN: Requests to two different course ids
+        THEN: Both are recorded under the route template, with the SQL
+            statements they ran
+        """
+        requests = sample("http_request_db_queries_count", **COURSE)
+        statements = sample("http_request_db_queries_sum", **COURSE)
+
+        assert client.get("/course/1000").status_code == 404
+        assert client.get("/course/1001").status_code == 404
+
+        assert sample("http_request_db_queries_count", **COURSE) == requests + 2
+        assert sample("http_request_db_queries_sum", **COURSE) >= statements + 2
+        assert sample(
+            "http_request_duration_seconds_count", status="404", **COURSE
+        )
+        assert sample("http_request_db_seconds_sum", **COURSE) > 0
+
+    def test_flags_requests_over_the_query_threshold(
+        self,
+        client: TestClient,
+        app_settings: Settings,
+        monkeypatch: pytest.MonkeyPatch,
+        caplog: pytest.LogCaptureFixture,
+    ):
+        flagged = sample("http_requests_over_query_threshold_total", **COURSE)
+        client.get("/course/1000")
+        assert (
+            sample("http_requests_over_query_threshold_total", **COURSE)
+            == flagged
+        )
+
+        monkeypatch.setattr(app_settings, "METRICS_QUERY_THRESHOLD", 0)
+        client.get("/course/1000")
+        assert (
+            sample("http_requests_over_query_threshold_total", **COURSE)
+            == flagged + 1
+        )
+        assert "GET /course/{course_id} ran" in caplog.text
+
+    def test_unrouted_paths_share_a_label(self, client: TestClient):
+        before = sample(
+            "http_request_duration_seconds_count",
+            method="GET",
+            route="<unmatched>",
+            status="404",
+        )
+        client.get("/no/such/page")
+        client.get("/or/this/one")
+        assert (
+            sample(
+                "http_request_duration_seconds_count",
+                method="GET",
+                route="<unmatched>",
+                status="404",
+            )
+            == before + 2
+        )
+
+    def test_exports_prometheus_text(self, client: TestClient):
+        client.get("/test")
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert (
+            'http_request_db_queries_count{method="GET",route="/test"}'
+            in response.text
+        )
@@ -0,0 +1,49 @@
+from typing import Optional
+
+from starlette.requests import Request
+
+from app.utils.etag import etag_matches, not_modified, weak_etag
+
+
+def make_request(
+    query: str = "", if_none_match: Optional[str] = None
+) -> Request:
+    headers = []
+    if if_none_match is not None:
+        headers.append((b"if-none-match", if_none_match.encode()))
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/course",
+            "query_string": query.encode(),
+            "headers": headers,
+        }
+    )
+
+
+class TestETag:
+    def test_tag_depends_on_query_and_version(self):
+        etag = weak_etag(make_request("limit=10"), 1, 3)
+        assert etag.startswith('W/"')
+        assert etag == weak_etag(make_request("limit=10"), 1, 3)
+        assert etag != weak_etag(make_request("limit=10"), 1, 4)
+        assert etag != weak_etag(make_request("limit=20"), 1, 3)
+
+    def test_if_none_match_is_compared_weakly(self):
+        etag = weak_etag(make_request(), 1)
+        strong = etag[2:]
+        assert etag_matches(make_request(if_none_match=etag), etag)
+        assert etag_matches(make_request(if_none_match=strong), etag)
+        assert etag_matches(
+            make_request(if_none_match=f'"other", {etag}'), etag
+        )
+        assert etag_matches(make_request(if_none_match="*"), etag)
+        assert not etag_matches(make_request(if_none_match='"other"'), etag)
+        assert not etag_matches(make_request(), etag)
+
+    def test_not_modified_has_no_body(self):
+        response = not_modified('W/"abc"')
+        assert response.status_code == 304
+        assert response.body == b""
+        assert response.headers["etag"] == 'W/"abc"'
@@ -0,0 +1,57 @@
+import base64
+import json
+from datetime import datetime
+from uuid import UUID
+
+from fastapi import HTTPException
+from fastapi.exceptions import RequestValidationError
+import pytest
+
+from app.utils.params import (
+    ListAPIParams,
+    build_params,
+    decode_cursor,
+    encode_cursor,
+)
+
+
+def raw_cursor(values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+class TestCursor:
+    def test_round_trip(self):
+        start = datetime(2022, 6, 20, 9)
+        id = UUID(int=1, version=4)
+        cursor = encode_cursor(start.isoformat(), id)
+        assert decode_cursor(cursor, datetime.fromisoformat, UUID) == [
+            start,
+            id,
+        ]
+
+    @pytest.mark.parametrize(
+        "cursor",
+        [
+            "nonsense",
+            raw_cursor({"id": "1"}),
+            raw_cursor(["1", "2"]),
+            raw_cursor([1]),
+            raw_cursor([None]),
+            raw_cursor(["not a number"]),
+        ],
+    )
+    def test_invalid_cursor_is_a_bad_request(self, cursor: str):
+        with pytest.raises(HTTPException) as error:
+            decode_cursor(cursor, int)
+        assert error.value.status_code == 400
+
+
+class TestBuildParams:
+    def test_invalid_values_are_a_validation_error(self):
+        with pytest.raises(RequestValidationError):
+            build_params(ListAPIParams, limit="many")
+
+    def test_builds_the_model(self):
+        params = build_params(ListAPIParams, limit=10, cursor="")
+        assert params.limit == 10
+        assert params.use_cursor
@@ -0,0 +1,44 @@
+from datetime import datetime
+import json
+from uuid import UUID, uuid4
+
+from app.bookings.types import AvailabilityRead
+from app.utils.params import CursorPage
+from app.utils.responses import ORJSONResponse
+
+
+class SubclassedUUID(UUID):
+    """
+    Stands in for asyncpg's UUID type
+    """
+
+
+class TestORJSONResponse:
+    def test_encodes_read_schemas_and_pages(self):
+        id = SubclassedUUID(str(uuid4()))
+        availability = AvailabilityRead(
+            id=id,
+            type="available",
+            start=datetime(2022, 6, 20, 9),
+            end=datetime(2022, 6, 20, 10),
+            teacher_id=1,
+            title=None,
+        )
+        page = CursorPage(items=[availability], next_cursor="abc")
+
+        body = json.loads(ORJSONResponse(page).body)
+
+        assert body == {
+            "items": [
+                {
+                    "id": str(id),
+                    "type": "available",
+                    "start": "2022-06-20T09:00:00",
+                    "end": "2022-06-20T10:00:00",
+                    "teacher_id": 1,
+                    "title": None,
+                    "rule_id": None,
+                }
+            ],
+            "next_cursor": "abc",
+        }